@@ -0,0 +1,86 @@
+"""
+仿真运行时参数：默认值取自 consts.py，每个 Sim（及其 Line、RouteDecider、DepDecider）持有一个 SimConfig，
+同一进程中可在同一线路模板上依次评估多组参数，互不影响，无需修改模块全局变量或重新导入
+"""
+import consts
+
+# 线路模板预处理使用的参数：取值不同需要构建不同的线路模板（包含在预处理缓存键中）
+TEMPLATE_FIELDS = (
+    'DAY', 'INTERVAL', 'NUM_UB', 'NUM_LB', 'CAN_TURN_AT_PEAK_HOURS',
+    'EARLY_HIGH_START_T', 'EARLY_HIGH_END_T', 'LATE_HIGH_START_T', 'LATE_HIGH_END_T',
+)
+
+# 只在仿真运行时使用的参数：同一线路模板上可任意取值
+RUNTIME_FIELDS = (
+    # 时间
+    'SIM_START_T', 'SIM_END_T', 'LAST_BUS_T', 'END_T', 'NOON_START_T', 'NOON_END_T', 'MIN_STEP',
+    'ABORT_CHECK_INTERVAL',
+    # 车辆与停站
+    'LARGE_BUS', 'LARGE_BUS_SEAT', 'SMALL_CAB', 'SMALL_CAB_SEAT',
+    'OLD_STOP_T_NORM', 'OLD_STOP_T_HIGH', 'NEW_STOP_T_NORM', 'NEW_STOP_T_HIGH',
+    # 能耗与成本
+    'CONSUMP_SPEED_OLD', 'CONSUMP_SPEED_NEW', 'CONSUMP_CONDITION_OLD', 'CONSUMP_CONDITION_NEW',
+    'DRIVER_WAGE_OLD', 'DRIVER_WAGE_NEW',
+    # 发车与停站决策
+    'DEP_DURATION', 'RATE_MAX_STOP',
+    # 分离与结合
+    'MAX_SEP_STATIONS', 'MIN_SEP_PASS_NUM', 'MIN_SEP_PASS_NUM_MULTI', 'SEP_DURATION', 'SEP_DIST',
+    'RATE_COMB_ROUTE', 'RATE_COMB_ROUTE_MULTI', 'RATE_FRONT_PASS', 'RATE_FRONT_PASS_MULTI',
+    'RATE_REAR_PASS', 'RATE_REAR_PASS_MULTI', 'COMB_FORE_STA', 'COMB_FORE_STA_MULTI', 'COMB_DURATION', 'COMB_DIST',
+    # 主线+支线转向
+    'MAIN_LINE_STOP_TURN_THRESHOLD', 'MAIN_LINE_STOP_TURN_RATE_THRESHOLD', 'MAIN_LINE_TURN_MAX_PASS_NUM',
+    'ONLY_MAIN_LINE_STOP_THRESHOLD',
+)
+
+FIELDS = TEMPLATE_FIELDS + RUNTIME_FIELDS
+
+# 以乘客人数计的阈值：低保真度（抽样部分乘客）仿真时按抽样比例缩小
+PASSENGER_COUNT_FIELDS = (
+    'MIN_SEP_PASS_NUM', 'MIN_SEP_PASS_NUM_MULTI', 'MAIN_LINE_STOP_TURN_THRESHOLD', 'MAIN_LINE_TURN_MAX_PASS_NUM',
+)
+
+
+class SimConfig:
+
+    def __init__(self, **kwargs):
+        """
+        仿真参数，属性名与 consts.py 中的常量相同，未给出的参数取 consts.py 中的当前值
+
+        :param kwargs: 需要修改的参数，例如 SimConfig(RATE_COMB_ROUTE=0.6, SEP_DURATION=16)
+        """
+        for name in FIELDS:
+            setattr(self, name, getattr(consts, name))
+        for name, val in kwargs.items():
+            assert name in FIELDS, f'unknown config field {name}'
+            setattr(self, name, val)
+
+    def replace(self, **kwargs):
+        """修改部分参数后的新配置，原配置不变"""
+        return SimConfig(**{**self.to_dict(), **kwargs})
+
+    def scale_passengers(self, fidelity: float):
+        """乘客人数阈值按抽样比例缩小后的配置（不取整），fidelity 为 1 时返回自身"""
+        if fidelity >= 1:
+            return self
+        return self.replace(**{name: getattr(self, name) * fidelity for name in PASSENGER_COUNT_FIELDS})
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in FIELDS}
+
+    def template_key(self):
+        """线路模板预处理使用的参数，相同时可共用线路模板"""
+        return tuple(getattr(self, name) for name in TEMPLATE_FIELDS)
+
+    def diff(self, other=None):
+        """与另一配置（默认为 consts.py 中的值）不同的参数"""
+        other = SimConfig() if other is None else other
+        return {name: getattr(self, name) for name in FIELDS if getattr(self, name) != getattr(other, name)}
+
+    def __eq__(self, other):
+        return isinstance(other, SimConfig) and self.to_dict() == other.to_dict()
+
+    def __hash__(self):
+        return hash(tuple(repr(getattr(self, name)) for name in FIELDS))
+
+    def __repr__(self):
+        return f'SimConfig({", ".join(f"{key}={val!r}" for key, val in self.diff().items())})'
@@ -90,6 +90,23 @@ INTERVAL = 10 * 60
 # different days
 DAY = 2
 
+# early abort
+ABORT_CHECK_INTERVAL = 5 * 60  # 提前终止条件的检查间隔（秒）
+
+# random seed & cache of preprocessed passengers
+RANDOM_SEED = 42  # 默认随机种子（乘客数据预处理、转向决策），并行重复仿真用 sim.spawn_seeds 派生子种子
+USE_LINE_CACHE = True  # 是否缓存预处理后的乘客数据
+CACHE_DIR = 'cache'  # 缓存文件目录
+
+# replications
+REP_MIN = 5  # 最少重复次数（置信区间有意义所需）
+REP_MAX = 50  # 最多重复次数
+REP_CONFIDENCE = 0.95  # 置信水平
+REP_HALF_WIDTH = {  # 各指标置信区间半宽的目标，全部达到后停止增加重复
+    'avg_travel_t(full, min)': 0.2,
+    'power consumption(condition, kWh)': 2.0,
+}
+
 # (11, 14): 4%, (10, 14): 10%, (6, 14): 28%, (4, 14): 51%
 
 # 10-15
@@ -105,3 +122,10 @@ DAY = 2
 NUM_UB = 100  # 100
 NUM_LB = 8
 CAN_TURN_AT_PEAK_HOURS = False  # 是否在高峰期可以转向支线
+
+# sensitivity analysis (Morris)
+SA_NUM_TRAJECTORIES = 20  # 最多轨迹数，每条轨迹 (参数数 + 1) 次仿真
+SA_NUM_LEVELS = 4  # 每个参数的取值水平数
+SA_BATCH_TRAJECTORIES = 4  # 每批并行评估的轨迹数
+SA_TOP_K = 4  # 关注的最重要参数个数
+SA_PATIENCE = 2  # 最重要的 SA_TOP_K 个参数连续该批数不变时停止
@@ -1,11 +1,13 @@
-from consts import LARGE_BUS, SMALL_CAB, DEP_DURATION, LAST_BUS_T
+from config import SimConfig
 
 
 class DepDecider:
 
-    def __init__(self, sim_mode: str = 'single', dep_duration: list = None, dep_num: list = None):
+    def __init__(self, sim_mode: str = 'single', dep_duration: list = None, dep_num: list = None,
+                 config: SimConfig = None):
         assert sim_mode in ['baseline', 'single', 'multi', 'multi_order']
         self.mode = sim_mode
+        self.config = SimConfig() if config is None else config
         self.last_dep = None
         self.dep_duration_list = list(dep_duration) if dep_duration is not None else None
         self.dep_num_list = list(dep_num) if dep_num is not None else None
@@ -13,17 +15,17 @@ class DepDecider:
     def can_dep(self, cur_t: int):
         """判断是否发车"""
         if self.mode == 'baseline':
-            if cur_t <= LAST_BUS_T:
+            if cur_t <= self.config.LAST_BUS_T:
                 return True if (cur_t - self.last_dep >= self.dep_duration_list[int(cur_t/3600)]) else False
             else:
                 return False
         elif self.mode == 'single':
-            if cur_t <= LAST_BUS_T:
+            if cur_t <= self.config.LAST_BUS_T:
                 return True if (cur_t - self.last_dep >= self.dep_duration_list[int(cur_t/3600)]) else False
             else:
                 return False
         else:
-            if cur_t <= LAST_BUS_T:
+            if cur_t <= self.config.LAST_BUS_T:
                 return True if (cur_t - self.last_dep >= self.dep_duration_list[int(cur_t / 3600)]) else False
             else:
                 return False
@@ -36,8 +38,8 @@ class DepDecider:
         :return: 发车数量，车厢容量
         """
         if self.mode == 'baseline':
-            return 1, LARGE_BUS
+            return 1, self.config.LARGE_BUS
         elif self.mode == 'single':
-            return self.dep_num_list[int(cur_t/3600)], SMALL_CAB
+            return self.dep_num_list[int(cur_t/3600)], self.config.SMALL_CAB
         else:
-            return self.dep_num_list[int(cur_t/3600)], SMALL_CAB
+            return self.dep_num_list[int(cur_t/3600)], self.config.SMALL_CAB
@@ -8,86 +8,374 @@ from multiprocessing import Pool as ProcessPool
 import multiprocessing as mp
 from multiprocessing.dummy import Pool as ThreadPool
 
+import logging
 import os
 import sys
+import threading
+import time
 # sys.path.append(os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
 
+from archive import EvalArchive, get_fingerprint
+from config import SimConfig
+from consts import DIRECTION, DAY, RANDOM_SEED
+from env.line import Line
+from env.shared import SharedLine, attach_line
+from prefix_eval import PrefixEvaluator
+from remote import RemotePool
+from scenario import get_scenario_path, load_scenario
+from surrogate import Surrogate
 from sim import read_in_for_opt, Sim
 
+# 每个工作进程（线程）常驻的仿真对象，由进程池 initializer 构建，任务间通过 Sim.reset 复用
+_worker = threading.local()
+
+
+def build_line(day: int = DAY):
+    """
+    构建给定日期的线路模板：有场景文件（scenario.py）时以 mmap 方式打开其中预处理后的乘客数组，
+    否则读取 csv 构建（或从预处理缓存读取）
+    """
+    path = get_scenario_path(day=day, mode=SIM_MODE, root=os.path.join('..', 'data'))
+    if os.path.exists(os.path.join(path, 'meta.json')):
+        line = load_scenario(path)['line']
+        if line.seed == RANDOM_SEED and line.config.template_key() == SimConfig(DAY=day).template_key():
+            return line
+        logging.warning(f'scenario {path} was built with other preprocessing parameters, rebuild it; '
+                        f'reading the csv files instead.')
+    data = read_in_for_opt(way='total', fractile=None)
+    return Line(direc=DIRECTION, station_list=data['station_list'], loc_list=data['loc_list'],
+                dist_list=data['dist_list'], speed_list=data['speed_list'], mode=SIM_MODE,
+                side_line_info=data['side_line_info'], day=day)
+
+
+def init_worker(spec=None, line=None):
+    """
+    进程池 initializer：挂载共享内存中的线路模板（多进程）或直接使用已有模板（单进程/多线程），
+    并在其上构建常驻的仿真对象
+
+    :param spec: SharedLine.spec
+    :param line: 线路模板
+    :return:
+    """
+    line = attach_line(spec) if spec is not None else line
+    _worker.day = line.day
+    _worker.sims, _worker.evaluators = {}, {}
+    add_worker_sim(line)
+
+
+def add_worker_sim(line: Line):
+    """在线路模板上构建常驻的仿真对象与前缀复用评估器"""
+    sim = Sim.from_template(line, dep_duration_list=[0] * 24, dep_num_list=[0] * 24,
+                            multi_dec_rule=MULTI_DEC_RULE, record_time=None)
+    sim.can_reorg = CAN_REORG
+    sim.print_log = False
+    _worker.sims[line.day] = sim
+    # 每个变量对应两个小时，快照只需保存在变量边界的整点
+    _worker.evaluators[line.day] = PrefixEvaluator(sim, hours=list(range(8, 23, 2)),
+                                                   max_snapshots=PREFIX_CACHE_SIZE) if USE_PREFIX_EVAL else None
+
+
+def get_worker_sim(day: int = None):
+    """当前工作进程（线程）在给定日期（None 为默认日期）上的常驻仿真对象，其他日期的模板在首次使用时构建"""
+    day = _worker.day if day is None else day
+    if day not in _worker.sims:
+        add_worker_sim(build_line(day))
+    return _worker.sims[day]
+
+
+def get_worker_evaluator(day: int = None):
+    """当前工作进程（线程）在给定日期上的前缀复用评估器，未启用时为 None"""
+    get_worker_sim(day)
+    return _worker.evaluators[_worker.day if day is None else day]
+
+
+def var_to_schedule(var):
+    """
+    决策变量转为各小时的发车数量与发车间隔
+
+    :param var: [dep_num * 8 + dep_duration(min) * 8]，每个变量对应 6:00 起的两个小时
+    :return: dep_num_list, dep_duration_list
+    """
+    dep_num_var = [0 for _ in range(6)] + [val for val in var[:8] for _ in range(2)] + [1, 1]
+    dep_duration_var = [0 for _ in range(6)] + [val * 60 for val in var[8:] for _ in range(2)] + [var[-1] * 60, var[-1] * 60]
+    return dep_num_var, dep_duration_var
+
 
 class MyProblem(ea.Problem):  # 继承Problem父类
 
-    def __init__(self, PoolType):
+    def __init__(self, PoolType, archive_path=None, run_id=None, day: int = DAY, verbose: bool = VERBOSE):
         name = 'MyProblem'  # 初始化name（函数名称，可以随意设置）
         M = 1  # 初始化M（目标维数）
         maxormins = [1]  # 最小化
-        Dim = 16  # 初始化Dim（决策变量维数）
+        Dim = len(VAR_LB)  # 初始化Dim（决策变量维数）
         varTypes = [1] * Dim  # 初始化varTypes（决策变量的类型，0表示实数，1表示整数）
-        lb = [1 for _ in range(int(Dim / 2))] + [8 for _ in range(int(Dim / 2))]  # 决策变量下界， [dep_num + dep_duration]
-        ub = [3 for _ in range(int(Dim / 2))] + [15 for _ in range(int(Dim / 2))]  # 决策变量上界， [dep_num + dep_duration]
+        lb = list(VAR_LB)  # 决策变量下界， [dep_num + dep_duration]
+        ub = list(VAR_UB)  # 决策变量上界， [dep_num + dep_duration]
         lbin = [1 for _ in range(Dim)]  # 决策变量下边界，[dep_num + dep_duration]
         ubin = [1 for _ in range(Dim)]  # 决策变量上边界，[dep_num + dep_duration]
         # 调用父类构造方法完成实例化
         ea.Problem.__init__(self, name, M, maxormins, Dim, varTypes, lb, ub, lbin, ubin)
 
-        self.data = read_in_for_opt(way='total', fractile=None)
+        # 线路模板只在主进程中构建一次
+        self.day = day
+        self.line = build_line(day)
+        self.shared_line = None
+
+        # 适应度缓存 {(场景指纹, 决策变量): (目标值, 约束)}，以及每代的命中/未命中次数
+        self.fingerprint = self.get_fingerprint()
+        self.day_fingerprints = {day: self.fingerprint}  # 各日期的场景指纹
+        self.memo = {}
+        self.memo_log = []  # [(代数, 命中, 未命中)]
+
+        # 评估存档（SQLite），仿真前先查询，并记录每代种群用于断点续跑
+        self.archive = EvalArchive(archive_path) if archive_path is not None else None
+        self.run_id = run_id
+        self.generation = 0  # 当前代数（断点续跑时由外部设置）
+        self.verbose = verbose  # 是否逐代输出评估统计
+        self.kept = None  # 按差分进化一对一选择推算的当前保留种群 [(决策变量, (目标值, 约束))]
+
+        # 代理模型预筛选，以存档中的评估结果作为初始训练样本
+        self.surrogate = Surrogate(self.lb, self.ub, seed=RANDOM_SEED, verbose=verbose) if USE_SURROGATE else None
+        if self.surrogate is not None and self.archive is not None:
+            self.surrogate.load_archive(self.archive, self.fingerprint)
 
         # 设置用多线程还是多进程
         self.PoolType = PoolType
         if self.PoolType == 'Thread':
-            self.pool = ThreadPool(10)  # 设置池的大小
+            self.num_workers = 10  # 设置池的大小
+            self.pool = ThreadPool(self.num_workers, initializer=init_worker, initargs=(None, self.line))
         elif self.PoolType == 'Process':
-            num_cores = int(mp.cpu_count())  # 获得计算机的核心数
-            self.pool = ProcessPool(num_cores)  # 设置池的大小
+            self.num_workers = int(mp.cpu_count())  # 获得计算机的核心数
+            # 乘客数组发布到共享内存，工作进程只读挂载，任务只传递染色体
+            self.shared_line = SharedLine(self.line)
+            self.pool = ProcessPool(self.num_workers, initializer=init_worker, initargs=(self.shared_line.spec, ))
+        elif self.PoolType == 'Remote':
+            # 由其他机器上的工作端（python remote.py <host> <port>）拉取并评估
+            self.num_workers = REMOTE_NUM_WORKERS
+            self.pool = RemotePool(self.fingerprint, host=REMOTE_HOST, port=REMOTE_PORT, token=REMOTE_TOKEN)
         else:
             assert PoolType is None
             self.PoolType = None
+            self.num_workers = 1
+            init_worker(line=self.line)  # 在主线程中构建常驻仿真对象
+
+    def get_fingerprint(self, line: Line = None):
+        """场景指纹：线路模板缓存键 + 工作进程仿真对象的全部参数与设置 + 提前终止设置 + 约束边界"""
+        line = self.line if line is None else line
+        return get_fingerprint(line.cache_key, line.config, sim_mode=SIM_MODE, multi_dec_rule=MULTI_DEC_RULE,
+                               can_reorg=CAN_REORG, abort_rule=ABORT_RULE, abort_avg_t=UB_AVG_T,
+                               lb_avg_t=LB_AVG_T, ub_avg_t=UB_AVG_T)
+
+    def get_day_fingerprint(self, day: int):
+        """其他日期的场景指纹（首次使用时在主进程中构建该日期的模板，写入预处理缓存供工作进程读取）"""
+        if day not in self.day_fingerprints:
+            self.day_fingerprints[day] = self.get_fingerprint(build_line(day))
+        return self.day_fingerprints[day]
 
     def evalVars(self, Vars):
-        N = Vars.shape[0]
-        args = list(
-            zip(list(range(N)), [Vars] * N, [self.data] * N))
+        # 决策变量为整数，取整后作为缓存键；同一代中重复的个体也只仿真一次
+        keys = [tuple(int(val) for val in np.round(Vars[i, :])) for i in range(Vars.shape[0])]
+        screened = self.screen(keys)
+        results, todo, num_aborted = self.evaluate([key for key in keys if key not in screened],
+                                                   abort_objs=self.get_abort_objs(keys))
+        results.update(screened)
+
+        num_hits = len(keys) - len(todo) - sum(key in screened for key in keys)
+        self.memo_log.append((self.generation, num_hits, len(todo)))
+        if self.verbose:
+            print('gen {}: memo hits {}, misses {}'.format(*self.memo_log[-1]) + f', aborted {num_aborted}' +
+                  (f', screened {len(screened)}' if self.surrogate is not None else ''))
+
+        result_list = [results[key] for key in keys]
+        if self.surrogate is not None:
+            self.surrogate.end_generation(self.generation)
+        self.update_kept(keys, result_list)
+
+        f = np.array([val[0] for val in result_list]).reshape((-1, 1))
+        CV = np.array([val[1] for val in result_list]).reshape((-1, 1))
+        return f, CV
+
+    def evaluate(self, keys: list, abort_objs: dict = None, day: int = None):
+        """
+        评估一批个体，已评估过的个体直接从缓存与存档返回
+
+        :param keys: 决策变量
+        :param abort_objs: {决策变量: 提前终止阈值}，None 表示不提前终止
+        :param day: 乘客数据日期，None 为默认日期
+        :return: {决策变量: (目标值, 约束)}, 实际仿真的个体, 提前终止的个体数
+        """
+        fingerprint = self.fingerprint if day is None else self.get_day_fingerprint(day)
+        results = {}
+        for key in dict.fromkeys(keys):
+            res = self.lookup(key, fingerprint=fingerprint)
+            if res is not None:
+                results[key] = res
+        todo = [key for key in dict.fromkeys(keys) if key not in results]
+        abort_objs = {} if abort_objs is None else abort_objs
+        args = [(i, np.array(key), abort_objs.get(key), day) for i, key in enumerate(todo)]
+        num_aborted = 0
+        for key, result in zip(todo, self.map_eval(args)):
+            results[key] = result[:2]
+            if result[2].get('aborted') is not None:
+                num_aborted += 1
+            self.store(key, result, fingerprint=fingerprint)
+        return results, todo, num_aborted
+
+    def screen(self, keys: list):
+        """
+        代理模型预筛选：只在目标个体可行时淘汰试验个体，淘汰个体的约束记为 1，必然劣于目标个体而不被选择
+
+        :param keys: 本代个体
+        :return: {被淘汰的决策变量: (预测目标值, 1)}
+        """
+        if self.surrogate is None or not self.surrogate.ready or self.kept is None or len(self.kept) != len(keys):
+            return {}
+        target_objs = {}  # {决策变量: 需要胜过的目标值，None 表示必须仿真}
+        for key, (_, target) in zip(keys, self.kept):
+            if target[1] > 0 or self.lookup(key) is not None:
+                target_objs[key] = None
+            elif target_objs.get(key, 0) is not None:
+                # 同一染色体出现在多个位置时取最宽松的目标值
+                target_objs[key] = max(target_objs.get(key, target[0]), target[0])
+        candidates = [key for key, obj in target_objs.items() if obj is not None]
+        if len(candidates) == 0:
+            return {}
+        promising, pred_objs = self.surrogate.screen(candidates, [target_objs[key] for key in candidates])
+        return {key: (pred_obj, 1) for key, ok, pred_obj in zip(candidates, promising, pred_objs) if not ok}
+
+    def update_kept(self, keys: list, result_list: list):
+        """按差分进化一对一选择更新保留种群，并将其作为一代写入存档"""
+        # 第 0 代为初始种群，之后每代为试验种群，与目标个体一对一比较
+        if self.kept is None or len(self.kept) != len(keys):
+            self.kept = list(zip(keys, result_list))
+        else:
+            self.kept = [new if is_better(new[1], old[1]) else old
+                         for old, new in zip(self.kept, zip(keys, result_list))]
+        if self.archive is not None:
+            self.archive.record_generation(self.run_id, self.fingerprint, self.generation,
+                                           [key for key, _ in self.kept])
+        self.generation += 1
+
+    def lookup(self, key: tuple, fingerprint: str = None):
+        """查询缓存与存档中的 (目标值, 约束)，未评估过时返回 None"""
+        fingerprint = self.fingerprint if fingerprint is None else fingerprint
+        res = self.memo.get((fingerprint, key))
+        if res is None and self.archive is not None:
+            res = self.archive.get(fingerprint, key)
+            if res is not None:
+                self.memo[(fingerprint, key)] = res
+        return res
+
+    def store(self, key: tuple, result: tuple, fingerprint: str = None):
+        """
+        存入一次评估结果
+
+        :param key: 决策变量
+        :param result: subAimFunc 的返回值 (目标值, 约束, 统计数据, 运行时间)
+        :param fingerprint: 场景指纹，None 为默认日期
+        :return:
+        """
+        fingerprint = self.fingerprint if fingerprint is None else fingerprint
+        obj, cv, stats, runtime = result
+        if stats.get('aborted') == 'obj':
+            return  # 能耗阈值与比较对象有关，其部分结果只用于本次比较，不缓存
+        self.memo[(fingerprint, key)] = (obj, cv)
+        if self.surrogate is not None and fingerprint == self.fingerprint:
+            self.surrogate.add(key, stats)
+        if self.archive is not None:
+            self.archive.put(fingerprint, key, obj, cv, stats, runtime,
+                             run_id=self.run_id, generation=self.generation)
+
+    def get_abort_objs(self, keys):
+        """
+        各个体的提前终止阈值（累计能耗超过该值即不可能被选择）
+
+        'target': 与之一对一比较的目标个体（可行时）的目标值
+        'worst': 当前保留种群中可行个体的最大目标值
+
+        :param keys: 本代个体
+        :return: {决策变量: 阈值或 None}
+        """
+        if ABORT_RULE is None or self.kept is None or len(self.kept) != len(keys):
+            return {key: None for key in keys}
+        feasible_objs = [res[0] for _, res in self.kept if res[1] <= 0]
+        abort_objs = {}
+        for key, (_, target) in zip(keys, self.kept):
+            if ABORT_RULE == 'target':
+                abort_obj = target[0] if target[1] <= 0 else None
+            else:
+                assert ABORT_RULE == 'worst'
+                abort_obj = max(feasible_objs) if len(feasible_objs) == len(self.kept) else None
+            # 同一染色体出现在多个位置时取最宽松的阈值
+            if key in abort_objs and (abort_objs[key] is None or abort_obj is None):
+                abort_objs[key] = None
+            else:
+                abort_objs[key] = abort_obj if key not in abort_objs else max(abort_objs[key], abort_obj)
+        return abort_objs
+
+    def map_eval(self, args):
+        """按 PoolType 并行执行 subAimFunc"""
+        if len(args) == 0:
+            return []
         if self.PoolType is None:
-            result_list = []
-            for i in range(N):
-                result_list.append(subAimFunc(args[i]))
-            f = np.array([val[0] for val in result_list]).reshape((-1, 1))
-            CV = np.array([val[1] for val in result_list]).reshape((-1, 1))
+            result_list = [subAimFunc(arg) for arg in args]
         elif self.PoolType == 'Thread':
             result_list = list(self.pool.map(subAimFunc, args))
-            f = np.array([val[0] for val in result_list]).reshape((-1, 1))
-            CV = np.array([val[1] for val in result_list]).reshape((-1, 1))
         elif self.PoolType == 'Process':
             result = self.pool.map_async(subAimFunc, args)
             result.wait()
             result_list = list(result.get())
-            f = np.array([val[0] for val in result_list]).reshape((-1, 1))
-            CV = np.array([val[1] for val in result_list]).reshape((-1, 1))
+        elif self.PoolType == 'Remote':
+            result_list = self.pool.map(subAimFunc, args)
         else:
             assert False, 'self.PoolType is wrong!'
+        return result_list
 
-        return f, CV
+    def close(self):
+        """关闭进程池并释放共享内存"""
+        if self.PoolType is not None:
+            self.pool.close()
+            self.pool.join()
+        if self.shared_line is not None:
+            self.shared_line.close()
+            self.shared_line = None
+        if self.archive is not None:
+            self.archive.close()
+            self.archive = None
 
 
-def subAimFunc(args):
-    i = args[0]  # 种群编号
-    Vars = args[1]
-    data = args[2]
-    var = Vars[i, :]
-    dep_num_var = [0 for _ in range(6)] + [val for val in var[:8] for _ in range(2)] + [1, 1]
-    dep_duration_var = [0 for _ in range(6)] + [val * 60 for val in var[8:] for _ in range(2)] + [var[-1] * 60, var[-1] * 60]
+def is_better(res_a, res_b):
+    """约束优先的比较：(目标值, 约束) res_a 是否不劣于 res_b"""
+    feasible_a, feasible_b = res_a[1] <= 0, res_b[1] <= 0
+    if feasible_a != feasible_b:
+        return feasible_a
+    if not feasible_a and res_a[1] != res_b[1]:
+        return res_a[1] < res_b[1]
+    return res_a[0] <= res_b[0]
 
-    multi_dec_rule = 'up_first'
-    data['dep_num_list'] = dep_num_var
-    data['dep_duration_list'] = dep_duration_var
-    sim = Sim(**data, sim_mode='multi_order', multi_dec_rule=multi_dec_rule, record_time=None)
-    sim.can_reorg = True
-    sim.print_log = False
 
-    sim.run()
-    obj = sim.get_statistics()['power consumption(condition, kWh)']
-    avg_t = sim.get_statistics()['avg_travel_t(full, min)']
+def subAimFunc(args):
+    i, var, abort_obj = args[:3]  # 种群编号, 决策变量, 提前终止阈值
+    day = args[3] if len(args) > 3 else None  # 乘客数据日期，None 为默认日期
+    dep_num_var, dep_duration_var = var_to_schedule(var)
+
+    start = time.time()
+    sim = get_worker_sim(day)
+    evaluator = get_worker_evaluator(day)
+    if evaluator is not None:
+        evaluator.evaluate(dep_num_var, dep_duration_var, abort_obj=abort_obj, abort_avg_t=UB_AVG_T)
+    else:
+        sim.reset(dep_num_list=dep_num_var, dep_duration_list=dep_duration_var)
+        sim.abort_obj = abort_obj
+        sim.abort_avg_t = UB_AVG_T
+        sim.run()
+    stats = sim.get_statistics()
+    obj = stats['power consumption(condition, kWh)']
+    if stats.get('aborted') is not None:
+        # 能耗已超过阈值（必然劣于比较对象），或出行时间约束已不可能满足
+        return obj, 1, stats, time.time() - start
+    avg_t = stats['avg_travel_t(full, min)']
     # travel_t = sim.get_statistics()['avg_travel_t(full, min)']
     # t_cond = -1 if (LB_AVG_T <= avg_t < UB_AVG_T and travel_t <= UB_TRAVEL_T) else 1
     t_cond = -1 if LB_AVG_T <= avg_t < UB_AVG_T else 1
-    return obj, t_cond
+    return obj, t_cond, stats, time.time() - start
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""优化评估存档：所有已评估的染色体及其完整统计数据存入 SQLite，用于跳过重复仿真、断点续跑与热启动"""
+import hashlib
+import json
+import sqlite3
+import time
+import numpy as np
+
+from config import SimConfig
+
+
+def _to_json(obj):
+    """numpy 标量等无法直接序列化的对象"""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    return str(obj)
+
+
+def get_fingerprint(line_key: str, config: SimConfig, **settings):
+    """
+    场景指纹：存档中的评估结果只在指纹相同时复用
+
+    :param line_key: 线路模板的缓存键（输入数据与预处理参数）
+    :param config: 仿真使用的全部参数（包括运行时参数）
+    :param settings: 其他影响评估结果的仿真与约束设置
+    :return: str
+    """
+    return hashlib.md5(repr((
+        line_key, sorted(config.to_dict().items()), sorted(settings.items())
+    )).encode()).hexdigest()
+
+
+def key_to_text(key):
+    return ','.join(str(int(val)) for val in key)
+
+
+def text_to_key(text: str):
+    return tuple(int(val) for val in text.split(','))
+
+
+class EvalArchive:
+
+    def __init__(self, path: str):
+        """
+        评估存档
+
+        :param path: SQLite 文件路径
+        """
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS evaluations ('
+            'fingerprint TEXT, vars TEXT, obj REAL, cv REAL, stats TEXT, runtime REAL, '
+            'run_id TEXT, generation INTEGER, created REAL, PRIMARY KEY (fingerprint, vars))'
+        )
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS generations ('
+            'run_id TEXT, fingerprint TEXT, generation INTEGER, population TEXT, finished REAL, '
+            'PRIMARY KEY (run_id, fingerprint, generation))'
+        )
+        self.conn.commit()
+
+    def get(self, fingerprint: str, key: tuple):
+        """查询已评估的 (目标值, 约束)，不存在时返回 None"""
+        row = self.conn.execute(
+            'SELECT obj, cv FROM evaluations WHERE fingerprint = ? AND vars = ?', (fingerprint, key_to_text(key))
+        ).fetchone()
+        return None if row is None else (row[0], row[1])
+
+    def get_stats(self, fingerprint: str, key: tuple):
+        """查询已评估个体的完整 get_statistics() 结果"""
+        row = self.conn.execute(
+            'SELECT stats FROM evaluations WHERE fingerprint = ? AND vars = ?', (fingerprint, key_to_text(key))
+        ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def put(self, fingerprint: str, key: tuple, obj: float, cv: float, stats: dict, runtime: float,
+            run_id: str = None, generation: int = None):
+        """存入一次评估结果（每次写入即提交，进程中断时不丢失）"""
+        self.conn.execute(
+            'INSERT OR REPLACE INTO evaluations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (fingerprint, key_to_text(key), float(obj), float(cv), json.dumps(stats, default=_to_json),
+             runtime, run_id, generation, time.time())
+        )
+        self.conn.commit()
+
+    def record_generation(self, run_id: str, fingerprint: str, generation: int, population: list):
+        """记录已完成评估的一代种群"""
+        self.conn.execute(
+            'INSERT OR REPLACE INTO generations VALUES (?, ?, ?, ?, ?)',
+            (run_id, fingerprint, generation, json.dumps([list(key) for key in population]), time.time())
+        )
+        self.conn.commit()
+
+    def last_generation(self, run_id: str, fingerprint: str):
+        """
+        最后一代已完成的种群，用于断点续跑
+
+        :return: (代数, 种群 np.ndarray) 或 None
+        """
+        row = self.conn.execute(
+            'SELECT generation, population FROM generations WHERE run_id = ? AND fingerprint = ? '
+            'ORDER BY generation DESC LIMIT 1', (run_id, fingerprint)
+        ).fetchone()
+        return None if row is None else (row[0], np.array(json.loads(row[1])))
+
+    def best_feasible(self, fingerprint: str, num: int):
+        """目标值最小的 num 个可行个体"""
+        rows = self.conn.execute(
+            'SELECT vars FROM evaluations WHERE fingerprint = ? AND cv <= 0 ORDER BY obj ASC LIMIT ?',
+            (fingerprint, num)
+        ).fetchall()
+        return [text_to_key(row[0]) for row in rows]
+
+    def evaluations(self, fingerprint: str):
+        """所有已评估个体的 (决策变量, 完整统计数据)，按评估时间排序"""
+        rows = self.conn.execute(
+            'SELECT vars, stats FROM evaluations WHERE fingerprint = ? ORDER BY created ASC', (fingerprint, )
+        ).fetchall()
+        return [(text_to_key(row[0]), json.loads(row[1])) for row in rows]
+
+    def warm_start(self, fingerprint: str, default_pop: np.ndarray):
+        """以存档中最优的可行个体替换默认初始种群的前若干行"""
+        pop = np.array(default_pop)
+        best = self.best_feasible(fingerprint, num=pop.shape[0])
+        for i, key in enumerate(best):
+            pop[i, :] = key
+        return pop
+
+    def close(self):
+        self.conn.close()
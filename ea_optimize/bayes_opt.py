@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+结合/分离决策阈值的贝叶斯优化：以高斯过程拟合阈值到能耗与平均出行时间的关系，按约束期望改进（EI × 可行概率）
+每轮提议 q 个点（kriging believer：已选点以预测均值暂作观测后再选下一个点），经 sweep.run_sweep 并行仿真。
+约束为平均出行时间不高于默认阈值（consts.py）下的结果加 BO_AVG_T_TOL 分钟。
+仿真结果写入 sweep 结果文件，中断后重新运行会重放已完成的评估
+"""
+import os
+import statistics
+import numpy as np
+
+from opt_consts import BO_NUM_INIT, BO_BATCH_SIZE, BO_NUM_ITERS, BO_NUM_CANDIDATES, BO_AVG_T_TOL, VERBOSE
+from surrogate import GaussianProcess, OBJ_KEY, AVG_T_KEY
+from config import SimConfig
+from consts import RANDOM_SEED
+from sweep import run_sweep, point_key
+
+# 阈值的取值范围 {参数名: (下界, 上界)}，上下界均为整数时取整数（sim_mode='multi_order' 使用 *_MULTI 参数）
+BO_FACTORS = {
+    'RATE_COMB_ROUTE_MULTI': (0., 1.),
+    'RATE_FRONT_PASS_MULTI': (0., 1.),
+    'RATE_REAR_PASS_MULTI': (0., 1.),
+    'COMB_FORE_STA_MULTI': (1, 4),
+    'SEP_DURATION': (10, 20),
+    'COMB_DIST': (150, 220),
+}
+
+_norm = statistics.NormalDist()
+
+
+def expected_improvement(mean: np.ndarray, std: np.ndarray, best: float):
+    """最小化问题的期望改进"""
+    std = np.maximum(std, 1e-9)
+    z = (best - mean) / std
+    cdf = np.array([_norm.cdf(val) for val in z])
+    pdf = np.exp(-0.5 * z ** 2) / np.sqrt(2 * np.pi)
+    return (best - mean) * cdf + std * pdf
+
+
+def prob_below(mean: np.ndarray, std: np.ndarray, ub: float):
+    """预测值不超过 ub 的概率"""
+    return np.array([_norm.cdf(val) for val in (ub - mean) / np.maximum(std, 1e-9)])
+
+
+class ThresholdBO:
+
+    def __init__(self, factors: dict = None, max_avg_t: float = None, seed: int = RANDOM_SEED):
+        """
+        :param factors: {参数名: (下界, 上界)}，None 为 BO_FACTORS
+        :param max_avg_t: 平均出行时间上限（分钟），None 为第一个观测（默认阈值）加 BO_AVG_T_TOL
+        :param seed: 随机数种子（初始设计与候选点）
+        """
+        self.factors = BO_FACTORS if factors is None else factors
+        self.names = list(self.factors.keys())
+        self.lb = np.array([self.factors[name][0] for name in self.names], dtype=float)
+        self.ub = np.array([self.factors[name][1] for name in self.names], dtype=float)
+        self.is_int = np.array([all(isinstance(val, int) for val in self.factors[name]) for name in self.names])
+        self.max_avg_t = max_avg_t
+        self.rng = np.random.default_rng(seed)
+
+        self.X = []  # 已评估点（缩放到 [0, 1]）
+        self.y = []  # (能耗, 平均出行时间)
+        self.points = []  # 已评估的参数点
+        self.stats = []  # 已评估点的统计数据
+
+    def to_point(self, x: np.ndarray):
+        """[0, 1] 内的向量 -> 参数点（整数参数取整）"""
+        val = self.lb + x * (self.ub - self.lb)
+        return {name: int(round(v)) if is_int else float(v) for name, v, is_int in zip(self.names, val, self.is_int)}
+
+    def to_unit(self, point: dict):
+        return (np.array([point[name] for name in self.names], dtype=float) - self.lb) / (self.ub - self.lb)
+
+    def default_point(self):
+        """consts.py 中的默认阈值"""
+        config = SimConfig()
+        return {name: getattr(config, name) for name in self.names}
+
+    def initial_design(self, num: int):
+        """默认阈值与拉丁超立方抽样"""
+        num_lhs = num - 1
+        x = (np.argsort(self.rng.random((num_lhs, len(self.names))), axis=0) + self.rng.random(
+            (num_lhs, len(self.names)))) / num_lhs
+        return [self.default_point()] + [self.to_point(row) for row in x]
+
+    def tell(self, points: list, stats: list):
+        """加入仿真结果"""
+        for point, st in zip(points, stats):
+            self.points.append(point)
+            self.stats.append(st)
+            self.X.append(self.to_unit(point))
+            self.y.append((st[OBJ_KEY], st[AVG_T_KEY]))
+        if self.max_avg_t is None:
+            self.max_avg_t = self.y[0][1] + BO_AVG_T_TOL
+
+    def best(self):
+        """
+        :return: 最优可行点的位置，无可行点时为平均出行时间最小的点
+        """
+        y = np.array(self.y)
+        feasible = y[:, 1] <= self.max_avg_t
+        if feasible.any():
+            return int(np.argmin(np.where(feasible, y[:, 0], np.inf)))
+        return int(np.argmin(y[:, 1]))
+
+    def candidates(self, num: int):
+        """候选点：一半在整个空间中均匀抽取，一半在当前最优点附近扰动"""
+        num_local = num // 2
+        center = self.X[self.best()]
+        local = np.clip(center + 0.1 * self.rng.standard_normal((num_local, len(self.names))), 0, 1)
+        return np.vstack([self.rng.random((num - num_local, len(self.names))), local])
+
+    def ask(self, q: int = BO_BATCH_SIZE, num_candidates: int = BO_NUM_CANDIDATES):
+        """
+        提议 q 个待评估的参数点（取整后与已评估点及本批已选点都不重复）
+
+        :param q: 提议点数
+        :param num_candidates: 候选点数
+        :return: [参数点]
+        """
+        X, y = [x for x in self.X], [val for val in self.y]
+        seen = set(point_key(point) for point in self.points)
+        cand = self.candidates(num_candidates)
+        # 候选点取整后再评估采集函数，使预测与实际仿真的参数一致
+        cand_points = [self.to_point(x) for x in cand]
+        cand = np.array([self.to_unit(point) for point in cand_points])
+
+        proposals = []
+        for _ in range(q):
+            Y = np.array(y)
+            gp_obj = GaussianProcess().fit(np.array(X), Y[:, 0])
+            gp_t = GaussianProcess().fit(np.array(X), Y[:, 1])
+            obj_mean, obj_std = gp_obj.predict(cand)
+            t_mean, t_std = gp_t.predict(cand)
+            feasible = Y[:, 1] <= self.max_avg_t
+            pof = prob_below(t_mean, t_std, self.max_avg_t)
+            if feasible.any():
+                acq = expected_improvement(obj_mean, obj_std, Y[feasible, 0].min()) * pof
+            else:
+                acq = pof
+            for i in np.argsort(-acq):
+                if point_key(cand_points[i]) not in seen:
+                    break
+            else:
+                break
+            proposals.append(cand_points[i])
+            seen.add(point_key(cand_points[i]))
+            # kriging believer：以预测均值作为暂时的观测
+            X.append(cand[i])
+            y.append((obj_mean[i], t_mean[i]))
+        return proposals
+
+
+def optimize_thresholds(scenario, path: str = os.path.join('sweeps', 'bayes_opt.jsonl'), factors: dict = None,
+                        num_init: int = BO_NUM_INIT, batch_size: int = BO_BATCH_SIZE, num_iters: int = BO_NUM_ITERS,
+                        max_avg_t: float = None, seed: int = RANDOM_SEED, processes: int = None, verbose: bool = VERBOSE,
+                        **sim_kwargs):
+    """
+    贝叶斯优化结合/分离阈值
+
+    :param scenario: 场景目录或 read_in / load_scenario 的返回值
+    :param path: 仿真结果文件（JSON Lines）
+    :param factors: {参数名: (下界, 上界)}，None 为 BO_FACTORS
+    :param num_init: 初始设计点数
+    :param batch_size: 每轮提议点数
+    :param num_iters: 提议轮数
+    :param max_avg_t: 平均出行时间上限（分钟），None 为默认阈值的结果加 BO_AVG_T_TOL
+    :param seed: 随机数种子
+    :param processes: 进程数，None 为 CPU 核数
+    :param verbose: 是否逐轮输出当前最优点
+    :param sim_kwargs: 其他 Sim 参数（见 sweep.run_sweep）
+    :return: ThresholdBO（points, stats, best() 为最优点）
+    """
+    bo = ThresholdBO(factors=factors, max_avg_t=max_avg_t, seed=seed)
+    points = bo.initial_design(num_init)
+    for it in range(num_iters + 1):
+        records = run_sweep(scenario, points, path, processes=processes, verbose=verbose, **sim_kwargs)
+        bo.tell(points, [record['stats'] for record in records])
+        best = bo.best()
+        if verbose:
+            print(f'iter {it}: {len(bo.points)} evaluations, best {bo.points[best]}, '
+                  f'obj {bo.y[best][0]:.3f}, avg_t {bo.y[best][1]:.3f} (max {bo.max_avg_t:.3f})')
+        if it < num_iters:
+            points = bo.ask(batch_size)
+            if len(points) == 0:
+                break
+    return bo
+
+
+if __name__ == '__main__':
+    from sim import read_in
+
+    line_info = read_in(way='total', fractile=None)
+    bo = optimize_thresholds(line_info, verbose=True)
+    best = bo.best()
+    print(f'best thresholds: {bo.points[best]}')
+    print(f'power {bo.y[best][0]:.3f} kWh, avg_t {bo.y[best][1]:.3f} min (default: {bo.y[0][0]:.3f}, {bo.y[0][1]:.3f})')
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""差分进化算子（与 geatpy soea_DE_rand_1_bin_templet 相同的 DE/rand/1/bin），供不依赖 geatpy 种群的优化驱动使用"""
+import numpy as np
+
+
+def de_rand_1_bin(pop: np.ndarray, target: int, lb: np.ndarray, ub: np.ndarray, rng: np.random.Generator,
+                  F: float = 0.5, CR: float = 0.5):
+    """
+    生成目标个体的试验个体
+
+    :param pop: 当前种群，每行一个个体
+    :param target: 目标个体的行号
+    :param lb: 决策变量下界
+    :param ub: 决策变量上界
+    :param rng: 随机数生成器
+    :param F: 差分缩放因子
+    :param CR: 交叉概率
+    :return: 取整并限制在上下界内的试验个体
+    """
+    nind, dim = pop.shape
+    candidates = [i for i in range(nind) if i != target]
+    r1, r2, r3 = rng.choice(candidates, size=3, replace=len(candidates) < 3)
+    mutant = pop[r1] + F * (pop[r2] - pop[r3])
+
+    # 二项式交叉，至少有一个变量来自变异个体
+    cross = rng.random(dim) < CR
+    cross[rng.integers(dim)] = True
+    trial = np.where(cross, mutant, pop[target])
+    return np.clip(np.round(trial), lb, ub).astype(int)
+
+
+def random_population(nind: int, lb: np.ndarray, ub: np.ndarray, rng: np.random.Generator):
+    """上下界内均匀分布的整数种群"""
+    return rng.integers(lb, np.asarray(ub) + 1, size=(nind, len(lb)))
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+岛屿模型差分进化：每个岛屿是一个独立进程，拥有自己的线路模板与常驻仿真对象，在本地串行评估；
+每隔固定代数沿环形拓扑把最优个体发送给下一个岛屿，替换其最差个体。进程间只传递决策变量与 (目标值, 约束)
+"""
+import logging
+import multiprocessing as mp
+import queue
+import numpy as np
+
+from consts import RANDOM_SEED
+from de_ops import de_rand_1_bin, random_population
+from MyProblem import MyProblem, is_better
+from opt_consts import VAR_LB, VAR_UB, ISLAND_MIGRATION_TIMEOUT
+
+
+def get_best(results: list):
+    """最优个体的位置（约束优先）"""
+    best = 0
+    for i in range(1, len(results)):
+        if not is_better(results[best], results[i]):
+            best = i
+    return best
+
+
+def get_worst(results: list):
+    """最差个体的位置（约束优先）"""
+    worst = 0
+    for i in range(1, len(results)):
+        if not is_better(results[i], results[worst]):
+            worst = i
+    return worst
+
+
+def run_island(island_id: int, prophet: np.ndarray, maxgen: int, migration_interval: int, inbox, outbox,
+               result_queue, seed, F: float = 0.5, CR: float = 0.5,
+               migration_timeout: float = ISLAND_MIGRATION_TIMEOUT):
+    """
+    单个岛屿的差分进化（在子进程中运行）
+
+    :param island_id: 岛屿编号
+    :param prophet: 初始种群
+    :param maxgen: 进化代数
+    :param migration_interval: 迁移间隔（代）
+    :param inbox: 接收上一个岛屿迁入个体的队列
+    :param outbox: 发送给下一个岛屿的队列
+    :param result_queue: 返回 (岛屿编号, 最优决策变量, (目标值, 约束), 每代最优记录)
+    :param seed: 随机数种子（np.random.SeedSequence）
+    :param F: 差分缩放因子
+    :param CR: 交叉概率
+    :param migration_timeout: 等待迁入个体的最长时间（秒），超时则本次不迁入
+    :return:
+    """
+    rng = np.random.default_rng(seed)
+    # 各岛屿并发运行，不共用 SQLite 存档
+    problem = MyProblem(PoolType=None)
+    try:
+        pop = np.array(prophet, dtype=int)
+        f, cv = problem.evalVars(pop)
+        results = list(zip(f[:, 0], cv[:, 0]))
+        best_log = []
+        for gen in range(1, maxgen + 1):
+            trials = np.array([de_rand_1_bin(pop, i, problem.lb, problem.ub, rng, F=F, CR=CR)
+                               for i in range(pop.shape[0])])
+            problem.evalVars(trials)  # 一对一选择结果记录在 problem.kept
+            pop = np.array([key for key, _ in problem.kept])
+            results = [res for _, res in problem.kept]
+
+            if migration_interval > 0 and gen % migration_interval == 0:
+                best = get_best(results)
+                outbox.put((tuple(int(val) for val in pop[best]), results[best]))
+                try:
+                    key, res = inbox.get(timeout=migration_timeout)
+                except queue.Empty:
+                    logging.warning(f'island {island_id} gen {gen}: no migrant within {migration_timeout}s '
+                                    f'(previous island failed or much slower), continue without migration')
+                    key, res = None, None
+                worst = get_worst(results)
+                if key is not None and is_better(res, results[worst]):
+                    pop[worst], results[worst] = key, res
+                    problem.kept[worst] = (key, res)
+
+            best = get_best(results)
+            best_log.append((gen, results[best][0], results[best][1]))
+            if problem.verbose:
+                print(f'island {island_id} gen {gen}: best obj {results[best][0]:.3f}, cv {results[best][1]}')
+        best = get_best(results)
+        result_queue.put((island_id, tuple(int(val) for val in pop[best]), results[best], best_log))
+    except Exception as e:
+        result_queue.put((island_id, None, None, repr(e)))  # 避免主进程一直等待
+        raise
+    finally:
+        problem.close()
+
+
+def run_islands(num_islands: int, nind: int, maxgen: int, migration_interval: int = 5, prophet: np.ndarray = None,
+                seed: int = RANDOM_SEED, migration_timeout: float = ISLAND_MIGRATION_TIMEOUT):
+    """
+    运行岛屿模型差分进化
+
+    :param num_islands: 岛屿（进程）数量
+    :param nind: 每个岛屿的种群规模
+    :param maxgen: 进化代数
+    :param migration_interval: 迁移间隔（代），0 表示不迁移
+    :param prophet: 先验个体，放入第一个岛屿的初始种群，其余个体在上下界内随机生成
+    :param seed: 随机数种子
+    :param migration_timeout: 等待迁入个体的最长时间（秒），超时则本次不迁入
+    :return: (最优决策变量, (目标值, 约束)), {岛屿编号: 每代最优记录}
+    """
+    lb, ub = np.array(VAR_LB), np.array(VAR_UB)
+
+    seeds = np.random.SeedSequence(seed).spawn(num_islands * 2)
+    ctx = mp.get_context()
+    queues = [ctx.Queue() for _ in range(num_islands)]  # queues[i]: 迁入岛屿 i 的个体
+    result_queue = ctx.Queue()
+    islands = []
+    for i in range(num_islands):
+        pop = random_population(nind, lb, ub, np.random.default_rng(seeds[num_islands + i]))
+        if i == 0 and prophet is not None:
+            prophet = np.atleast_2d(prophet)
+            pop[:prophet.shape[0]] = prophet[:nind]
+        island = ctx.Process(target=run_island, args=(
+            i, pop, maxgen, migration_interval, queues[i], queues[(i + 1) % num_islands], result_queue, seeds[i]
+        ), kwargs={'migration_timeout': migration_timeout})
+        island.start()
+        islands.append(island)
+
+    finished = [result_queue.get() for _ in range(num_islands)]
+    for island in islands:
+        island.join()
+    failed = {island_id: err for island_id, best_vars, _, err in finished if best_vars is None}
+    finished = [val for val in finished if val[1] is not None]
+    assert len(finished) > 0, f'all islands failed: {failed}'
+    best = get_best([res for _, _, res, _ in finished])
+    _, best_vars, best_res, _ = finished[best]
+    return (best_vars, best_res), {island_id: best_log for island_id, _, _, best_log in finished}
+
+
+if __name__ == '__main__':
+    NUM_ISLANDS, NIND, MAXGEN = 4, 8, 20
+    prophetVars = np.array([[1, 3, 1, 2, 3, 3, 2, 1, 12, 8, 8, 10, 10, 10, 10, 10]])
+    (best_vars, (best_obj, best_cv)), _ = run_islands(NUM_ISLANDS, NIND, MAXGEN, migration_interval=5,
+                                                      prophet=prophetVars)
+    print(f'best vars: {best_vars}, obj: {best_obj}, cv: {best_cv}')
@@ -4,9 +4,11 @@
 注意：使用多进程时，程序必须以“if __name__ == '__main__':”作为入口，
       这是multiprocessing的多进程模块的硬性要求。
 """
+import sys
 import numpy as np
 
 from MyProblem import MyProblem  # 导入自定义问题接口
+from opt_consts import ARCHIVE_PATH, RUN_ID
 
 import geatpy as ea  # import geatpy
 
@@ -16,18 +18,35 @@ import geatpy as ea  # import geatpy
 
 if __name__ == '__main__':
     # 实例化问题对象
-    problem = MyProblem(PoolType=None)  # 设置采用多线程，若修改为: PoolType = 'Process'，则表示用多进程
-    population = ea.Population(Encoding='RI', NIND=8)
+    problem = MyProblem(PoolType=None, archive_path=ARCHIVE_PATH, run_id=RUN_ID)  # 设置采用多线程，若修改为: PoolType = 'Process'，则表示用多进程
+    NIND, MAXGEN = 8, 20
+    population = ea.Population(Encoding='RI', NIND=NIND)
     # population.Chrom = np.array([[1, 2, 1, 2, 3, 3, 2, 1, 12, 8, 8, 12, 14, 11, 12, 12] for _ in range(8)])
+    prophetVars = np.array([[1, 3, 1, 2, 3, 3, 2, 1, 12, 8, 8, 10, 10, 10, 10, 10] for _ in range(NIND)])
+    if problem.archive is not None:
+        last = problem.archive.last_generation(RUN_ID, problem.fingerprint)
+        if last is not None:
+            # 断点续跑：从最后完成的一代的保留种群继续（已评估个体直接由存档返回）
+            # 代数从 0 开始编号，已完成 done_gen + 1 代；续跑时首先重新评估（由存档返回）保留种群，记为下一代
+            done_gen, prophetVars = last
+            if MAXGEN - done_gen - 1 <= 0:
+                print(f'{RUN_ID} has finished all {MAXGEN} generations')
+                problem.close()
+                sys.exit(0)
+            MAXGEN = MAXGEN - done_gen - 1
+            problem.generation = done_gen + 1
+            print(f'resume {RUN_ID} after generation {done_gen}')
+        else:
+            # 热启动：以存档中最优的可行个体作为初始种群
+            prophetVars = problem.archive.warm_start(problem.fingerprint, prophetVars)
     # 构建算法
     algorithm = ea.soea_DE_rand_1_bin_templet(
         problem,
         population,
-        MAXGEN=20,  # 最大进化代数
+        MAXGEN=MAXGEN,  # 最大进化代数
         logTras=1,  # 表示每隔多少代记录一次日志信息，0表示不记录
         trappedValue=1e-6,  # 单目标优化陷入停滞的判断阈值
         maxTrappedCount=20)  # 进化停滞计数器最大上限值
-    prophetVars = np.array([[1, 3, 1, 2, 3, 3, 2, 1, 12, 8, 8, 10, 10, 10, 10, 10] for _ in range(8)])
     # 求解
     res = ea.optimize(algorithm,
                       verbose=True,
@@ -36,3 +55,4 @@ if __name__ == '__main__':
                       outputMsg=True,
                       drawLog=False,
                       saveFlag=True)
+    problem.close()
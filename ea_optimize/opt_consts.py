@@ -2,3 +2,46 @@ LB_AVG_T = 50  # 32
 UB_AVG_T = 54  # 33
 
 UB_TRAVEL_T = 62.5
+
+SIM_MODE = 'multi_order'  # 优化时的仿真模式
+
+NUM_PERIODS = 8  # 决策变量的时段数（6:00 起每两小时一个时段）
+VAR_LB = [1] * NUM_PERIODS + [8] * NUM_PERIODS  # 决策变量下界 [dep_num + dep_duration（分钟）]
+VAR_UB = [3] * NUM_PERIODS + [15] * NUM_PERIODS  # 决策变量上界 [dep_num + dep_duration（分钟）]
+MULTI_DEC_RULE = 'up_first'  # 主线+支线决策规则
+CAN_REORG = True  # 是否允许结合/分离重组
+
+ARCHIVE_PATH = 'eval_archive.db'  # 评估存档（SQLite），None 表示不使用
+RUN_ID = 'default'  # 断点续跑标识，相同标识的运行从最后完成的一代继续
+ABORT_RULE = 'target'  # 提前终止阈值: 'target'（一对一比较的目标个体）, 'worst'（保留种群最差可行个体）, None（不终止）
+VERBOSE = False  # 是否逐代输出评估统计（统计数据始终记录在 memo_log、error_log、best_log 与存档中）
+
+USE_PREFIX_EVAL = True  # 发车方案前缀相同时从整点快照继续仿真
+PREFIX_CACHE_SIZE = 64  # 每个工作进程保留的整点快照数量
+
+REMOTE_HOST = '127.0.0.1'  # 多机评估（PoolType='Remote'）协调端监听地址，监听其他地址时必须设置共享口令
+REMOTE_TOKEN = None  # 工作端注册时校验的共享口令，None 时读取环境变量 BUS_REMOTE_TOKEN
+REMOTE_PORT = 5890  # 协调端监听端口
+REMOTE_NUM_WORKERS = 8  # 预计的工作端数量（异步驱动同时派发的任务数）
+REMOTE_TASK_TIMEOUT = 1800  # 任务领取后的最长执行时间（秒），超时重新排队
+REMOTE_MAX_RETRIES = 3  # 每个任务的最大重试次数
+REMOTE_IO_TIMEOUT = 60  # 工作端等待协调端回复的最长时间（秒）
+REMOTE_IDLE_TIMEOUT = 3600  # 有任务等待但没有工作端拉取任务超过该时间（秒）时，等待的任务以异常返回
+
+ISLAND_MIGRATION_TIMEOUT = 600  # 岛屿模型中等待上一个岛屿迁入个体的最长时间（秒），超时则本次不迁入
+
+RACING_DAYS = [2, 3, 4, 5]  # 逐轮淘汰评估使用的乘客数据日期，按加入顺序排列
+RACING_ETA = 2  # 每轮保留 1/ETA 的候选个体，并将评估日期数扩大为 ETA 倍
+
+USE_SURROGATE = False  # 代理模型预筛选：预测不可行或明显劣于目标个体的试验个体不仿真
+SURROGATE_MIN_SAMPLES = 32  # 训练样本达到该数量后才开始预筛选
+SURROGATE_MAX_SAMPLES = 500  # 训练使用的最近样本数上限（高斯过程为 O(n^3)）
+SURROGATE_KAPPA = 2.0  # 置信区间宽度（标准差倍数），只淘汰在区间内仍不可行或劣于目标的个体
+SURROGATE_AUDIT = 0.1  # 被淘汰个体中仍完整仿真的比例，用于估计淘汰个体的预测误差
+SURROGATE_NUM_PROPOSALS = 4  # 异步稳态差分进化中每个目标个体生成的候选数，按代理模型选择其一
+
+BO_NUM_INIT = 8  # 结合/分离阈值贝叶斯优化的初始设计点数（含 consts.py 中的默认阈值）
+BO_BATCH_SIZE = 4  # 每轮并行评估的提议点数 q
+BO_NUM_ITERS = 8  # 提议轮数
+BO_NUM_CANDIDATES = 2000  # 每次提议时评估采集函数的候选点数
+BO_AVG_T_TOL = 0.1  # 平均出行时间允许比默认阈值高出的分钟数
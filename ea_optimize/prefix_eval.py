@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+前缀复用评估：发车方案在前若干小时相同时，仿真在这些小时内的过程完全相同。
+在整点保存仿真快照，以仿真设置与发车方案前缀为键组成前缀树，新的方案从最深的匹配前缀处继续仿真
+"""
+from collections import OrderedDict
+
+from sim import Sim
+
+# 不改变仿真过程、只决定何时停止或是否输出的属性：恢复快照后保持本次评估的取值
+KEEP_ATTRS = ('abort_obj', 'abort_avg_t', 'print_log', 'fidelity_bias')
+
+
+class PrefixEvaluator:
+
+    def __init__(self, sim: Sim, hours: list = None, max_snapshots: int = 64):
+        """
+        前缀复用评估器
+
+        :param sim: 常驻仿真对象（每次评估前由 evaluate 重置）
+        :param hours: 保存快照的整点（小时），None 表示首班车之后至末班车的每个整点
+        :param max_snapshots: 最多保留的快照数量，超出时淘汰最久未使用的快照
+        """
+        self.sim = sim
+        first_hour, last_hour = int(sim.config.SIM_START_T / 3600), int(sim.config.LAST_BUS_T / 3600)
+        self.hours = sorted(hours) if hours is not None else list(range(first_hour + 1, last_hour + 1))
+        self.first_hour = first_hour
+        self.max_snapshots = max_snapshots
+        # 前缀树：键为 (仿真设置, 6:00 至快照整点前各小时的 (发车数量, 发车间隔))，值为该整点的快照
+        self.snapshots = OrderedDict()
+        self.hits, self.misses = 0, 0
+        self.saved_t = 0  # 累计跳过的仿真时长（秒）
+
+    def get_settings(self):
+        """
+        决定仿真过程的设置：线路模板（含需求种子与保真度抽样）、完整的仿真参数、仿真模式、决策规则、
+        结合/分离开关与转向随机数种子，只有设置相同的快照才能复用
+
+        :return: tuple
+        """
+        sim = self.sim
+        return (sim.template.cache_key, sim.config, sim.sim_mode, getattr(sim, 'multi_dec_rule', None),
+                sim.can_reorg, sim.seed, sim.route_seed, sim.get_record)
+
+    def get_prefix(self, dep_num_list: list, dep_duration_list: list, hour: int, settings: tuple = None):
+        """快照整点 hour 之前的发车方案前缀（含仿真设置）"""
+        settings = self.get_settings() if settings is None else settings
+        return settings, tuple((dep_num_list[h], dep_duration_list[h]) for h in range(self.first_hour, hour))
+
+    def evaluate(self, dep_num_list: list, dep_duration_list: list, **sim_attrs):
+        """
+        评估一个发车方案，结束后可通过 self.sim.get_statistics() 获取结果
+
+        :param dep_num_list: 各小时发车数量
+        :param dep_duration_list: 各小时发车间隔
+        :param sim_attrs: 重置后设置的仿真属性，如 abort_obj、abort_avg_t
+        :return: Sim
+        """
+        sim = self.sim
+        sim.reset(dep_num_list=dep_num_list, dep_duration_list=dep_duration_list)
+        settings = self.get_settings()
+        kept = {key: getattr(sim, key) for key in KEEP_ATTRS}
+
+        # 最深的匹配前缀
+        start = 0
+        for i in range(len(self.hours) - 1, -1, -1):
+            prefix = self.get_prefix(dep_num_list, dep_duration_list, self.hours[i], settings)
+            if prefix in self.snapshots:
+                self.snapshots.move_to_end(prefix)
+                sim.restore(self.snapshots[prefix])
+                sim.__dict__.update(kept)
+                sim.dep_decider.dep_num_list = list(dep_num_list)
+                sim.dep_decider.dep_duration_list = list(dep_duration_list)
+                self.hits += 1
+                self.saved_t += sim.t - sim.config.SIM_START_T
+                start = i + 1
+                break
+        else:
+            self.misses += 1
+        for key, val in sim_attrs.items():
+            setattr(sim, key, val)
+
+        # 依次运行到之后的各整点并保存快照，提前终止或仿真结束后不再保存
+        for hour in self.hours[start:]:
+            if not sim.run(until=hour * 3600):
+                return sim
+            self.put(self.get_prefix(dep_num_list, dep_duration_list, hour, settings), sim.snapshot())
+        sim.run()
+        return sim
+
+    def put(self, prefix: tuple, snap: dict):
+        """存入快照"""
+        self.snapshots[prefix] = snap
+        self.snapshots.move_to_end(prefix)
+        while len(self.snapshots) > self.max_snapshots:
+            self.snapshots.popitem(last=False)
+
+    def clear(self):
+        """清空快照（释放内存；不同设置的快照以不同的键保存，设置变化后无需清空）"""
+        self.snapshots.clear()
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+跨日期的逐轮淘汰评估（successive halving）：所有试验个体先在第一个日期上评估，在相同日期上不胜过其目标个体、
+或不在最优的 1/eta 中的个体被淘汰，幸存个体再加入更多日期评估，如此重复直到用完所有日期或只剩一个个体。
+被淘汰个体的约束违反记为大于其目标个体，一对一选择中必然保留目标个体；初始种群在全部日期上评估，
+因此保留种群的结果总是全部日期上的结果，与完整评估的试验个体可直接比较。
+个体在各日期上的结果按日期缓存与存档，目标值取已评估日期的平均值，约束取最大值
+"""
+import math
+import numpy as np
+
+from MyProblem import MyProblem, is_better
+from opt_consts import ARCHIVE_PATH, RUN_ID, RACING_DAYS, RACING_ETA
+
+import geatpy as ea
+
+
+def rank_key(res: tuple):
+    """与 is_better 一致的排序键：可行个体在前，不可行个体按约束违反、可行个体按目标值升序"""
+    return res[1] > 0, max(res[1], 0), res[0]
+
+
+class RacingProblem(MyProblem):
+
+    def __init__(self, PoolType, days: list = None, eta: int = RACING_ETA, archive_path=None, run_id=None):
+        """
+        :param PoolType: 同 MyProblem
+        :param days: 乘客数据日期，第一个日期为默认日期（用于存档中的种群记录）
+        :param eta: 每轮保留 1/eta 的候选个体，评估日期数扩大为 eta 倍
+        :param archive_path: 同 MyProblem
+        :param run_id: 同 MyProblem
+        """
+        self.days = list(RACING_DAYS if days is None else days)
+        assert eta >= 2 and len(self.days) > 0
+        self.eta = eta
+        MyProblem.__init__(self, PoolType, archive_path=archive_path, run_id=run_id, day=self.days[0])
+        self.race_log = []  # [(代数, [(轮次, 候选数, 日期数, 仿真次数)])]
+        # 工作进程按需读取其他日期的模板，先在主进程中构建以写入预处理缓存
+        for day in self.days:
+            self.get_day_fingerprint(day)
+
+    def evalVars(self, Vars):
+        keys = [tuple(int(val) for val in np.round(Vars[i, :])) for i in range(Vars.shape[0])]
+        # 初始种群没有目标个体，在全部日期上评估，保证保留种群的结果都是全部日期上的结果
+        if self.kept is None or len(self.kept) != len(keys):
+            targets = None
+        else:
+            targets = {}  # {试验个体: [(目标个体, 目标个体的结果)]}，同一染色体可能出现在多个位置
+            for key, target in zip(keys, self.kept):
+                targets.setdefault(key, []).append(target)
+
+        per_day = {key: [] for key in keys}  # {决策变量: [各日期的 (目标值, 约束)]}
+        alive = list(per_day)
+        eliminated = {}  # {决策变量: 被淘汰时的 (目标值, 约束)}
+        stages = []
+        num_days, stage = 0, 0
+        while True:
+            new_days = self.days[num_days:min(len(self.days), self.eta ** stage)] if targets is not None \
+                else self.days
+            num_sims = 0
+            for day in new_days:
+                # 各日期的累计能耗不同，不使用提前终止阈值
+                results, todo, _ = self.evaluate(alive, day=day)
+                num_sims += len(todo)
+                for key in alive:
+                    per_day[key].append(results[key])
+            num_days += len(new_days)
+            stages.append((stage, len(alive), num_days, num_sims))
+            agg = {key: self.aggregate(per_day[key]) for key in alive}
+            # 幸存个体总是评估到全部日期，与在全部日期上评估的目标个体比较
+            if num_days == len(self.days):
+                break
+
+            # 与目标个体在相同日期上比较（目标个体在全部日期上评估过，结果来自缓存），不胜过所有目标的个体淘汰
+            target_agg = self.evaluate_days(set(target for key in alive for target, _ in targets[key]),
+                                            self.days[:num_days])
+            beats = [key for key in alive if any(is_better(agg[key], target_agg[target])
+                                                 for target, _ in targets[key])]
+            # 约束优先排序，保留最优的 1/eta
+            ranked = sorted(beats, key=lambda key: rank_key(agg[key]))
+            survivors = set(ranked[:math.ceil(len(alive) / self.eta)])
+            for key in alive:
+                if key not in survivors:
+                    eliminated[key] = self.losing_result(agg[key], [res for _, res in targets[key]])
+            alive = [key for key in alive if key in survivors]
+            if len(alive) == 0:
+                break
+            stage += 1
+
+        self.race_log.append((self.generation, stages))
+        print(f'gen {self.generation}: ' + ', '.join(
+            f'stage {s} candidates {n} days {d} sims {k}' for s, n, d, k in stages))
+
+        agg.update(eliminated)
+        result_list = [agg[key] for key in keys]
+        self.update_kept(keys, result_list)
+
+        f = np.array([val[0] for val in result_list]).reshape((-1, 1))
+        CV = np.array([val[1] for val in result_list]).reshape((-1, 1))
+        return f, CV
+
+    def evaluate_days(self, keys, days: list):
+        """个体在给定日期上的汇总结果（未评估过的日期会仿真）"""
+        per_day = {key: [] for key in keys}
+        for day in days:
+            results, _, _ = self.evaluate(list(per_day), day=day)
+            for key in per_day:
+                per_day[key].append(results[key])
+        return {key: self.aggregate(val) for key, val in per_day.items()}
+
+    @staticmethod
+    def losing_result(res: tuple, target_results: list):
+        """
+        被淘汰个体的结果：约束违反大于所有目标个体，一对一选择中必然不被选择
+
+        :param res: 被淘汰时在已评估日期上的 (目标值, 约束)
+        :param target_results: 与之比较的目标个体的 (目标值, 约束)
+        :return:
+        """
+        return res[0], max([res[1]] + [target[1] for target in target_results] + [0]) + 1
+
+    @staticmethod
+    def aggregate(results: list):
+        """多个日期上的结果：平均目标值，最大约束违反"""
+        return float(np.mean([res[0] for res in results])), max(res[1] for res in results)
+
+
+if __name__ == '__main__':
+    problem = RacingProblem(PoolType='Process', archive_path=ARCHIVE_PATH, run_id=RUN_ID)
+    NIND, MAXGEN = 8, 20
+    population = ea.Population(Encoding='RI', NIND=NIND)
+    prophetVars = np.array([[1, 3, 1, 2, 3, 3, 2, 1, 12, 8, 8, 10, 10, 10, 10, 10] for _ in range(NIND)])
+    algorithm = ea.soea_DE_rand_1_bin_templet(
+        problem,
+        population,
+        MAXGEN=MAXGEN,  # 最大进化代数
+        logTras=1,  # 表示每隔多少代记录一次日志信息，0表示不记录
+        trappedValue=1e-6,  # 单目标优化陷入停滞的判断阈值
+        maxTrappedCount=20)  # 进化停滞计数器最大上限值
+    res = ea.optimize(algorithm,
+                      verbose=True,
+                      prophet=prophetVars,
+                      drawing=1,
+                      outputMsg=True,
+                      drawLog=False,
+                      saveFlag=True)
+    problem.close()
@@ -0,0 +1,404 @@
+# -*- coding: utf-8 -*-
+"""
+多机评估：协调端（MyProblem, PoolType='Remote'）监听 TCP 端口，工作端在各台机器上构建线路模板与常驻仿真对象后注册，
+循环拉取染色体、运行 subAimFunc 并推送结果。
+
+消息格式：4 字节大端长度 + UTF-8 JSON
+    worker -> coordinator: {'type': 'register', 'worker': 名称, 'fingerprint': 场景指纹, 'token': 共享口令}
+                           {'type': 'pull'}
+                           {'type': 'push', 'task': 编号, 'result': [目标值, 约束, 统计数据, 运行时间]}
+                           {'type': 'error', 'task': 编号, 'error': 异常信息}
+    coordinator -> worker: {'type': 'welcome'} / {'type': 'reject', 'reason': 原因}
+                           {'type': 'task', 'task': 编号, 'var': 决策变量, 'abort_obj': 提前终止阈值, 'day': 日期}
+                           {'type': 'wait', 'delay': 秒} / {'type': 'stop'} / {'type': 'ok'}
+
+超时或断开连接的任务由监视线程重新排队，超过最大重试次数、或长时间没有工作端拉取任务时以异常返回。
+协调端默认只监听 127.0.0.1；监听其他地址时必须设置共享口令（REMOTE_TOKEN 或环境变量 BUS_REMOTE_TOKEN），
+工作端注册时校验
+
+启动工作端: python remote.py <coordinator host> [port]
+"""
+import collections
+import hmac
+import json
+import os
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+
+from archive import _to_json
+from opt_consts import REMOTE_PORT, REMOTE_TASK_TIMEOUT, REMOTE_MAX_RETRIES, REMOTE_IO_TIMEOUT, REMOTE_TOKEN, \
+    REMOTE_IDLE_TIMEOUT
+
+_HEADER = struct.Struct('>I')
+_LOOPBACK = ('127.0.0.1', 'localhost', '::1')
+
+
+def get_token(token: str = None):
+    """共享口令：参数、REMOTE_TOKEN、环境变量 BUS_REMOTE_TOKEN 依次取第一个非空值"""
+    for val in (token, REMOTE_TOKEN, os.environ.get('BUS_REMOTE_TOKEN')):
+        if val:
+            return val
+    return None
+
+
+def send_msg(sock: socket.socket, msg: dict):
+    """发送一条消息"""
+    data = json.dumps(msg, default=_to_json).encode('utf-8')
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _recv_exact(sock: socket.socket, size: int):
+    buf = b''
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            raise ConnectionError('connection closed')
+        buf += chunk
+    return buf
+
+
+def recv_msg(sock: socket.socket):
+    """接收一条消息"""
+    size, = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return json.loads(_recv_exact(sock, size).decode('utf-8'))
+
+
+class _Task:
+
+    def __init__(self, task_id: int, args: tuple, callback, error_callback):
+        self.task_id = task_id
+        self.args = args
+        self.callback = callback
+        self.error_callback = error_callback
+        self.attempts = 0
+        self.deadline = None
+        self.conn = None  # 当前领取该任务的连接
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    """每个工作端连接一个线程"""
+
+    def handle(self):
+        pool = self.server.pool
+        try:
+            msg = recv_msg(self.request)
+            if msg.get('type') != 'register' or not pool.check_token(msg.get('token')):
+                send_msg(self.request, {'type': 'reject', 'reason': 'invalid token'})
+                return
+            if msg.get('fingerprint') != pool.fingerprint:
+                send_msg(self.request, {'type': 'reject', 'reason': 'scenario fingerprint mismatch'})
+                return
+            pool.register(self, msg.get('worker'))
+            send_msg(self.request, {'type': 'welcome'})
+            while True:
+                msg = recv_msg(self.request)
+                if msg['type'] == 'pull':
+                    send_msg(self.request, pool.lease(self))
+                elif msg['type'] == 'push':
+                    pool.complete(msg['task'], tuple(msg['result']), self)
+                    send_msg(self.request, {'type': 'ok'})
+                elif msg['type'] == 'error':
+                    pool.fail(msg['task'], msg['error'], self)
+                    send_msg(self.request, {'type': 'ok'})
+        except (ConnectionError, OSError, ValueError):
+            pass
+        finally:
+            pool.unregister(self)
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class RemotePool:
+
+    def __init__(self, fingerprint: str, host: str = '127.0.0.1', port: int = REMOTE_PORT,
+                 task_timeout: float = REMOTE_TASK_TIMEOUT, max_retries: int = REMOTE_MAX_RETRIES, token: str = None,
+                 idle_timeout: float = REMOTE_IDLE_TIMEOUT):
+        """
+        协调端：接口与 multiprocessing.Pool 的 map / apply_async 相同，任务由远程工作端执行 subAimFunc
+
+        :param fingerprint: 场景指纹，工作端的指纹不一致时拒绝注册
+        :param host: 监听地址，非本机地址时必须设置共享口令
+        :param port: 监听端口，0 为任意空闲端口（实际地址见 self.address）
+        :param task_timeout: 任务领取后的最长执行时间（秒），超时重新排队
+        :param max_retries: 每个任务的最大重试次数
+        :param token: 共享口令，None 时见 get_token
+        :param idle_timeout: 有任务等待但没有工作端拉取超过该时间（秒）时，等待的任务以异常返回
+        """
+        self.fingerprint = fingerprint
+        self.task_timeout = task_timeout
+        self.max_retries = max_retries
+        self.token = get_token(token)
+        assert self.token is not None or host in _LOOPBACK, \
+            f'a shared token (REMOTE_TOKEN or BUS_REMOTE_TOKEN) is required to listen on {host}'
+        self.idle_timeout = idle_timeout
+        self.last_pull = time.time()  # 工作端最近一次拉取任务的时间
+
+        self.cond = threading.Condition()
+        self.pending = collections.deque()  # 等待领取的任务
+        self.leased = {}  # {任务编号: _Task}
+        self.workers = {}  # {连接: 工作端名称}
+        self.next_task = 0
+        self.closed = False
+
+        self.server = _Server((host, port), _Handler)
+        self.server.pool = self
+        self.address = self.server.server_address
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        # 监视线程：不依赖工作端拉取任务，按时将超时的任务重新排队
+        self.watchdog = threading.Thread(target=self._watch, daemon=True)
+        self.watchdog.start()
+
+    def check_token(self, token):
+        if self.token is None:
+            return True
+        return isinstance(token, str) and hmac.compare_digest(token.encode(), self.token.encode())
+
+    @property
+    def num_workers(self):
+        """当前已注册的工作端数量"""
+        with self.cond:
+            return len(self.workers)
+
+    def register(self, conn, name: str):
+        with self.cond:
+            self.workers[conn] = name
+            self.cond.notify_all()
+
+    def unregister(self, conn):
+        """工作端断开：其领取的任务重新排队"""
+        failed = []
+        with self.cond:
+            self.workers.pop(conn, None)
+            for task in list(self.leased.values()):
+                if task.conn is conn:
+                    failed += self._retry(task, 'worker disconnected')
+        self._notify_failed(failed)
+
+    def _retry(self, task: _Task, reason: str):
+        """
+        任务重新排队（需持有锁）
+
+        :return: 超过最大重试次数时为 [(任务, 异常)]，由调用方在释放锁后通知
+        """
+        self.leased.pop(task.task_id, None)
+        task.conn, task.deadline = None, None
+        self.cond.notify_all()
+        if task.attempts > self.max_retries:
+            return [(task, RuntimeError(f'task {task.task_id} failed {task.attempts} times: {reason}'))]
+        self.pending.appendleft(task)
+        return []
+
+    def _expire(self, now: float):
+        """
+        超时的任务重新排队；有任务等待但长时间没有工作端拉取时，等待的任务全部失败（需持有锁）
+
+        :return: [(任务, 异常)]
+        """
+        failed = []
+        for task in list(self.leased.values()):
+            if task.deadline < now:
+                failed += self._retry(task, 'timeout')
+        if len(self.pending) > 0 and now - self.last_pull > self.idle_timeout:
+            error = RuntimeError(f'no worker pulled tasks for {now - self.last_pull:.0f}s '
+                                 f'({len(self.workers)} workers registered)')
+            failed += [(task, error) for task in self.pending]
+            self.pending.clear()
+        return failed
+
+    @staticmethod
+    def _notify_failed(failed: list):
+        """以异常调用失败任务的 error_callback（不持有锁）"""
+        for task, error in failed:
+            if task.error_callback is not None:
+                task.error_callback(error)
+
+    def _watch(self):
+        interval = max(0.05, min(1.0, self.task_timeout / 4, self.idle_timeout / 4))
+        while True:
+            with self.cond:
+                self.cond.wait(interval)
+                if self.closed:
+                    return
+                failed = self._expire(time.time())
+            self._notify_failed(failed)
+
+    def lease(self, conn):
+        """分配一个任务给工作端"""
+        with self.cond:
+            if self.closed:
+                return {'type': 'stop'}
+            now = time.time()
+            self.last_pull = now
+            if len(self.pending) == 0:
+                return {'type': 'wait', 'delay': 0.5}
+            task = self.pending.popleft()
+            task.attempts += 1
+            task.conn, task.deadline = conn, now + self.task_timeout
+            self.leased[task.task_id] = task
+            i, var, abort_obj = task.args[:3]
+            day = task.args[3] if len(task.args) > 3 else None
+            return {'type': 'task', 'task': task.task_id, 'var': [int(val) for val in var], 'abort_obj': abort_obj,
+                    'day': day}
+
+    def complete(self, task_id: int, result: tuple, conn=None):
+        """
+        工作端返回结果：接受当前领取该任务的连接的结果；已超时重新排队、尚未被再次领取的任务接受先前领取者的结果，
+        已被其他连接领取的任务忽略该结果（等待新的领取者）
+
+        :param task_id: 任务编号
+        :param result: subAimFunc 的返回值
+        :param conn: 返回结果的连接，None 时不检查
+        :return:
+        """
+        with self.cond:
+            task = self.leased.get(task_id)
+            if task is not None:
+                if conn is not None and task.conn is not conn:
+                    return
+                del self.leased[task_id]
+            else:
+                for i, val in enumerate(self.pending):
+                    if val.task_id == task_id:
+                        task = val
+                        del self.pending[i]
+                        break
+            if task is None:
+                return
+            self.cond.notify_all()
+        if task.callback is not None:
+            task.callback(result)
+
+    def fail(self, task_id: int, error: str, conn=None):
+        """
+        工作端报告任务出错：只处理当前领取该任务的连接的报告，超时后被重新分配的任务不受先前领取者影响
+
+        :param task_id: 任务编号
+        :param error: 错误信息
+        :param conn: 报告的连接，None 时不检查
+        :return:
+        """
+        failed = []
+        with self.cond:
+            task = self.leased.get(task_id)
+            if task is not None and (conn is None or task.conn is conn):
+                failed = self._retry(task, error)
+        self._notify_failed(failed)
+
+    def apply_async(self, func, args: tuple = (), callback=None, error_callback=None):
+        """
+        提交一个任务（func 必须为 subAimFunc，由工作端执行）
+
+        :param func: subAimFunc
+        :param args: (subAimFunc 的参数, )
+        :param callback: 完成时以结果调用（在通信线程中）
+        :param error_callback: 失败时以异常调用
+        :return:
+        """
+        with self.cond:
+            task = _Task(self.next_task, args[0], callback, error_callback)
+            self.next_task += 1
+            if len(self.pending) == 0 and len(self.leased) == 0:
+                self.last_pull = time.time()  # 空闲后提交的第一个任务从现在开始计算等待时间
+            self.pending.append(task)
+            self.cond.notify_all()
+
+    def map(self, func, iterable):
+        """阻塞直到所有任务完成，按顺序返回结果"""
+        args = list(iterable)
+        results, errors = [None] * len(args), []
+        done = threading.Semaphore(0)
+
+        def make_callback(i):
+            def callback(result):
+                results[i] = result
+                done.release()
+            return callback
+
+        def error_callback(e):
+            errors.append(e)
+            done.release()
+
+        for i, arg in enumerate(args):
+            self.apply_async(func, (arg, ), callback=make_callback(i), error_callback=error_callback)
+        for _ in args:
+            done.acquire()
+        if errors:
+            raise errors[0]
+        return results
+
+    def close(self):
+        """通知工作端停止（下一次拉取时）并停止监听"""
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def join(self):
+        # 等待在线的工作端收到停止消息
+        deadline = time.time() + REMOTE_IO_TIMEOUT
+        while self.num_workers > 0 and time.time() < deadline:
+            time.sleep(0.1)
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def run_worker(host: str, port: int = REMOTE_PORT, name: str = None, max_reconnects: int = 10, token: str = None):
+    """
+    工作端：构建线路模板与常驻仿真对象，连接协调端循环拉取任务
+
+    :param host: 协调端地址
+    :param port: 协调端端口
+    :param name: 工作端名称，默认为主机名与进程号
+    :param max_reconnects: 连续连接失败的最大次数
+    :param token: 共享口令，None 时见 get_token
+    :return: 完成的任务数
+    """
+    import numpy as np
+    from MyProblem import MyProblem, subAimFunc
+
+    problem = MyProblem(PoolType=None)  # 在本进程中构建常驻仿真对象
+    name = name if name is not None else f'{socket.gethostname()}-{os.getpid()}'
+    num_done, failures = 0, 0
+    try:
+        while failures <= max_reconnects:
+            try:
+                with socket.create_connection((host, port), timeout=REMOTE_IO_TIMEOUT) as sock:
+                    send_msg(sock, {'type': 'register', 'worker': name, 'fingerprint': problem.fingerprint,
+                                    'token': get_token(token)})
+                    reply = recv_msg(sock)
+                    if reply['type'] != 'welcome':
+                        raise RuntimeError(f'worker {name} rejected: {reply.get("reason")}')
+                    failures = 0
+                    while True:
+                        send_msg(sock, {'type': 'pull'})
+                        msg = recv_msg(sock)
+                        if msg['type'] == 'stop':
+                            return num_done
+                        if msg['type'] == 'wait':
+                            time.sleep(msg['delay'])
+                            continue
+                        try:
+                            result = subAimFunc((msg['task'], np.array(msg['var']), msg['abort_obj'],
+                                                 msg.get('day')))
+                            send_msg(sock, {'type': 'push', 'task': msg['task'], 'result': list(result)})
+                            num_done += 1
+                        except Exception as e:
+                            send_msg(sock, {'type': 'error', 'task': msg['task'], 'error': repr(e)})
+                        recv_msg(sock)
+            except (ConnectionError, socket.timeout, OSError):
+                failures += 1
+                time.sleep(min(2 ** failures, 30))
+        return num_done
+    finally:
+        problem.close()
+
+
+if __name__ == '__main__':
+    run_worker(sys.argv[1], port=int(sys.argv[2]) if len(sys.argv) > 2 else REMOTE_PORT)
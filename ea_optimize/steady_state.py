@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+异步稳态差分进化：没有代的同步屏障，任一评估返回后立即按 DE/rand/1/bin 生成新的试验个体并派发，
+返回的结果与其目标个体一对一比较（约束优先，与 MyProblem 相同），所有工作进程始终保持忙碌。
+编码、约束与评估函数与 MyProblem / subAimFunc 相同，评估结果同样写入缓存与存档
+"""
+import queue
+import sys
+import numpy as np
+
+from de_ops import de_rand_1_bin
+from MyProblem import MyProblem, subAimFunc, is_better
+from opt_consts import ABORT_RULE, ARCHIVE_PATH, RUN_ID, SURROGATE_NUM_PROPOSALS
+
+
+class SteadyStateDE:
+
+    def __init__(self, problem: MyProblem, prophet: np.ndarray, max_trials: int, F: float = 0.5, CR: float = 0.5,
+                 seed: int = None):
+        """
+        异步稳态差分进化
+
+        :param problem: MyProblem（PoolType 为 'Process' 或 'Thread' 时异步评估，None 时逐个评估）
+        :param prophet: 初始种群，每行一个个体
+        :param max_trials: 派发的试验个体总数（不含初始种群）
+        :param F: 差分缩放因子
+        :param CR: 交叉概率
+        :param seed: 随机数种子
+        """
+        self.problem = problem
+        self.pop = np.array(prophet, dtype=int)
+        self.res = [None] * self.pop.shape[0]  # 各位置个体的 (目标值, 约束)
+        self.max_trials = max_trials
+        self.F, self.CR = F, CR
+        self.rng = np.random.default_rng(seed)
+
+        self.results = queue.Queue()  # 工作进程回调 -> 主线程 (任务编号, 结果)
+        self.in_flight = {}  # {任务编号: ([目标位置], 决策变量)}，同一决策变量只派发一次，返回后与各目标个体比较
+        self.in_flight_keys = {}  # {决策变量: 任务编号}
+        self.next_task = 0
+        self.num_trials = 0
+        self.num_folded = 0
+        self.best_log = []  # [(已合并结果数, 最优目标值, 约束)]
+
+    @property
+    def nind(self):
+        return self.pop.shape[0]
+
+    def get_abort_obj(self, target: int):
+        """提前终止阈值，规则同 MyProblem.get_abort_objs"""
+        if ABORT_RULE is None or self.res[target] is None:
+            return None
+        if ABORT_RULE == 'target':
+            return self.res[target][0] if self.res[target][1] <= 0 else None
+        assert ABORT_RULE == 'worst'
+        if any(res is None or res[1] > 0 for res in self.res):
+            return None
+        return max(res[0] for res in self.res)
+
+    def dispatch(self, target: int, key: tuple):
+        """派发一个个体；已评估过的个体直接合并，正在评估的个体等待其结果，均不占用工作进程"""
+        res = self.problem.lookup(key)
+        if res is not None:
+            self.fold(target, key, res)
+            return
+        if key in self.in_flight_keys:
+            self.in_flight[self.in_flight_keys[key]][0].append(target)
+            return
+        task = self.next_task
+        self.next_task += 1
+        self.in_flight[task] = ([target], key)
+        self.in_flight_keys[key] = task
+        args = (task, np.array(key), self.get_abort_obj(target))
+        if self.problem.PoolType is None:
+            self.results.put((task, subAimFunc(args)))
+        else:
+            self.problem.pool.apply_async(subAimFunc, (args, ),
+                                          callback=lambda result, task=task: self.results.put((task, result)),
+                                          error_callback=lambda e, task=task: self.results.put((task, e)))
+
+    def propose(self, target: int):
+        """生成目标个体的试验个体；启用代理模型时生成多个候选，选择预测最有希望的一个"""
+        surrogate = self.problem.surrogate
+        num = SURROGATE_NUM_PROPOSALS if surrogate is not None and surrogate.ready else 1
+        candidates = [tuple(int(val) for val in de_rand_1_bin(self.pop, target, self.problem.lb, self.problem.ub,
+                                                               self.rng, F=self.F, CR=self.CR))
+                      for _ in range(num)]
+        return candidates[surrogate.propose(candidates)] if num > 1 else candidates[0]
+
+    def fold(self, target: int, key: tuple, res: tuple):
+        """合并一个评估结果：不劣于当前目标个体（或该位置尚无结果）时替换"""
+        if self.res[target] is None or is_better(res, self.res[target]):
+            self.pop[target] = key
+            self.res[target] = res
+        self.num_folded += 1
+        if self.num_folded % self.nind == 0:
+            self.log()
+
+    def get_best(self):
+        """当前种群中最优个体的位置（约束优先）"""
+        best = None
+        for i in range(self.nind):
+            if self.res[i] is not None and (best is None or not is_better(self.res[best], self.res[i])):
+                best = i
+        return best
+
+    def log(self):
+        """记录当前最优个体，并将当前种群作为一代写入存档（用于断点续跑）"""
+        problem = self.problem
+        best = self.get_best()
+        self.best_log.append((self.num_folded, self.res[best][0], self.res[best][1]))
+        if problem.verbose:
+            print(f'folded {self.num_folded}: best obj {self.res[best][0]:.3f}, cv {self.res[best][1]}, '
+                  f'in flight {len(self.in_flight)}')
+        if problem.archive is not None:
+            problem.archive.record_generation(problem.run_id, problem.fingerprint, problem.generation,
+                                              [tuple(int(val) for val in key) for key in self.pop])
+        if problem.surrogate is not None:
+            problem.surrogate.end_generation(problem.generation)
+        problem.generation += 1
+
+    def run(self):
+        """
+        运行至派发 max_trials 个试验个体且全部返回
+
+        :return: (最优决策变量, (目标值, 约束))
+        """
+        for i in range(self.nind):
+            self.dispatch(i, tuple(int(val) for val in self.pop[i]))
+
+        target = 0
+        while True:
+            # 保持每个工作进程都有任务
+            while len(self.in_flight) < self.problem.num_workers and self.num_trials < self.max_trials:
+                self.num_trials += 1
+                self.dispatch(target, self.propose(target))
+                target = (target + 1) % self.nind
+            if len(self.in_flight) == 0:
+                break
+
+            task, result = self.results.get()
+            if isinstance(result, BaseException):
+                raise result
+            targets, key = self.in_flight.pop(task)
+            del self.in_flight_keys[key]
+            self.problem.store(key, result)
+            self.fold(targets[0], key, result[:2])
+            for target_i in targets[1:]:
+                if result[2].get('aborted') == 'obj':
+                    # 能耗阈值只对派发时的目标个体有效，其他目标个体重新派发
+                    self.dispatch(target_i, key)
+                else:
+                    self.fold(target_i, key, result[:2])
+
+        best = self.get_best()
+        return tuple(int(val) for val in self.pop[best]), self.res[best]
+
+
+if __name__ == '__main__':
+    # 多进程时程序必须以 if __name__ == '__main__': 作为入口
+    problem = MyProblem(PoolType='Process', archive_path=ARCHIVE_PATH, run_id=RUN_ID)
+    NIND, MAXGEN = 8, 20
+    prophetVars = np.array([[1, 3, 1, 2, 3, 3, 2, 1, 12, 8, 8, 10, 10, 10, 10, 10] for _ in range(NIND)])
+    if problem.archive is not None:
+        last = problem.archive.last_generation(RUN_ID, problem.fingerprint)
+        if last is not None:
+            # 断点续跑：从最后记录的种群继续
+            # 第 0 代为初始种群，之后每 NIND 个试验个体记为一代，与 main.py 相同：续跑时重新合并（由存档返回）保留种群，记为下一代
+            done_gen, prophetVars = last
+            if MAXGEN - done_gen - 1 <= 0:
+                print(f'{RUN_ID} has finished all {MAXGEN} generations')
+                problem.close()
+                sys.exit(0)
+            MAXGEN = MAXGEN - done_gen - 1
+            problem.generation = done_gen + 1
+            print(f'resume {RUN_ID} after generation {done_gen}')
+        else:
+            # 热启动：以存档中最优的可行个体作为初始种群
+            prophetVars = problem.archive.warm_start(problem.fingerprint, prophetVars)
+    # 试验个体总数与 MAXGEN 代（含初始种群）的同步差分进化相同
+    driver = SteadyStateDE(problem, prophetVars, max_trials=NIND * (MAXGEN - 1))
+    best_vars, (best_obj, best_cv) = driver.run()
+    print(f'best vars: {best_vars}, obj: {best_obj}, cv: {best_cv}')
+    problem.close()
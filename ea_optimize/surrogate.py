@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+代理模型预筛选：以已完整仿真的个体训练高斯过程回归（纯 numpy），由 16 维发车方案预测能耗与平均出行时间，
+预测为不可行或明显劣于目标个体的试验个体不再仿真。每代记录预测误差，用于判断代理模型是否可信。
+因出行时间约束提前终止的个体以终止时的出行时间下界（不低于约束上界）作为出行时间的样本，只用于出行时间模型，
+使不可行区域不会因缺少样本而被预测为可行；因能耗超过阈值终止的个体不缓存（见 MyProblem.store），也不加入
+"""
+import numpy as np
+
+from opt_consts import LB_AVG_T, UB_AVG_T, SURROGATE_MIN_SAMPLES, SURROGATE_MAX_SAMPLES, SURROGATE_KAPPA, \
+    SURROGATE_AUDIT
+
+OBJ_KEY = 'power consumption(condition, kWh)'
+AVG_T_KEY = 'avg_travel_t(full, min)'
+
+
+class GaussianProcess:
+
+    def __init__(self, length_scales=(0.25, 0.5, 1.0, 2.0, 4.0), noises=(1e-4, 1e-2, 1e-1)):
+        """
+        RBF 核的高斯过程回归，输入需预先缩放到 [0, 1]，输出标准化后拟合；
+        长度尺度与噪声在候选值中按边际似然选取
+
+        :param length_scales: 长度尺度候选值
+        :param noises: 噪声方差候选值（相对于标准化后的输出）
+        """
+        self.length_scales = length_scales
+        self.noises = noises
+        self.X = None
+        self.y_mean, self.y_std = 0., 1.
+        self.length_scale, self.noise = None, None
+        self.L, self.alpha = None, None
+
+    @staticmethod
+    def kernel(A: np.ndarray, B: np.ndarray, length_scale: float):
+        sq_dist = (A ** 2).sum(1)[:, None] + (B ** 2).sum(1)[None, :] - 2 * A @ B.T
+        return np.exp(-0.5 * np.maximum(sq_dist, 0) / length_scale ** 2)
+
+    def fit(self, X: np.ndarray, y: np.ndarray):
+        X, y = np.asarray(X, dtype=float), np.asarray(y, dtype=float)
+        self.X = X
+        self.y_mean = y.mean()
+        self.y_std = y.std() if y.std() > 0 else 1.
+        yn = (y - self.y_mean) / self.y_std
+        best = None
+        for length_scale in self.length_scales:
+            K = self.kernel(X, X, length_scale)
+            for noise in self.noises:
+                try:
+                    L = np.linalg.cholesky(K + noise * np.eye(len(X)))
+                except np.linalg.LinAlgError:
+                    continue
+                alpha = np.linalg.solve(L.T, np.linalg.solve(L, yn))
+                # 对数边际似然（省略常数项）
+                lml = -0.5 * yn @ alpha - np.log(np.diag(L)).sum()
+                if best is None or lml > best[0]:
+                    best = (lml, length_scale, noise, L, alpha)
+        assert best is not None, 'no valid kernel parameters'
+        _, self.length_scale, self.noise, self.L, self.alpha = best
+        return self
+
+    def predict(self, X: np.ndarray):
+        """
+        :param X: 待预测的输入
+        :return: 预测均值, 预测标准差
+        """
+        Ks = self.kernel(np.asarray(X, dtype=float), self.X, self.length_scale)
+        mean = Ks @ self.alpha
+        v = np.linalg.solve(self.L, Ks.T)
+        var = np.maximum(1 + self.noise - (v ** 2).sum(0), 0)
+        return mean * self.y_std + self.y_mean, np.sqrt(var) * self.y_std
+
+
+class Surrogate:
+
+    def __init__(self, lb, ub, min_samples: int = SURROGATE_MIN_SAMPLES, max_samples: int = SURROGATE_MAX_SAMPLES,
+                 kappa: float = SURROGATE_KAPPA, audit: float = SURROGATE_AUDIT, seed: int = None,
+                 verbose: bool = False):
+        """
+        能耗与平均出行时间的代理模型
+
+        :param lb: 决策变量下界
+        :param ub: 决策变量上界
+        :param min_samples: 开始预筛选所需的训练样本数
+        :param max_samples: 训练使用的最近样本数上限
+        :param kappa: 置信区间宽度（标准差倍数）
+        :param audit: 被淘汰个体中仍完整仿真的比例
+        :param seed: 随机数种子（抽取审计个体）
+        :param verbose: 是否逐代输出预测误差（始终记录在 error_log 中）
+        """
+        self.lb, self.ub = np.asarray(lb, dtype=float), np.asarray(ub, dtype=float)
+        self.min_samples, self.max_samples = min_samples, max_samples
+        self.kappa, self.audit = kappa, audit
+        self.rng = np.random.default_rng(seed)
+        self.verbose = verbose
+
+        self.samples = {}  # {决策变量: (能耗, 平均出行时间)}，按加入顺序；提前终止的个体能耗为 None，出行时间为下界
+        self.gp_obj, self.gp_t = None, None
+        self.dirty = False  # 有新样本，预测前需重新拟合
+
+        self.predictions = {}  # 本代已预测、等待仿真结果的个体 {决策变量: (能耗, 平均出行时间)}
+        self.errors = []  # 本代的 (预测能耗, 实际能耗, 预测出行时间, 实际出行时间, 是否为审计个体)，提前终止时实际能耗为 nan
+        self.audited = set()  # 本代被淘汰但仍仿真的个体
+        self.num_screened = 0  # 本代被淘汰（未仿真）的个体数
+        self.error_log = []  # [(代数, 样本数, 淘汰数, 误差样本数, 能耗MAE, 出行时间MAE, 可行性预测准确率)]
+
+    @property
+    def ready(self):
+        """完整仿真的样本数足够时开始预筛选"""
+        return sum(obj is not None for obj, _ in self.samples.values()) >= self.min_samples
+
+    def scale(self, keys):
+        return (np.atleast_2d(np.asarray(keys, dtype=float)) - self.lb) / (self.ub - self.lb)
+
+    def add(self, key: tuple, stats: dict):
+        """
+        加入一个仿真结果：完整仿真的结果用于两个模型；因出行时间约束提前终止的结果只有能耗的下界，
+        以出行时间下界作为出行时间样本（低估实际值，但仍在约束上界以外）；其余提前终止的结果不加入
+
+        :param key: 决策变量
+        :param stats: get_statistics() 的结果
+        :return:
+        """
+        if stats.get('aborted') is not None:
+            if stats['aborted'] not in ('travel_t', 'backlog') or stats.get('avg_t_lb') is None:
+                self.predictions.pop(key, None)
+                return
+            obj, avg_t = None, stats['avg_t_lb']
+        elif AVG_T_KEY in stats:
+            obj, avg_t = stats[OBJ_KEY], stats[AVG_T_KEY]
+        else:
+            self.predictions.pop(key, None)
+            return
+        if key in self.predictions:
+            pred_obj, pred_t = self.predictions.pop(key)
+            self.errors.append((pred_obj, np.nan if obj is None else obj, pred_t, avg_t, key in self.audited))
+        self.samples.pop(key, None)
+        self.samples[key] = (obj, avg_t)
+        self.dirty = True
+
+    def load_archive(self, archive, fingerprint: str):
+        """以存档中的评估结果作为初始训练样本"""
+        for key, stats in archive.evaluations(fingerprint):
+            self.add(key, stats)
+
+    def fit(self):
+        keys = list(self.samples)[-self.max_samples:]
+        obj_keys = [key for key in self.samples if self.samples[key][0] is not None][-self.max_samples:]
+        self.gp_obj = GaussianProcess().fit(self.scale(obj_keys), [self.samples[key][0] for key in obj_keys])
+        self.gp_t = GaussianProcess().fit(self.scale(keys), [self.samples[key][1] for key in keys])
+        self.dirty = False
+
+    def predict(self, keys: list):
+        """
+        :param keys: 决策变量
+        :return: 能耗均值, 能耗标准差, 出行时间均值, 出行时间标准差
+        """
+        if self.dirty or self.gp_obj is None:
+            self.fit()
+        X = self.scale(keys)
+        obj_mean, obj_std = self.gp_obj.predict(X)
+        t_mean, t_std = self.gp_t.predict(X)
+        return obj_mean, obj_std, t_mean, t_std
+
+    def screen(self, keys: list, target_objs: list):
+        """
+        预筛选试验个体：出行时间置信区间完全在约束范围外，或能耗置信下界仍高于目标个体的个体被淘汰
+
+        :param keys: 试验个体
+        :param target_objs: 各试验个体需要胜过的（可行）目标个体的能耗
+        :return: 是否需要仿真的列表，以及各个体的预测能耗
+        """
+        obj_mean, obj_std, t_mean, t_std = self.predict(keys)
+        infeasible = (t_mean - self.kappa * t_std >= UB_AVG_T) | (t_mean + self.kappa * t_std < LB_AVG_T)
+        worse = obj_mean - self.kappa * obj_std > np.asarray(target_objs, dtype=float)
+        promising = ~(infeasible | worse)
+        for i, key in enumerate(keys):
+            self.predictions[key] = (obj_mean[i], t_mean[i])
+            if not promising[i]:
+                if self.rng.random() < self.audit:
+                    promising[i] = True
+                    self.audited.add(key)
+                else:
+                    self.num_screened += 1
+        return list(promising), list(obj_mean)
+
+    def propose(self, candidates: list):
+        """
+        从多个候选试验个体中选择一个：优先预测可行的个体，其中能耗置信下界最小者
+
+        :param candidates: 候选决策变量
+        :return: 所选候选的位置
+        """
+        obj_mean, obj_std, t_mean, t_std = self.predict(candidates)
+        feasible = (t_mean + self.kappa * t_std >= LB_AVG_T) & (t_mean - self.kappa * t_std < UB_AVG_T)
+        lcb = obj_mean - self.kappa * obj_std
+        best = int(np.argmin(np.where(feasible, lcb, np.inf))) if feasible.any() else int(np.argmin(lcb))
+        self.predictions[candidates[best]] = (obj_mean[best], t_mean[best])
+        return best
+
+    def end_generation(self, generation: int):
+        """记录本代的预测误差（只统计有仿真结果的个体，能耗与出行时间误差不含提前终止的个体）"""
+        if len(self.errors) > 0:
+            err = np.array(self.errors, dtype=float)
+            full = ~np.isnan(err[:, 1])
+            obj_mae = np.abs(err[full, 0] - err[full, 1]).mean() if full.any() else np.nan
+            t_mae = np.abs(err[full, 2] - err[full, 3]).mean() if full.any() else np.nan
+            feasible_pred = (LB_AVG_T <= err[:, 2]) & (err[:, 2] < UB_AVG_T)
+            feasible_true = (LB_AVG_T <= err[:, 3]) & (err[:, 3] < UB_AVG_T)
+            acc = (feasible_pred == feasible_true).mean()
+            self.error_log.append((generation, len(self.samples), self.num_screened, len(err), obj_mae, t_mae, acc))
+            if self.verbose:
+                print(f'gen {generation}: surrogate samples {len(self.samples)}, screened {self.num_screened}, '
+                      f'obj MAE {obj_mae:.3f}, avg_t MAE {t_mae:.3f}, feasibility acc {acc:.2f} '
+                      f'(n={len(err)}, audited {int(err[:, 4].sum())})')
+        elif self.num_screened > 0:
+            self.error_log.append((generation, len(self.samples), self.num_screened, 0, None, None, None))
+            if self.verbose:
+                print(f'gen {generation}: surrogate samples {len(self.samples)}, screened {self.num_screened}')
+        self.predictions, self.errors, self.audited, self.num_screened = {}, [], set(), 0
@@ -1,22 +1,65 @@
+import copy
+import hashlib
 import heapq
 import logging
-import random
+import os
+import pickle
 import numpy as np
 import pandas as pd
 
-from consts import DIS_FIX, PASSENGER_SPEED, INTERVAL, NUM_UB, NUM_LB, CAN_TURN_AT_PEAK_HOURS, \
-    EARLY_HIGH_START_T, EARLY_HIGH_END_T, LATE_HIGH_START_T, LATE_HIGH_END_T, DAY
+from config import SimConfig
+from consts import DIS_FIX, PASSENGER_SPEED, RANDOM_SEED, USE_LINE_CACHE, CACHE_DIR
 from env.passenger import get_distance
 
-random.seed(42)
-np.random.seed(42)
+CACHE_VERSION = 3  # 预处理逻辑变化时递增，使旧缓存失效
+
+
+# 本进程内已计算的文件 md5 {(路径, 修改时间, 大小): md5}，避免每构建一条线路都重新读取整个 csv
+_file_hashes = {}
+
+
+def get_file_hash(path: str):
+    """文件内容的 md5（文件的路径、修改时间与大小不变时复用本进程内已计算的结果）"""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    if key not in _file_hashes:
+        md5 = hashlib.md5()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                md5.update(chunk)
+        _file_hashes[key] = md5.hexdigest()
+    return _file_hashes[key]
+
+
+def encode_loc(loc):
+    """上下车地点编码为 (主线站点, 支线编号, 支线站点)，主线站点的支线编号与支线站点为 0"""
+    if isinstance(loc, (int, np.integer)):
+        return int(loc), 0, 0
+    main_id, side_id, side_order = map(int, loc.split('#'))
+    return main_id, side_id, side_order
+
+
+def decode_loc(main_id, side_id, side_order):
+    """encode_loc 的逆变换，主线站点返回 int，支线站点返回 'main#side#order'"""
+    if side_id == 0:
+        return int(main_id)
+    return f'{main_id}#{side_id}#{side_order}'
 
 
 class Line:
 
     def __init__(self, direc: int, station_list: list, loc_list: list,
-                 dist_list: list, speed_list: list, mode: str, side_line_info=None):
+                 dist_list: list, speed_list: list, mode: str, side_line_info=None,
+                 seed: int = RANDOM_SEED, use_cache: bool = USE_LINE_CACHE,
+                 chain_data: pd.DataFrame = None, chain_data_hash: str = None, day: int = None,
+                 config: SimConfig = None):
+        # 仿真参数（预处理只使用其中的 TEMPLATE_FIELDS），day 给出时覆盖 config.DAY
+        config = SimConfig() if config is None else config
+        if day is not None and day != config.DAY:
+            config = config.replace(DAY=day)
+        self.config = config
         self.direc = direc
+        self.day = config.DAY  # 乘客链数据的日期
         self.max_station_num = len(station_list)
         self.station_list = list(station_list)
         self.loc_list = list(loc_list)
@@ -32,26 +75,224 @@ class Line:
         # number of passengers waiting at side lines
         self.num_side_lines = 0
 
+        # 进入仿真的乘客人数的后缀和（按需由 get_eligible_suffix 生成）
+        self.eligible_suffix = None
+
         # 生成主线
         self.create_main_line()
-        if self.mode in ['multi', 'multi_order']:
-            # 生成支线
-            self.create_side_line(side_line_info=side_line_info)
 
         # consts
         self.max_wait_t = 10 * 60  # 乘客站点最大等待时间（用于随机生成出发时间）
 
+        # 随机数（乘客出发时间与位置的扰动）：每个线路模板独立的随机数流，只由 seed 决定，与构建顺序无关；
+        # 扰动结果写入预处理缓存，因此以种子而非随机数生成器作为参数（种子包含在缓存键中）
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+
+        # 乘客链数据（None 时从 csv 读取，否则使用场景文件中已映射的数据）
+        self.chain_data = chain_data
+        self.chain_data_hash = chain_data_hash
+        # 以其他种子重新预处理（reseed）时使用的输入
+        self.side_line_info = side_line_info
+        self.use_cache = use_cache
+
+        # 预处理缓存
+        self.cache_key = self.get_cache_key(side_line_info=side_line_info)
+        cache = self.load_cache() if use_cache else None
+        if cache is not None:
+            self.side_line = cache['side_line']
+            self.res_time_dict = cache['res_time_dict']
+            self.num_side_lines = cache['num_side_lines']
+            self.passenger_pool = cache['passenger_pool']
+            self.pass_arrays = cache['pass_arrays']
+            return
+
+        if self.mode in ['multi', 'multi_order']:
+            # 生成支线
+            self.create_side_line(side_line_info=side_line_info)
+
         # residual customer arrival time dict
         self.res_time_dict = {key: [] for key in range(0, 24)}
 
         # passenger pool
-        self.passenger_pool = self.get_passenger_info(day=DAY)
+        self.passenger_pool = self.get_passenger_info(day=self.day)
+        # 仿真中使用的乘客数组（按列存储，可放入共享内存）
+        self.pass_arrays = self.get_pass_arrays()
 
         # deal with res_time_dict
         for key, val in self.res_time_dict.items():
             hour_len = len(set(self.res_time_dict[key]))
             self.res_time_dict[key] = (hour_len, (hour_len/len(self.side_line) if self.side_line is not None else 0))
 
+        if use_cache:
+            self.save_cache()
+
+    @staticmethod
+    def get_chain_data_path(day: int):
+        """乘客链数据文件路径"""
+        return rf'D:\mofangbus\busimulator\data\line_810\chain_data_{day}.csv'
+
+    def get_cache_key(self, side_line_info=None):
+        """
+        预处理结果的缓存键，覆盖输入文件、线路信息、模式、日期、拥挤阈值与随机种子
+
+        :param side_line_info: 支线信息
+        :return: str
+        """
+        md5 = hashlib.md5()
+        chain_data_hash = self.chain_data_hash if self.chain_data_hash is not None \
+            else get_file_hash(self.get_chain_data_path(day=self.day))
+        md5.update(chain_data_hash.encode())
+        if side_line_info is not None and self.mode in ['multi', 'multi_order']:
+            md5.update(pd.util.hash_pandas_object(side_line_info, index=True).values.tobytes())
+        md5.update(repr((
+            CACHE_VERSION, self.direc, self.station_list, self.loc_list, self.dist_list, self.speed_list, self.mode,
+            self.day, self.config.INTERVAL, self.config.NUM_UB, self.config.NUM_LB, self.config.CAN_TURN_AT_PEAK_HOURS,
+            self.config.EARLY_HIGH_START_T, self.config.EARLY_HIGH_END_T, self.config.LATE_HIGH_START_T,
+            self.config.LATE_HIGH_END_T, DIS_FIX, PASSENGER_SPEED, SideLine.sep_num, self.max_wait_t,
+            self.seed
+        )).encode())
+        return md5.hexdigest()
+
+    @property
+    def cache_path(self):
+        return os.path.join(CACHE_DIR, f'line_{self.direc}_{self.mode}_{self.day}_{self.cache_key}.pkl')
+
+    def load_cache(self):
+        """读取预处理缓存，不存在或损坏时返回 None"""
+        if not os.path.exists(self.cache_path):
+            return None
+        try:
+            with open(self.cache_path, 'rb') as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            logging.warning(f'line cache {self.cache_path} is broken, rebuild it.')
+            return None
+
+    def save_cache(self):
+        """保存预处理结果（先写临时文件再替换，避免多进程同时写入）"""
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f'{self.cache_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({
+                'side_line': self.side_line,
+                'res_time_dict': self.res_time_dict,
+                'num_side_lines': self.num_side_lines,
+                'passenger_pool': self.passenger_pool,
+                'pass_arrays': self.pass_arrays,
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.cache_path)
+
+    @property
+    def num_passengers(self):
+        return self.pass_arrays['arrive_t'].shape[0]
+
+    def get_pass_arrays(self):
+        """
+        将 passenger_pool 转为按列存储的数值数组，上下车地点按 encode_loc 编码
+
+        :return: dict[str, np.ndarray]
+        """
+        pool = self.passenger_pool
+        start_loc = np.array([encode_loc(loc) for loc in pool['start_loc']], dtype=np.int64).reshape(-1, 3)
+        end_loc = np.array([encode_loc(loc) for loc in pool['end_loc']], dtype=np.int64).reshape(-1, 3)
+        start_pos = np.array(list(pool['start_pos']), dtype=np.float64).reshape(-1, 2)
+        end_pos = np.array(list(pool['end_pos']), dtype=np.float64).reshape(-1, 2)
+        return {
+            'arrive_t': np.asarray(pool['arrive_t'], dtype=np.int64),
+            'start_lat': np.ascontiguousarray(start_pos[:, 0]),
+            'start_lon': np.ascontiguousarray(start_pos[:, 1]),
+            'start_main': np.ascontiguousarray(start_loc[:, 0]),
+            'start_side': np.ascontiguousarray(start_loc[:, 1]),
+            'start_order': np.ascontiguousarray(start_loc[:, 2]),
+            'end_lat': np.ascontiguousarray(end_pos[:, 0]),
+            'end_lon': np.ascontiguousarray(end_pos[:, 1]),
+            'end_main': np.ascontiguousarray(end_loc[:, 0]),
+            'end_side': np.ascontiguousarray(end_loc[:, 1]),
+            'end_order': np.ascontiguousarray(end_loc[:, 2]),
+            'side_flag': np.asarray(pool['side_flag'], dtype=bool),
+        }
+
+    def get_eligible_suffix(self):
+        """
+        进入仿真的乘客（下车主线站点在上车主线站点之后）人数的后缀和（乘客按到站时刻排序），结果缓存在模板上
+
+        :return: np.ndarray, suffix[i] 为第 i 个及之后的乘客中进入仿真的人数，长度为乘客数 + 1
+        """
+        if self.eligible_suffix is None:
+            eligible = self.pass_arrays['end_main'] > self.pass_arrays['start_main']
+            self.eligible_suffix = np.concatenate([np.cumsum(eligible[::-1])[::-1], [0]]).astype(np.int64)
+        return self.eligible_suffix
+
+    def subsample(self, fraction: float, seed: int = RANDOM_SEED):
+        """
+        按 (到站小时, 上车主线站点) 分层随机抽取乘客，得到新的线路模板（站点与支线几何共享）；
+        每层抽取 n * fraction 人，小数部分按概率取整，使抽样比例在各层均为无偏
+
+        :param fraction: 抽样比例
+        :param seed: 随机数种子
+        :return: Line
+        """
+        rng = np.random.default_rng(seed)
+        keep = []
+        for members in self.get_strata():
+            count = len(members)
+            num = int(count * fraction) + int(rng.random() < count * fraction - int(count * fraction))
+            keep.append(rng.choice(members, size=num, replace=False))
+        return self.select(keep, (fraction, seed))
+
+    def reseed(self, seed: int):
+        """
+        以另一随机种子重新预处理乘客链数据（乘客出发时刻与出发、到达坐标的扰动），得到需求的另一个独立实现，
+        用于重复仿真；预处理结果按缓存键（包含种子）缓存，同一种子只预处理一次
+
+        :param seed: 预处理的随机数种子
+        :return: Line
+        """
+        if seed == self.seed:
+            return self
+        return Line(direc=self.direc, station_list=self.station_list, loc_list=self.loc_list,
+                    dist_list=self.dist_list, speed_list=self.speed_list, mode=self.mode,
+                    side_line_info=self.side_line_info, seed=seed, use_cache=self.use_cache,
+                    chain_data=self.chain_data, chain_data_hash=self.chain_data_hash, config=self.config)
+
+    def get_strata(self):
+        """按 (到站小时, 上车主线站点) 分层的乘客编号 [np.ndarray]"""
+        arrays = self.pass_arrays
+        strata = (arrays['arrive_t'] // 3600).astype(np.int64) * 1000 + arrays['start_main']
+        _, inverse, counts = np.unique(strata, return_inverse=True, return_counts=True)
+        order = np.argsort(inverse, kind='stable')
+        return np.split(order, np.cumsum(counts)[:-1]) if len(counts) > 0 else []
+
+    def select(self, keep: list, tag: tuple):
+        """
+        由选出的乘客编号生成新的线路模板（按到站时间排序，站点与支线几何共享）
+
+        :param keep: [乘客编号数组]，可有重复
+        :param tag: 区分选取方式的标识，与原缓存键一起生成新的缓存键
+        :return: Line
+        """
+        keep = np.sort(np.concatenate(keep)) if keep else np.zeros(0, dtype=np.int64)
+        line = copy.copy(self)
+        line.pass_arrays = {key: arr[keep] for key, arr in self.pass_arrays.items()}
+        line.passenger_pool = self.passenger_pool.iloc[keep].reset_index(drop=True) \
+            if self.passenger_pool is not None else None
+        line.eligible_suffix = None
+        line.cache_key = hashlib.md5(repr((self.cache_key, ) + tuple(tag)).encode()).hexdigest()
+        return line
+
+    def spawn(self):
+        """
+        以当前线路为模板生成一轮仿真使用的线路：站点、距离、速度、支线几何与乘客池均共享，只重建站点等待队列
+
+        :return: Line
+        """
+        line = copy.copy(self)
+        line.create_main_line()
+        if self.side_line is not None:
+            line.side_line = {key: side.spawn() for key, side in self.side_line.items()}
+        return line
+
     def create_main_line(self):
         """
         生成主线，主线上由 main_line 字典维护
@@ -82,7 +323,7 @@ class Line:
         :param num_threshold: 间隔内上车人数下界
         :return:
         """
-        MINUS_DATE = 20191000000000 + DAY * 1000000
+        MINUS_DATE = 20191000000000 + self.day * 1000000
         # data preprocessing
         pass_info['start_time'] = pass_info.apply(
             (lambda x: int((x['up_time'] - MINUS_DATE) / 10000) * 3600 +
@@ -100,9 +341,9 @@ class Line:
                 for ind in tmp_df.index:
                     if num_lb <= tmp_df.shape[0] < num_ub:
                         assert pass_info.loc[ind, 'crowd_mark'] in [-1, 1]
-                        if not CAN_TURN_AT_PEAK_HOURS:  # cannot turn at peak hours
-                            if EARLY_HIGH_START_T <= up_time < EARLY_HIGH_END_T or \
-                                    LATE_HIGH_START_T <= up_time < LATE_HIGH_END_T:
+                        if not self.config.CAN_TURN_AT_PEAK_HOURS:  # cannot turn at peak hours
+                            if self.config.EARLY_HIGH_START_T <= up_time < self.config.EARLY_HIGH_END_T or \
+                                    self.config.LATE_HIGH_START_T <= up_time < self.config.LATE_HIGH_END_T:
                                 pass_info.loc[ind, 'crowd_mark'] = 0
                             else:
                                 pass_info.loc[ind, 'crowd_mark'] = 1
@@ -298,9 +539,13 @@ class Line:
 
         :return: pd.Dataframe
         """
-        pass_info = pd.read_csv(rf'D:\mofangbus\busimulator\data\line_810\chain_data_{day}.csv', encoding='utf-8')
+        if self.chain_data is None:
+            pass_info = pd.read_csv(self.get_chain_data_path(day=day), encoding='utf-8')
+        else:
+            pass_info = self.chain_data
         pass_info = pass_info[pass_info['direction'] == self.direc].reset_index(drop=True)
-        pass_info = self.get_chain_data(pass_info=pass_info, interval=INTERVAL, num_ub=NUM_UB, num_lb=NUM_LB)
+        pass_info = self.get_chain_data(pass_info=pass_info, interval=self.config.INTERVAL,
+                                        num_ub=self.config.NUM_UB, num_lb=self.config.NUM_LB)
         s_pos_l, s_t_l, s_loc_l, e_loc_l, e_pos_l, side_flag_l = [], [], [], [], [], []
         for i in range(pass_info.shape[0]):
             up_lat, up_lon, up_station, down_station = pass_info.loc[i, 'up_lat'], pass_info.loc[i, 'up_lon'], \
@@ -375,13 +620,12 @@ class Line:
 
     def get_random_t(self):
         """返回在站点的随机等待时间，服从均匀分布"""
-        return np.random.randint(0, self.max_wait_t)
+        return int(self.rng.integers(0, self.max_wait_t))
 
-    @staticmethod
-    def get_random_pos(cen_lat, cen_lon):
+    def get_random_pos(self, cen_lat, cen_lon):
         """以站点为中心随机生成在 bbxbb 的区域内的坐标"""
         lat_diff, lon_diff = 0.00584909, 0.00898311  # 允许的范围波动
-        return cen_lat + np.random.uniform(-1, 1) * lat_diff, cen_lon + np.random.uniform(-1, 1) * lon_diff
+        return cen_lat + self.rng.uniform(-1, 1) * lat_diff, cen_lon + self.rng.uniform(-1, 1) * lon_diff
 
 
 class SideLine:
@@ -432,6 +676,15 @@ class SideLine:
             ) - DIS_FIX) / main_speed_list[main_id - 1] for i in range(self.sep_num - 1)
         ]
 
+    def spawn(self):
+        """共享支线几何，重建各支线站点的等待队列"""
+        side = copy.copy(self)
+        side.side_stations = {
+            i: {'lat': station['lat'], 'lon': station['lon'], 'pool': []}
+            for i, station in self.side_stations.items()
+        }
+        return side
+
 
 if __name__ == '__main__':
     import sys
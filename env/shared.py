@@ -0,0 +1,61 @@
+import copy
+from multiprocessing import shared_memory
+import numpy as np
+
+from env.line import Line
+
+# 工作进程中已挂载的共享内存（需保持引用，否则数组所在缓冲区失效）
+_attached = {}
+
+
+class SharedLine:
+
+    def __init__(self, line: Line):
+        """
+        将线路模板的乘客数组一次性发布到共享内存，工作进程通过 spec 以只读方式挂载
+
+        :param line: 线路模板
+        """
+        arrays = line.pass_arrays
+        layout, offset = {}, 0
+        for name, arr in arrays.items():
+            layout[name] = (offset, arr.shape, arr.dtype.str)
+            offset += (arr.nbytes + 7) // 8 * 8  # 8 字节对齐
+        self.shm = shared_memory.SharedMemory(create=True, size=max(offset, 8))
+        for name, arr in arrays.items():
+            start, shape, dtype = layout[name]
+            np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=start)[...] = arr
+
+        # 线路骨架：站点、距离、速度与支线几何（体积小，随 spec 传给每个工作进程一次）
+        skeleton = copy.copy(line)
+        skeleton.passenger_pool = None
+        skeleton.pass_arrays = None
+        skeleton.chain_data = None
+        self.spec = {'name': self.shm.name, 'layout': layout, 'skeleton': skeleton}
+
+    def close(self):
+        """释放共享内存（仅由发布方调用）"""
+        self.shm.close()
+        self.shm.unlink()
+
+
+def attach_line(spec: dict):
+    """
+    在工作进程中挂载共享内存，返回乘客数组指向共享内存的线路模板（只读）
+
+    :param spec: SharedLine.spec
+    :return: Line
+    """
+    name = spec['name']
+    if name not in _attached:
+        # 进程池中的工作进程与发布方共用同一个 resource_tracker，由发布方负责 unlink
+        _attached[name] = shared_memory.SharedMemory(name=name)
+    shm = _attached[name]
+    pass_arrays = {}
+    for key, (start, shape, dtype) in spec['layout'].items():
+        arr = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=start)
+        arr.flags.writeable = False
+        pass_arrays[key] = arr
+    line = copy.copy(spec['skeleton'])
+    line.pass_arrays = pass_arrays
+    return line
@@ -0,0 +1,267 @@
+"""
+重复仿真与公共随机数（common random numbers）：每次重复由一对随机种子确定——需求种子重新预处理乘客链数据
+（乘客出发时刻与坐标的随机扰动，Line.reseed，结果写入预处理缓存），转向种子决定转向决策的随机数流，均通过 Sim.reset 设置。
+乘客链数据本身（某一天的出行记录）在各次重复中相同，置信区间只反映模型随机性，不包括不同日期间的需求差异。
+比较发车方案时，同一次重复中的所有方案使用同一对种子，方案间的差异不再混入随机扰动，配对差值的方差远小于独立抽样。
+
+run_replications 在进程池中运行独立的重复仿真（每个进程常驻一个仿真对象），以流式均值/方差合并统计数据，
+各指标的置信区间半宽达到目标后停止增加重复
+"""
+import math
+import multiprocessing as mp
+import queue
+import statistics
+import numpy as np
+
+from consts import RANDOM_SEED, REP_MIN, REP_MAX, REP_CONFIDENCE, REP_HALF_WIDTH
+from scenario import load_scenario
+from sim import Sim, spawn_seeds
+
+POWER_KEY = 'power consumption(condition, kWh)'
+AVG_T_KEY = 'avg_travel_t(full, min)'
+
+# 由重复种子决定、不能在 policy / sim_kwargs 中给出的 Sim 参数
+SEED_KEYS = ('seed', 'route_seed', 'demand_seed')
+
+
+def check_seed_keys(kwargs: dict):
+    """重复仿真的随机种子只由 seeds 给出"""
+    for key in SEED_KEYS:
+        assert key not in kwargs, f'{key} is given by the replication seeds, remove it from the simulation parameters'
+
+
+def replication_seeds(num: int, seed: int = RANDOM_SEED):
+    """
+    由 SeedSequence 派生的互相独立的重复种子
+
+    :param num: 重复次数
+    :param seed: 根种子
+    :return: [(需求种子, 转向种子)]
+    """
+    return [tuple(int(val) for val in ss.generate_state(2)) for ss in np.random.SeedSequence(seed).spawn(num)]
+
+
+def compare_schedules(line_info: dict, schedules: list, seeds: list, sim_mode: str = 'multi_order',
+                      metrics: tuple = (POWER_KEY, AVG_T_KEY), can_reorg: bool = True, **sim_kwargs):
+    """
+    以公共随机数比较多个发车方案
+
+    :param line_info: read_in / load_scenario 的返回值
+    :param schedules: [(dep_num_list, dep_duration_list)]，第一个方案为比较基准
+    :param seeds: replication_seeds 的返回值
+    :param sim_mode: 仿真模式
+    :param metrics: 比较的统计指标（get_statistics 的键）
+    :param can_reorg: 是否允许结合与分离
+    :param sim_kwargs: 其他 Sim 参数（multi_dec_rule 等，不含随机种子）
+    :return: {指标: {'values': (方案数, 重复数) 数组, 'mean', 'se', 'diff', 'diff_se', 'indep_se'}}，
+             diff 为各方案与基准的配对差值均值，diff_se 为其标准误差，indep_se 为独立抽样时差值的标准误差
+    """
+    check_seed_keys(sim_kwargs)
+    values = {metric: np.zeros((len(schedules), len(seeds))) for metric in metrics}
+    sim = Sim(**{**line_info, 'dep_num_list': schedules[0][0], 'dep_duration_list': schedules[0][1]},
+              sim_mode=sim_mode, **sim_kwargs)
+    sim.can_reorg = can_reorg
+    for r, (demand_seed, route_seed) in enumerate(seeds):
+        # 同一次重复中各方案共用同一需求实现，每轮仿真的转向随机数流从同一种子开始
+        for i, (dep_num_list, dep_duration_list) in enumerate(schedules):
+            sim.reset(dep_num_list=dep_num_list, dep_duration_list=dep_duration_list, demand_seed=demand_seed,
+                      route_seed=route_seed)
+            sim.run()
+            stats = sim.get_statistics()
+            for metric in metrics:
+                values[metric][i, r] = stats[metric]
+
+    n = len(seeds)
+    result = {}
+    for metric, val in values.items():
+        diff = val - val[0]
+        ddof = 1 if n > 1 else 0
+        result[metric] = {
+            'values': val,
+            'mean': val.mean(axis=1),
+            'se': val.std(axis=1, ddof=ddof) / np.sqrt(n),
+            'diff': diff.mean(axis=1),
+            'diff_se': diff.std(axis=1, ddof=ddof) / np.sqrt(n),
+            'indep_se': np.sqrt((val.var(axis=1, ddof=ddof) + val[0].var(ddof=ddof)) / n),
+        }
+    return result
+
+
+def t_quantile(p: float, df: int):
+    """
+    Student t 分布的 p 分位数（Cornish-Fisher 展开，df >= 4 时误差小于 0.01）
+
+    :param p: 概率
+    :param df: 自由度
+    :return:
+    """
+    z = statistics.NormalDist().inv_cdf(p)
+    return z + (z ** 3 + z) / (4 * df) + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * df ** 2) + \
+        (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / (384 * df ** 3)
+
+
+class RunningStats:
+
+    def __init__(self):
+        """流式均值与方差（Welford 算法）"""
+        self.n = 0
+        self.mean = 0.
+        self.m2 = 0.
+
+    def add(self, x: float):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+
+    @property
+    def var(self):
+        """样本方差"""
+        return self.m2 / (self.n - 1) if self.n > 1 else 0.
+
+    @property
+    def std(self):
+        return math.sqrt(self.var)
+
+    def half_width(self, confidence: float = REP_CONFIDENCE):
+        """均值置信区间的半宽，样本数不足 2 时为 inf"""
+        if self.n < 2:
+            return math.inf
+        return t_quantile(0.5 + confidence / 2, self.n - 1) * self.std / math.sqrt(self.n)
+
+
+# 重复仿真工作进程中常驻的仿真对象与 policy（由 initializer 构建一次，各次重复只 reset）
+_rep_sim = None
+_rep_policy = None
+
+
+def _init_rep_worker(scenario, policy: dict):
+    global _rep_sim, _rep_policy
+    _rep_sim, _rep_policy = build_replication_sim(scenario, policy), policy
+
+
+def _run_rep_task(args):
+    i, seed = args
+    return i, run_replication(_rep_sim, _rep_policy, seed)
+
+
+def build_replication_sim(scenario, policy: dict):
+    """
+    构建重复仿真使用的常驻仿真对象（线路模板只预处理一次）
+
+    :param scenario: 场景目录或 read_in / load_scenario 的返回值
+    :param policy: 见 run_replication
+    :return: Sim
+    """
+    scenario = load_scenario(scenario) if isinstance(scenario, str) else scenario
+    kwargs = {'sim_mode': 'multi_order', 'record_time': None, **scenario, **policy}
+    kwargs.pop('can_reorg', None)
+    return Sim(**kwargs)
+
+
+def run_replication(sim: Sim, policy: dict, seed: int):
+    """
+    在常驻仿真对象上运行一次重复仿真
+
+    :param sim: build_replication_sim 的返回值
+    :param policy: Sim 参数（dep_num_list, dep_duration_list, sim_mode, multi_dec_rule 等）与 can_reorg，
+                   未给出的发车方案取场景中的默认值；随机种子由 seed 给出，不能包含在内
+    :param seed: 本次重复的随机种子（需求预处理与转向决策）
+    :return: get_statistics() 的结果
+    """
+    sim.reset(dep_num_list=policy.get('dep_num_list'), dep_duration_list=policy.get('dep_duration_list'),
+              demand_seed=seed, route_seed=seed)
+    sim.can_reorg = policy.get('can_reorg', True)
+    sim.run()
+    return sim.get_statistics()
+
+
+def run_replications(scenario, policy: dict, seeds: list = None, half_widths: dict = None,
+                     confidence: float = REP_CONFIDENCE, min_reps: int = REP_MIN, processes: int = None):
+    """
+    在进程池中运行独立的重复仿真，按种子顺序合并结果，所有指标的置信区间半宽均不超过目标时停止。
+    停止时使用的重复总是 seeds 的前若干个，与进程调度顺序无关；已派发但未用到的重复被丢弃
+
+    :param scenario: 场景目录（工作进程以 mmap 打开）或 read_in / load_scenario 的返回值
+    :param policy: 见 run_replication
+    :param seeds: 各次重复的随机种子（最大重复次数），None 时由 spawn_seeds(RANDOM_SEED, REP_MAX) 派生
+    :param half_widths: {指标: 置信区间半宽目标}，None 时为 REP_HALF_WIDTH
+    :param confidence: 置信水平
+    :param min_reps: 最少重复次数
+    :param processes: 进程数，None 为 CPU 核数，1 时在当前进程中串行运行
+    :return: {'num_replications', 'seeds', 'converged', 'stats': {指标: {'mean', 'std', 'half_width'}},
+              'values': {指标: [各次重复的值]}}
+    """
+    check_seed_keys(policy)
+    seeds = spawn_seeds(RANDOM_SEED, REP_MAX) if seeds is None else list(seeds)
+    half_widths = REP_HALF_WIDTH if half_widths is None else half_widths
+    processes = mp.cpu_count() if processes is None else processes
+
+    running = {}  # {统计项: RunningStats}，所有数值型统计项
+    values = {metric: [] for metric in half_widths}
+
+    def converged():
+        return all(key in running and running[key].half_width(confidence) <= target
+                   for key, target in half_widths.items())
+
+    def fold(stats):
+        for key, val in stats.items():
+            if isinstance(val, (int, float, np.number)) and not isinstance(val, bool):
+                running.setdefault(key, RunningStats()).add(float(val))
+        for metric in half_widths:
+            values[metric].append(float(stats[metric]))
+
+    num_done = 0
+    if processes <= 1:
+        sim = build_replication_sim(scenario, policy)
+        while num_done < len(seeds) and not (num_done >= min_reps and converged()):
+            fold(run_replication(sim, policy, seeds[num_done]))
+            num_done += 1
+    else:
+        results = queue.Queue()
+        buffer = {}  # 先于前序重复完成的结果
+        next_task = 0
+        with mp.Pool(processes, initializer=_init_rep_worker, initargs=(scenario, policy)) as pool:
+            while num_done < len(seeds) and not (num_done >= min_reps and converged()):
+                # 保持每个进程都有任务，已达到最少重复次数后只多派发与进程数相同的任务
+                while next_task < len(seeds) and next_task - num_done < processes:
+                    pool.apply_async(_run_rep_task, ((next_task, seeds[next_task]), ),
+                                     callback=results.put, error_callback=results.put)
+                    next_task += 1
+                res = results.get()
+                if isinstance(res, BaseException):
+                    raise res
+                buffer[res[0]] = res[1]
+                while num_done in buffer and not (num_done >= min_reps and converged()):
+                    fold(buffer.pop(num_done))
+                    num_done += 1
+            pool.terminate()
+
+    return {
+        'num_replications': num_done,
+        'seeds': seeds[:num_done],
+        'converged': num_done >= min_reps and converged(),
+        'stats': {key: {'mean': val.mean, 'std': val.std, 'half_width': val.half_width(confidence)}
+                  for key, val in running.items()},
+        'values': values,
+    }
+
+
+if __name__ == '__main__':
+    from sim import read_in
+
+    line_info = read_in(way='total', fractile=None)
+    schedules = [
+        (line_info['dep_num_list'], line_info['dep_duration_list']),
+        ([0, 0, 0, 0, 0, 0, 1, 1, 2, 2, 1, 1, 2, 2, 3, 3, 3, 3, 2, 2, 1, 1, 1, 1],
+         [0, 0, 0, 0, 0, 0, 720, 720, 600, 600, 600, 600, 840, 840, 720, 720, 600, 600, 600, 600, 720, 720, 900, 900]),
+    ]
+    res = compare_schedules(line_info, schedules, replication_seeds(5), multi_dec_rule='up_first', record_time=None)
+    for metric, val in res.items():
+        print(f'{metric}: mean {val["mean"]}, diff {val["diff"]}, diff se (CRN) {val["diff_se"]}, '
+              f'diff se (independent) {val["indep_se"]}')
+
+    res = run_replications(line_info, {'multi_dec_rule': 'up_first'})
+    print(f'{res["num_replications"]} replications, converged: {res["converged"]}')
+    for metric in REP_HALF_WIDTH:
+        print(f'{metric}: {res["stats"][metric]["mean"]:.3f} +- {res["stats"][metric]["half_width"]:.3f}')
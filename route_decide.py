@@ -3,18 +3,24 @@ import random
 from env.bus import Bus
 from env.line import Line
 
-from consts import RATE_MAX_STOP, MAIN_LINE_STOP_TURN_THRESHOLD, MAIN_LINE_STOP_TURN_RATE_THRESHOLD, \
-    ONLY_MAIN_LINE_STOP_THRESHOLD, MAIN_LINE_TURN_MAX_PASS_NUM
-
-random.seed(42)
+from config import SimConfig
+from consts import RANDOM_SEED
 
 
 class RouteDecider:
 
-    def __init__(self, sim_mode: str = 'single'):
-        """路线决策器"""
+    def __init__(self, sim_mode: str = 'single', rng: random.Random = None, config: SimConfig = None):
+        """
+        路线决策器
+
+        :param sim_mode: 仿真模式
+        :param rng: 转向决策的随机数流（由 Sim 提供），None 时以 RANDOM_SEED 新建
+        :param config: 仿真参数（由 Sim 提供），None 时取 consts.py 中的值
+        """
         assert sim_mode in ['baseline', 'single', 'multi', 'multi_order']
         self.mode = sim_mode
+        self.config = SimConfig() if config is None else config
+        self.rng = rng if rng is not None else random.Random(RANDOM_SEED)
 
     def decide_stop_action_baseline(self, cur_bus: Bus, line: Line):
         """
@@ -41,6 +47,7 @@ class RouteDecider:
         :param line: 仿真主线
         :return: 动作字典(key in ['stop'])
         """
+        cfg = self.config
         assert self.mode == 'single'
         # divide bus_group into waiting and not waiting
         waiting_list = [bus for bus in bus_group if bus_info[bus].is_waiting is True]
@@ -71,7 +78,7 @@ class RouteDecider:
                 stop_pas_num = sum([bus_info[bus].stop_pass_num(station=cur_station) for bus in stop_list])
                 up_num = len(line.main_line[cur_station])
                 est_num = pas_num - stop_pas_num + up_num
-                if est_num < max_num * RATE_MAX_STOP:
+                if est_num < max_num * cfg.RATE_MAX_STOP:
                     # enough
                     for bus in alter_stop_list:
                         dec_dict[bus] = False
@@ -83,7 +90,7 @@ class RouteDecider:
                             alter_stop_list,
                             key=lambda x: bus_info[x].sum_stations_to_go(station=cur_station), reverse=False
                         )
-                    res_num = up_num - (max_num * RATE_MAX_STOP - pas_num + stop_pas_num)
+                    res_num = up_num - (max_num * cfg.RATE_MAX_STOP - pas_num + stop_pas_num)
                     enough_flag = False
                     for alter_bus in alter_stop_order:
                         if bus_info[alter_bus].max_num == bus_info[alter_bus].pass_num:
@@ -133,6 +140,7 @@ class RouteDecider:
         :param rule: 决策逻辑, in ['down_first', 'up_first']
         :return: 动作字典(key in ['stop', 'turn', 'return_stop'])
         """
+        cfg = self.config
         assert self.mode in ['multi', 'multi_order']
         main_id, side_id, run_state = map(int, loc.split('#'))
         dec_dict = {}
@@ -200,7 +208,7 @@ class RouteDecider:
                             stop_pas_num = sum([bus_info[bus].stop_pass_num(station=main_id) for bus in stop_buses])
                             up_num = len(line.main_line[main_id])
                             est_num = pas_num - stop_pas_num + up_num
-                            if est_num < max_num * RATE_MAX_STOP:
+                            if est_num < max_num * cfg.RATE_MAX_STOP:
                                 # enough
                                 for bus in can_stop_buses:
                                     dec_dict[bus] = {'stop': False, 'turn': 0}
@@ -213,7 +221,7 @@ class RouteDecider:
                                         can_stop_buses,
                                         key=lambda x: bus_info[x].sum_stations_to_go(station=main_id), reverse=False
                                     )
-                                res_num = up_num - (max_num * RATE_MAX_STOP - pas_num + stop_pas_num)
+                                res_num = up_num - (max_num * cfg.RATE_MAX_STOP - pas_num + stop_pas_num)
                                 enough_flag = False
                                 for alter_bus in alter_stop_order:
                                     if bus_info[alter_bus].max_num == bus_info[alter_bus].pass_num:
@@ -301,7 +309,7 @@ class RouteDecider:
                                         len(side_2_bus_num) + len(decide_turn[2]) > 0.2:
                                     # 两边都有车，且两边都没有下车
                                     if len(line.main_line[main_id]) > 0 and len(
-                                            stop_buses) <= ONLY_MAIN_LINE_STOP_THRESHOLD and cur_bus.pass_num < cur_bus.max_num:  # 有人在主线上
+                                            stop_buses) <= cfg.ONLY_MAIN_LINE_STOP_THRESHOLD and cur_bus.pass_num < cur_bus.max_num:  # 有人在主线上
                                         dec_dict[bus] = {'stop': True, 'turn': 0, 'can_return_stop': False}
                                     else:
                                         dec_dict[bus] = {'stop': False, 'turn': 0, 'can_return_stop': False}
@@ -316,7 +324,7 @@ class RouteDecider:
                                         dec_num += 1
                                     else:
                                         if len(line.main_line[main_id]) > 0 and len(
-                                                stop_buses) <= ONLY_MAIN_LINE_STOP_THRESHOLD and cur_bus.pass_num < cur_bus.max_num:  # 有人在主线上
+                                                stop_buses) <= cfg.ONLY_MAIN_LINE_STOP_THRESHOLD and cur_bus.pass_num < cur_bus.max_num:  # 有人在主线上
                                             dec_dict[bus] = {'stop': True, 'turn': 0, 'can_return_stop': False}
                                         else:
                                             dec_dict[bus] = {'stop': False, 'turn': 0, 'can_return_stop': False}
@@ -331,7 +339,7 @@ class RouteDecider:
                                         dec_num += 1
                                     else:
                                         if len(line.main_line[main_id]) > 0 and len(
-                                                stop_buses) <= ONLY_MAIN_LINE_STOP_THRESHOLD and cur_bus.pass_num < cur_bus.max_num:  # 有人在主线上
+                                                stop_buses) <= cfg.ONLY_MAIN_LINE_STOP_THRESHOLD and cur_bus.pass_num < cur_bus.max_num:  # 有人在主线上
                                             dec_dict[bus] = {'stop': True, 'turn': 0, 'can_return_stop': False}
                                         else:
                                             dec_dict[bus] = {'stop': False, 'turn': 0, 'can_return_stop': False}
@@ -350,7 +358,7 @@ class RouteDecider:
                                         dec_num += 1
                                     else:
                                         if len(line.main_line[main_id]) > 0 and len(
-                                                stop_buses) <= ONLY_MAIN_LINE_STOP_THRESHOLD and cur_bus.pass_num < cur_bus.max_num:  # 有人在主线上
+                                                stop_buses) <= cfg.ONLY_MAIN_LINE_STOP_THRESHOLD and cur_bus.pass_num < cur_bus.max_num:  # 有人在主线上
                                             dec_dict[bus] = {'stop': True, 'turn': 0, 'can_return_stop': False}
                                         else:
                                             dec_dict[bus] = {'stop': False, 'turn': 0, 'can_return_stop': False}
@@ -362,8 +370,8 @@ class RouteDecider:
                             side_1_down, side_2_down = cur_bus.stop_num_at_side_line(main_line_id=main_id)
 
                             if side_1_down > 0.2 and side_2_down < 0.2:  # #1上有人下车
-                                if side_1_down >= MAIN_LINE_STOP_TURN_THRESHOLD and \
-                                        side_1_down / cur_bus.pass_num >= MAIN_LINE_STOP_TURN_RATE_THRESHOLD:
+                                if side_1_down >= cfg.MAIN_LINE_STOP_TURN_THRESHOLD and \
+                                        side_1_down / cur_bus.pass_num >= cfg.MAIN_LINE_STOP_TURN_RATE_THRESHOLD:
                                     dec_dict[bus] = {'stop': True, 'turn': 1, 'can_return_stop': False}
                                     decide_turn[1].append(bus)
                                     dec_num += 1
@@ -371,8 +379,8 @@ class RouteDecider:
                                     dec_dict[bus] = {'stop': True, 'turn': 0, 'can_return_stop': False}
                                     dec_num += 1
                             elif side_1_down < 0.2 and side_2_down > 0.2:  # #2上有人下车
-                                if side_2_down >= MAIN_LINE_STOP_TURN_THRESHOLD and \
-                                        side_2_down / cur_bus.pass_num >= MAIN_LINE_STOP_TURN_RATE_THRESHOLD:
+                                if side_2_down >= cfg.MAIN_LINE_STOP_TURN_THRESHOLD and \
+                                        side_2_down / cur_bus.pass_num >= cfg.MAIN_LINE_STOP_TURN_RATE_THRESHOLD:
                                     dec_dict[bus] = {'stop': True, 'turn': 2, 'can_return_stop': False}
                                     decide_turn[2].append(bus)
                                     dec_num += 1
@@ -380,9 +388,9 @@ class RouteDecider:
                                     dec_dict[bus] = {'stop': True, 'turn': 0, 'can_return_stop': False}
                                     dec_num += 1
                             elif side_1_down > 0.2 and side_2_down > 0.2:  # #1#2上都有人下车
-                                if max(side_1_down, side_2_down) >= MAIN_LINE_STOP_TURN_THRESHOLD and \
+                                if max(side_1_down, side_2_down) >= cfg.MAIN_LINE_STOP_TURN_THRESHOLD and \
                                         max(side_1_down,
-                                            side_2_down) / cur_bus.pass_num >= MAIN_LINE_STOP_TURN_RATE_THRESHOLD:
+                                            side_2_down) / cur_bus.pass_num >= cfg.MAIN_LINE_STOP_TURN_RATE_THRESHOLD:
                                     turn_direc = 1 if side_1_down >= side_2_down else 2
                                     dec_dict[bus] = {'stop': True, 'turn': turn_direc, 'can_return_stop': False}
                                     decide_turn[turn_direc].append(bus)
@@ -434,7 +442,7 @@ class RouteDecider:
                                         if sum_1_up != sum_2_up:
                                             turn_direc = 1 if sum_1_up > sum_2_up else 2
                                         else:
-                                            turn_direc = random.randint(1, 2)
+                                            turn_direc = self.rng.randint(1, 2)
                                         dec_dict[bus] = {'stop': True, 'turn': turn_direc, 'can_return_stop': False}
                                         decide_turn[turn_direc].append(bus)
                                         dec_num += 1
@@ -510,7 +518,7 @@ class RouteDecider:
                             stop_pas_num = sum([bus_info[bus].stop_pass_num(station=main_id) for bus in stop_buses])
                             up_num = len(line.main_line[main_id])
                             est_num = pas_num - stop_pas_num + up_num
-                            if est_num < max_num * RATE_MAX_STOP:
+                            if est_num < max_num * cfg.RATE_MAX_STOP:
                                 # enough
                                 for bus in can_stop_buses:
                                     dec_dict[bus] = {'stop': False, 'turn': 0}
@@ -523,7 +531,7 @@ class RouteDecider:
                                         can_stop_buses,
                                         key=lambda x: bus_info[x].sum_stations_to_go(station=main_id), reverse=False
                                     )
-                                res_num = up_num - (max_num * RATE_MAX_STOP - pas_num + stop_pas_num)
+                                res_num = up_num - (max_num * cfg.RATE_MAX_STOP - pas_num + stop_pas_num)
                                 enough_flag = False
                                 for alter_bus in alter_stop_order:
                                     if bus_info[alter_bus].max_num == bus_info[alter_bus].pass_num:
@@ -603,7 +611,7 @@ class RouteDecider:
                                     decide_turn[2]) > 0.2:
                                 # 两边都有车且都没有原地下车
                                 if len(line.main_line[main_id]) > 0 and \
-                                        len(stop_buses) + len(have_down_list) + len(main_stop_list) <= ONLY_MAIN_LINE_STOP_THRESHOLD and \
+                                        len(stop_buses) + len(have_down_list) + len(main_stop_list) <= cfg.ONLY_MAIN_LINE_STOP_THRESHOLD and \
                                         cur_bus.pass_num < cur_bus.max_num:  # 有人在主线上
                                     dec_dict[bus] = {'stop': True, 'turn': 0, 'can_return_stop': False}
                                     main_stop_list.append(bus)
@@ -617,7 +625,7 @@ class RouteDecider:
                             elif side_1_bus_num + len(decide_turn[1]) > 0.2:  # 有车在#1
                                 if sum_2_up > 0.2:
                                     # 有人在#2等待
-                                    if cur_bus.pass_num <= MAIN_LINE_TURN_MAX_PASS_NUM:
+                                    if cur_bus.pass_num <= cfg.MAIN_LINE_TURN_MAX_PASS_NUM:
                                         if side_1_down > 0:
                                             dec_dict[bus] = {'stop': True, 'turn': 2, 'can_return_stop': True}
                                             main_stop_list.append(bus)
@@ -633,7 +641,7 @@ class RouteDecider:
                                     dec_num += 1
                                 else:
                                     if len(line.main_line[main_id]) > 0 and \
-                                            len(stop_buses) + len(have_down_list) + len(main_stop_list) <= ONLY_MAIN_LINE_STOP_THRESHOLD and \
+                                            len(stop_buses) + len(have_down_list) + len(main_stop_list) <= cfg.ONLY_MAIN_LINE_STOP_THRESHOLD and \
                                             cur_bus.pass_num < cur_bus.max_num:
                                         dec_dict[bus] = {'stop': True, 'turn': 0, 'can_return_stop': False}
                                         main_stop_list.append(bus)
@@ -647,7 +655,7 @@ class RouteDecider:
                             elif side_2_bus_num + len(decide_turn[2]) > 0.2:
                                 if sum_1_up > 0.2:
                                     # 有人在#1等待
-                                    if cur_bus.pass_num <= MAIN_LINE_TURN_MAX_PASS_NUM:
+                                    if cur_bus.pass_num <= cfg.MAIN_LINE_TURN_MAX_PASS_NUM:
                                         if side_2_down > 0:
                                             dec_dict[bus] = {'stop': True, 'turn': 1, 'can_return_stop': True}
                                             main_stop_list.append(bus)
@@ -663,7 +671,7 @@ class RouteDecider:
                                     dec_num += 1
                                 else:
                                     if len(line.main_line[main_id]) > 0 and \
-                                            len(stop_buses) + len(have_down_list) + len(main_stop_list) <= ONLY_MAIN_LINE_STOP_THRESHOLD and \
+                                            len(stop_buses) + len(have_down_list) + len(main_stop_list) <= cfg.ONLY_MAIN_LINE_STOP_THRESHOLD and \
                                             cur_bus.pass_num < cur_bus.max_num:
                                         dec_dict[bus] = {'stop': True, 'turn': 0, 'can_return_stop': False}
                                         main_stop_list.append(bus)
@@ -688,8 +696,8 @@ class RouteDecider:
                                         if early_1_up != early_2_up:
                                             turn_direc = 1 if early_1_up < early_2_up else 2
                                         else:
-                                            turn_direc = random.randint(1, 2)
-                                    if cur_bus.pass_num <= MAIN_LINE_TURN_MAX_PASS_NUM:
+                                            turn_direc = self.rng.randint(1, 2)
+                                    if cur_bus.pass_num <= cfg.MAIN_LINE_TURN_MAX_PASS_NUM:
                                         if turn_direc == 1:
                                             if side_2_down > 0:
                                                 dec_dict[bus] = {'stop': True, 'turn': turn_direc, 'can_return_stop': True}
@@ -710,7 +718,7 @@ class RouteDecider:
                                         else:
                                             if len(line.main_line[main_id]) > 0 and \
                                                     len(stop_buses) + len(have_down_list) + len(
-                                                main_stop_list) <= ONLY_MAIN_LINE_STOP_THRESHOLD and \
+                                                main_stop_list) <= cfg.ONLY_MAIN_LINE_STOP_THRESHOLD and \
                                                     cur_bus.pass_num < cur_bus.max_num:
                                                 dec_dict[bus] = {'stop': True, 'turn': 0, 'can_return_stop': False}
                                                 main_stop_list.append(bus)
@@ -719,7 +727,7 @@ class RouteDecider:
                                     dec_num += 1
                                 else:
                                     if len(line.main_line[main_id]) > 0 and \
-                                            len(stop_buses) + len(have_down_list) + len(main_stop_list) <= ONLY_MAIN_LINE_STOP_THRESHOLD and \
+                                            len(stop_buses) + len(have_down_list) + len(main_stop_list) <= cfg.ONLY_MAIN_LINE_STOP_THRESHOLD and \
                                             cur_bus.pass_num < cur_bus.max_num:
                                         dec_dict[bus] = {'stop': True, 'turn': 0, 'can_return_stop': False}
                                         main_stop_list.append(bus)
@@ -781,7 +789,7 @@ class RouteDecider:
                                         if early_1_up != early_2_up:
                                             turn_direc = 1 if early_1_up < early_2_up else 2
                                         else:
-                                            turn_direc = random.randint(1, 2)
+                                            turn_direc = self.rng.randint(1, 2)
                                     if turn_direc == 1:
                                         dec_dict[bus] = {'stop': True, 'turn': turn_direc, 'can_return_stop': True}
                                     else:
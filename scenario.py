@@ -0,0 +1,157 @@
+"""
+二进制场景文件：每条线路/方向/日期/仿真模式一个目录，保存预处理后的线路模板，乘客数组按列存储为 .npy，
+加载时以 mmap 方式零拷贝映射，不再读取或预处理乘客链数据
+
+目录结构:
+    meta.json                  # 版本、线路、方向、日期、仿真模式、随机种子、预处理参数、各组的列名、源数据 md5 与预处理缓存键
+    line.<col>.npy             # 站点、坐标、区间距离、区间速度
+    dep.<col>.npy              # 发车间隔与发车数量
+    side_line_info.<col>.npy   # 支线信息
+    pass_arrays.<col>.npy      # 预处理后的乘客数组（Line.pass_arrays）
+    template.pkl               # 线路模板骨架（支线几何等，不含乘客数据；仿真参数在加载时按预处理参数重建）
+"""
+import copy
+import json
+import os
+import pickle
+import numpy as np
+import pandas as pd
+
+from config import TEMPLATE_FIELDS, SimConfig
+from consts import TEST_LINE, DIRECTION, DAY, RANDOM_SEED
+from env.line import Line, get_file_hash
+
+SCENARIO_VERSION = 3
+
+
+def get_scenario_path(day: int = DAY, mode: str = 'multi_order', root: str = 'data'):
+    """场景目录"""
+    return os.path.join(root, f'line_{TEST_LINE}', f'scenario_{DIRECTION}_{day}_{mode}')
+
+
+def _to_array(values):
+    """转为可 mmap 的定长数组（字符串转为 unicode 定长类型）"""
+    arr = np.asarray(values)
+    if arr.dtype == object:
+        arr = arr.astype(str)
+    return np.ascontiguousarray(arr)
+
+
+def write_scenario(path: str, line_info: dict, chain_data_path: str, day: int = DAY, mode: str = 'multi_order',
+                   seed: int = RANDOM_SEED, config: SimConfig = None):
+    """
+    预处理 read_in 读取的线路信息与乘客链数据，将线路模板写为场景目录
+
+    :param path: 场景目录
+    :param line_info: read_in / read_in_for_opt 的返回值
+    :param chain_data_path: 乘客链数据 csv
+    :param day: 日期
+    :param mode: 仿真模式
+    :param seed: 预处理的随机数种子
+    :param config: 仿真参数（预处理只使用其中的 TEMPLATE_FIELDS），None 为 consts.py 中的值
+    :return: Line
+    """
+    os.makedirs(path, exist_ok=True)
+    chain_data = pd.read_csv(chain_data_path, encoding='utf-8')
+    chain_data_hash = get_file_hash(chain_data_path)
+    line = Line(direc=DIRECTION, station_list=line_info['station_list'], loc_list=line_info['loc_list'],
+                dist_list=line_info['dist_list'], speed_list=line_info['speed_list'], mode=mode,
+                side_line_info=line_info['side_line_info'], seed=seed, chain_data=chain_data,
+                chain_data_hash=chain_data_hash, day=day, config=config)
+    groups = {
+        'line': {
+            'station': line_info['station_list'],
+            'lat': [loc[0] for loc in line_info['loc_list']],
+            'lon': [loc[1] for loc in line_info['loc_list']],
+            'dist': line_info['dist_list'],
+            'speed': line_info['speed_list'],
+        },
+        'dep': {
+            'dep_duration': line_info['dep_duration_list'],
+            'dep_num': line_info['dep_num_list'],
+        },
+        'side_line_info': {col: line_info['side_line_info'][col].values for col in line_info['side_line_info']},
+        'pass_arrays': line.pass_arrays,
+    }
+    meta = {
+        'version': SCENARIO_VERSION,
+        'line': TEST_LINE,
+        'direction': DIRECTION,
+        'day': line.day,
+        'mode': mode,
+        'seed': seed,
+        'template_config': {name: getattr(line.config, name) for name in TEMPLATE_FIELDS},
+        'chain_data_hash': chain_data_hash,
+        'cache_key': line.cache_key,
+        'columns': {},
+    }
+    for group, columns in groups.items():
+        meta['columns'][group] = list(columns.keys())
+        for col, values in columns.items():
+            np.save(os.path.join(path, f'{group}.{col}.npy'), _to_array(values), allow_pickle=False)
+
+    # 线路骨架（与 SharedLine 相同，乘客数据由 pass_arrays 映射）
+    skeleton = copy.copy(line)
+    skeleton.passenger_pool = None
+    skeleton.pass_arrays = None
+    skeleton.chain_data = None
+    skeleton.eligible_suffix = None
+    skeleton.side_line_info = None  # 由 side_line_info.<col>.npy 重建
+    with open(os.path.join(path, 'template.pkl'), 'wb') as f:
+        pickle.dump(skeleton, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    # meta 最后写入，作为场景完整的标志
+    with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    return line
+
+
+def load_scenario(path: str, config: SimConfig = None):
+    """
+    以 mmap 方式打开场景目录，返回与 read_in 相同的字典，额外包含 line（乘客数组为只读 mmap 的线路模板）
+    与 chain_data_hash，可直接用于 Sim(**scenario, sim_mode=..., ...)（sim_mode 须与场景相同）
+
+    :param path: 场景目录
+    :param config: 运行时参数的取值，None 为 consts.py 中的当前值（预处理参数 TEMPLATE_FIELDS 始终取场景中的值）
+    :return: dict
+    """
+    with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    assert meta['version'] == SCENARIO_VERSION, \
+        f'scenario version {meta["version"]} is not supported, rebuild it with write_scenario'
+    assert meta['direction'] == DIRECTION, f'scenario direction {meta["direction"]} != {DIRECTION}'
+    arrays = {
+        group: {col: np.load(os.path.join(path, f'{group}.{col}.npy'), mmap_mode='r', allow_pickle=False)
+                for col in columns}
+        for group, columns in meta['columns'].items()
+    }
+    with open(os.path.join(path, 'template.pkl'), 'rb') as f:
+        line = pickle.load(f)
+    line.pass_arrays = arrays['pass_arrays']
+    # 骨架中的仿真参数是写入场景时的值，运行时参数改为当前值，避免修改 consts.py 后仍使用旧值
+    line.config = (SimConfig() if config is None else config).replace(**meta['template_config'])
+
+    # 线路与发车信息很小，转为 list 与 read_in 保持一致；乘客数据保持 mmap
+    info, dep = arrays['line'], arrays['dep']
+    side_line_info = pd.DataFrame({col: np.asarray(val) for col, val in arrays['side_line_info'].items()})
+    line.side_line_info = side_line_info
+    return {
+        'station_list': info['station'].tolist(),
+        'dist_list': info['dist'].tolist(),
+        'loc_list': list(zip(info['lat'].tolist(), info['lon'].tolist())),
+        'speed_list': info['speed'].tolist(),
+        'dep_duration_list': dep['dep_duration'].tolist(),
+        'dep_num_list': dep['dep_num'].tolist(),
+        'side_line_info': side_line_info,
+        'line': line,
+        'chain_data_hash': meta['chain_data_hash'],
+    }
+
+
+if __name__ == '__main__':
+    from sim import read_in
+
+    line_info = read_in(way='total', fractile=None)
+    write_scenario(path=get_scenario_path(day=DAY), line_info=line_info,
+                   chain_data_path=Line.get_chain_data_path(day=DAY), day=DAY)
+    print(f'scenario saved to {get_scenario_path(day=DAY)}')
@@ -0,0 +1,225 @@
+"""
+全局敏感性分析（Morris 基本效应法）：在仿真模式下起作用的结合/分离与转向参数（SimConfig）以及发车方案
+（与优化器相同的 8 个两小时时段的发车数量与发车间隔）上生成 Morris 轨迹，按批经 sweep.run_sweep 并行仿真，统计各参数对能耗与平均出行时间的影响。
+mu* 大的参数影响大，sigma 大的参数存在非线性或与其他参数的交互；影响可忽略的参数可在优化中固定
+"""
+import os
+import numpy as np
+
+from consts import RANDOM_SEED, SA_NUM_TRAJECTORIES, SA_NUM_LEVELS, SA_BATCH_TRAJECTORIES, SA_TOP_K, SA_PATIENCE
+from scenario import load_scenario
+from sweep import run_sweep
+
+POWER_KEY = 'power consumption(condition, kWh)'
+AVG_T_KEY = 'avg_travel_t(full, min)'
+
+# SimConfig 参数的取值范围 {参数名: (下界, 上界)}，上下界均为整数时取整数。
+# sim_mode='single' 只使用单线的结合/分离参数；'multi'/'multi_order' 使用 *_MULTI 参数与转向参数
+CONFIG_FACTORS = {
+    'RATE_COMB_ROUTE': (0., 1.),
+    'RATE_FRONT_PASS': (0., 1.),
+    'RATE_REAR_PASS': (0., 1.),
+    'COMB_FORE_STA': (1, 4),
+    'MIN_SEP_PASS_NUM': (0, 3),
+    'SEP_DURATION': (10, 20),
+    'COMB_DURATION': (16, 28),
+}
+CONFIG_FACTORS_MULTI = {
+    'RATE_COMB_ROUTE_MULTI': (0., 1.),
+    'RATE_FRONT_PASS_MULTI': (0., 1.),
+    'RATE_REAR_PASS_MULTI': (0., 1.),
+    'COMB_FORE_STA_MULTI': (1, 4),
+    'MIN_SEP_PASS_NUM_MULTI': (0, 3),
+    'SEP_DURATION': (10, 20),
+    'COMB_DURATION': (16, 28),
+    'MAIN_LINE_STOP_TURN_THRESHOLD': (1, 5),
+    'MAIN_LINE_STOP_TURN_RATE_THRESHOLD': (0.1, 0.5),
+    'MAIN_LINE_TURN_MAX_PASS_NUM': (3, 15),
+    'ONLY_MAIN_LINE_STOP_THRESHOLD': (0, 2),
+}
+
+
+def get_config_factors(sim_mode: str):
+    """仿真模式下起作用的 SimConfig 参数（baseline 不结合/分离也不转向，只分析发车方案）"""
+    if sim_mode in ['multi', 'multi_order']:
+        return CONFIG_FACTORS_MULTI
+    if sim_mode == 'single':
+        return CONFIG_FACTORS
+    return {}
+
+# 发车方案的取值范围：与优化器的决策变量相同，6:00 起每两小时一个时段的发车数量与发车间隔（分钟）
+NUM_PERIODS = 8
+SCHEDULE_FACTORS = {
+    **{f'dep_num_{i}': (1, 3) for i in range(NUM_PERIODS)},
+    **{f'dep_duration_{i}': (8, 15) for i in range(NUM_PERIODS)},
+}
+
+
+def to_schedule(values: dict, dep_num_list: list, dep_duration_list: list):
+    """
+    将参数点中的时段发车参数写入各小时的发车方案
+
+    :param values: 参数点（dep_num_i: 发车数量，dep_duration_i: 发车间隔（分钟））
+    :param dep_num_list: 基准方案的各小时发车数量
+    :param dep_duration_list: 基准方案的各小时发车间隔（秒）
+    :return: dep_num_list, dep_duration_list
+    """
+    dep_num_list, dep_duration_list = list(dep_num_list), list(dep_duration_list)
+    for i in range(NUM_PERIODS):
+        for hour in (6 + 2 * i, 7 + 2 * i):
+            if f'dep_num_{i}' in values:
+                dep_num_list[hour] = values[f'dep_num_{i}']
+            if f'dep_duration_{i}' in values:
+                dep_duration_list[hour] = values[f'dep_duration_{i}'] * 60
+    return dep_num_list, dep_duration_list
+
+
+def morris_design(factors: dict, num_trajectories: int, num_levels: int = SA_NUM_LEVELS, seed: int = RANDOM_SEED):
+    """
+    Morris 轨迹：起点取自 num_levels 个等距水平，按随机顺序每次改变一个参数 delta = p / (2(p - 1))
+
+    :param factors: {参数名: (下界, 上界)}
+    :param num_trajectories: 轨迹数
+    :param num_levels: 取值水平数（偶数）
+    :param seed: 随机数种子
+    :return: [[(改变的参数名或 None, 参数值 dict)] * (参数数 + 1)]
+    """
+    names = list(factors.keys())
+    delta = num_levels / (2 * (num_levels - 1))
+    levels = np.arange(num_levels) / (num_levels - 1)
+    rng = np.random.default_rng(seed)
+
+    def to_values(x):
+        values = {}
+        for name, u in zip(names, x):
+            lo, hi = factors[name]
+            if isinstance(lo, int) and isinstance(hi, int):
+                values[name] = int(round(lo + u * (hi - lo)))
+            else:
+                values[name] = float(lo + u * (hi - lo))
+        return values
+
+    trajectories = []
+    for _ in range(num_trajectories):
+        x = rng.choice(levels, size=len(names))
+        steps = [(None, to_values(x))]
+        for j in rng.permutation(len(names)):
+            x = x.copy()
+            x[j] += delta if x[j] + delta <= 1 else -delta
+            steps.append((names[j], to_values(x)))
+        trajectories.append(steps)
+    return trajectories
+
+
+def elementary_effects(trajectories: list, outputs: list, factors: dict):
+    """
+    :param trajectories: morris_design 的返回值
+    :param outputs: 与轨迹各步对应的统计数据 [[stats]]
+    :param factors: {参数名: (下界, 上界)}
+    :return: {统计项: {参数名: [基本效应]}}，参数变化按取值范围归一化，取整后未变化的步不计入
+    """
+    effects = {}
+    for steps, stats in zip(trajectories, outputs):
+        for k in range(1, len(steps)):
+            name = steps[k][0]
+            lo, hi = factors[name]
+            change = (steps[k][1][name] - steps[k - 1][1][name]) / (hi - lo)
+            if change == 0:
+                continue
+            for key in stats[k]:
+                if key in stats[k - 1]:
+                    ee = (stats[k][key] - stats[k - 1][key]) / change
+                    effects.setdefault(key, {}).setdefault(name, []).append(ee)
+    return effects
+
+
+def summarize(effects: dict, metrics: tuple = (POWER_KEY, AVG_T_KEY)):
+    """
+    :param effects: elementary_effects 的返回值
+    :param metrics: 统计项
+    :return: {统计项: [(参数名, mu, mu*, sigma, 基本效应数)]}，按 mu* 从大到小排列
+    """
+    report = {}
+    for metric in metrics:
+        rows = []
+        for name, ees in effects.get(metric, {}).items():
+            ees = np.asarray(ees, dtype=float)
+            sigma = ees.std(ddof=1) if len(ees) > 1 else 0.
+            rows.append((name, ees.mean(), np.abs(ees).mean(), sigma, len(ees)))
+        report[metric] = sorted(rows, key=lambda row: -row[2])
+    return report
+
+
+def top_factors(report: dict, k: int = SA_TOP_K):
+    """各统计项 mu* 最大的 k 个参数的并集"""
+    return set(row[0] for rows in report.values() for row in rows[:k])
+
+
+def run_morris(scenario, factors: dict = None, path: str = os.path.join('sweeps', 'morris.jsonl'),
+               num_trajectories: int = SA_NUM_TRAJECTORIES, num_levels: int = SA_NUM_LEVELS,
+               batch_trajectories: int = SA_BATCH_TRAJECTORIES, top_k: int = SA_TOP_K, patience: int = SA_PATIENCE,
+               metrics: tuple = (POWER_KEY, AVG_T_KEY), seed: int = RANDOM_SEED, processes: int = None,
+               verbose: bool = False, **sim_kwargs):
+    """
+    按批并行评估 Morris 轨迹，每批后更新排序；各统计项最重要的 top_k 个参数连续 patience 批不变时提前停止。
+    仿真结果写入 path，中断后重新运行只评估未完成的参数点
+
+    :param scenario: 场景目录或 read_in / load_scenario 的返回值
+    :param factors: {参数名: (下界, 上界)}，None 为 sim_mode 下起作用的 SimConfig 参数与 SCHEDULE_FACTORS
+    :param path: 仿真结果文件（JSON Lines）
+    :param num_trajectories: 最多轨迹数
+    :param num_levels: 取值水平数
+    :param batch_trajectories: 每批的轨迹数
+    :param top_k: 关注的最重要参数个数
+    :param patience: 提前停止所需的连续不变批数，None 表示评估全部轨迹
+    :param metrics: 统计项
+    :param seed: 随机数种子（轨迹设计）
+    :param processes: 进程数，None 为 CPU 核数
+    :param verbose: 是否在每批后输出当前排序
+    :param sim_kwargs: 其他 Sim 参数（见 sweep.run_sweep）
+    :return: {'report': summarize 的返回值, 'num_trajectories', 'num_points'}
+    """
+    if factors is None:
+        factors = {**get_config_factors(sim_kwargs.get('sim_mode', 'multi_order')), **SCHEDULE_FACTORS}
+    line_info = load_scenario(scenario) if isinstance(scenario, str) else scenario
+    base_num = sim_kwargs.get('dep_num_list', line_info['dep_num_list'])
+    base_duration = sim_kwargs.get('dep_duration_list', line_info['dep_duration_list'])
+    trajectories = morris_design(factors, num_trajectories, num_levels=num_levels, seed=seed)
+
+    def to_point(values):
+        point = {name: val for name, val in values.items() if name not in SCHEDULE_FACTORS}
+        if any(name in SCHEDULE_FACTORS for name in values):
+            point['dep_num_list'], point['dep_duration_list'] = to_schedule(values, base_num, base_duration)
+        return point
+
+    outputs, report, last_top, num_stable = [], {}, None, 0
+    for start in range(0, num_trajectories, batch_trajectories):
+        batch = trajectories[start:start + batch_trajectories]
+        points = [to_point(values) for steps in batch for _, values in steps]
+        records = run_sweep(scenario, points, path, processes=processes, verbose=verbose, **sim_kwargs)
+        stats = [record['stats'] for record in records]
+        outputs += [stats[i * len(steps):(i + 1) * len(steps)] for i, steps in enumerate(batch)]
+
+        report = summarize(elementary_effects(trajectories[:len(outputs)], outputs, factors), metrics)
+        top = top_factors(report, top_k)
+        num_stable = num_stable + 1 if top == last_top else 0
+        last_top = top
+        if verbose:
+            print(f'morris: {len(outputs)} trajectories, top {top_k}: ' +
+                  '; '.join(f'{metric}: {[row[0] for row in rows[:top_k]]}' for metric, rows in report.items()))
+        if patience is not None and num_stable >= patience:
+            break
+
+    return {'report': report, 'num_trajectories': len(outputs), 'num_points': len(outputs) * (len(factors) + 1)}
+
+
+if __name__ == '__main__':
+    from sim import read_in
+
+    line_info = read_in(way='total', fractile=None)
+    res = run_morris(line_info, verbose=True)
+    print(f'{res["num_trajectories"]} trajectories, {res["num_points"]} points')
+    for metric, rows in res['report'].items():
+        print(metric)
+        for name, mu, mu_star, sigma, num in rows:
+            print(f'    {name:<36} mu* {mu_star:10.3f}  mu {mu:10.3f}  sigma {sigma:10.3f}  (n={num})')
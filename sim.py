@@ -1,13 +1,20 @@
+import copy
 import logging
+import math
+import multiprocessing as mp
 import operator
+import os
+import pickle
+import random
 import time
 import numpy as np
 import pandas as pd
 
+from config import SimConfig
 from consts import *
 
 from env.bus import Bus
-from env.line import Line
+from env.line import Line, decode_loc
 from env.passenger import Passenger
 
 from dep_decide import DepDecider
@@ -15,6 +22,63 @@ from route_decide import RouteDecider
 
 logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
 
+SNAPSHOT_VERSION = 2  # 快照文件格式变化时递增
+_SHARED_ATTRS = ('template', 'base_line')  # 快照与分支中共享、不复制的属性
+
+
+def spawn_seeds(seed: int, num: int):
+    """
+    由 numpy SeedSequence 派生 num 个互相独立的子种子，用于并行的重复仿真或工作进程：
+    第 i 个子种子只由 (seed, i) 决定，与任务的调度顺序、进程中已构建的对象无关。
+
+    例: seeds = spawn_seeds(RANDOM_SEED, 8); Sim(..., seed=seeds[i])
+
+    :param seed: 根种子
+    :param num: 子种子数量
+    :return: [int]
+    """
+    return [int(ss.generate_state(1)[0]) for ss in np.random.SeedSequence(seed).spawn(num)]
+
+
+def _template_refs(line: Line):
+    """线路模板及其非标量属性，快照中以名称引用而不复制"""
+    refs = {'template': line}
+    for key, val in vars(line).items():
+        if not isinstance(val, (bool, int, float, str, type(None))):
+            refs[f'template.{key}'] = val
+    return refs
+
+
+class _SnapshotPickler(pickle.Pickler):
+    """写快照文件：线路模板的属性只记录名称"""
+
+    def __init__(self, file, line: Line):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.refs = {id(val): key for key, val in _template_refs(line).items()}
+
+    def persistent_id(self, obj):
+        return self.refs.get(id(obj))
+
+
+# 进程级分支：由 fork_map 在创建子进程前设置，子进程通过写时复制继承
+_fork_branches = None
+
+
+def _run_fork_branch(i: int):
+    sim, funcs = _fork_branches
+    return funcs[i](sim)
+
+
+class _SnapshotUnpickler(pickle.Unpickler):
+    """读快照文件：按名称从给定的线路模板取回属性"""
+
+    def __init__(self, file, line: Line):
+        super().__init__(file)
+        self.refs = _template_refs(line)
+
+    def persistent_load(self, pid):
+        return self.refs[pid]
+
 
 def read_in(**kwargs):
     """read files"""
@@ -137,18 +201,191 @@ class Sim:
 
     def __init__(self, station_list: list, dist_list: list, loc_list: list,
                  speed_list: list, sim_mode: str, dep_duration_list: list, dep_num_list: list,
-                 side_line_info=None, **kwargs):
-        # 路线
-        self.line = Line(direc=DIRECTION, station_list=station_list, loc_list=loc_list,
-                         dist_list=dist_list, speed_list=speed_list, mode=sim_mode, side_line_info=side_line_info)
-        self.dep_decider = DepDecider(sim_mode=sim_mode, dep_duration=dep_duration_list, dep_num=dep_num_list)
-        self.route_decider = RouteDecider(sim_mode=sim_mode)
+                 side_line_info=None, line: Line = None, chain_data=None, chain_data_hash=None, **kwargs):
+        # 仿真参数，未给出时取线路模板的参数（新建模板时为 consts.py 中的值）
+        config = kwargs.get('config')
+        # 路线模板（站点、距离、速度、支线几何与乘客池，各轮仿真共享）
+        if line is None:
+            config = SimConfig() if config is None else config
+            if 'day' in kwargs.keys():
+                config = config.replace(DAY=kwargs['day'])
+            line = Line(direc=DIRECTION, station_list=station_list, loc_list=loc_list,
+                        dist_list=dist_list, speed_list=speed_list, mode=sim_mode, side_line_info=side_line_info,
+                        chain_data=chain_data, chain_data_hash=chain_data_hash, config=config,
+                        seed=kwargs.get('seed', RANDOM_SEED))
+        assert line.mode == sim_mode, f'line template mode {line.mode} != sim_mode {sim_mode}'
+        self.base_line = line  # 全量乘客的线路模板
+        self.template = line  # 本仿真使用的线路模板（低保真度时为抽样后的模板）
+
+        # 需求种子：None 为线路模板的需求实现，否则为以该种子重新预处理乘客链数据得到的需求实现（见 Line.reseed）
+        self.demand_seed = None
+        # 保真度：仿真的乘客比例，车厢容量与乘客人数阈值按同一比例缩小
+        self.fidelity = 1.0
+        self.fidelity_seed = RANDOM_SEED
+        self.fidelity_bias = {}  # {保真度: {统计项: (偏差, 标准误差)}}，由 calibrate_fidelity 估计
+        self.base_config = line.config  # 全量需求下的仿真参数
+        self.config = line.config  # 本仿真使用的参数（低保真度时乘客人数阈值按比例缩小）
+        if config is not None:
+            self.set_config(config)
+        if kwargs.get('fidelity', 1.0) < 1:
+            self.set_fidelity(kwargs['fidelity'], seed=kwargs.get('fidelity_seed', RANDOM_SEED), reset=False)
 
         # 仿真模式 in ['baseline', 'single', 'multi', 'multi_order']
         self.sim_mode = sim_mode
 
+        # 结合和分离决策
+        self.can_reorg = None  # 用于测试结合和分离的效果，仅限于 sim_mode == ['single', 'multi_order']
+
+        # 日志输出
+        self.print_log = False
+
+        # 提前终止：累计能耗（条件法）超过该值时停止仿真，None 表示不提前终止
+        self.abort_obj = None
+        # 提前终止：平均全程出行时间（分钟）的下界（见 get_avg_t_lb）达到该值时停止仿真，None 表示不检查
+        self.abort_avg_t = None
+
+        # 主线+支线决策模式
+        if self.sim_mode in ['multi', 'multi_order']:
+            self.multi_dec_rule = kwargs['multi_dec_rule']
+
+        # 车辆状态输出
+        self.get_record = kwargs['record_time'] if 'record_time' in kwargs.keys() else None
+
+        # 随机数种子：线路模板的需求扰动（仅在构建模板时使用）与转向决策的随机数流
+        self.seed = kwargs.get('seed', line.seed)
+        # 转向决策的随机数种子，None 时使用 seed；每轮仿真从同一种子开始，结果与此前运行过的仿真无关
+        self.route_seed = kwargs.get('route_seed')
+        self.rng = None  # 本轮仿真的转向随机数流（random.Random），由 reset 创建
+
+        self.dep_decider = None
+        self.reset(dep_num_list=dep_num_list, dep_duration_list=dep_duration_list)
+
+    @classmethod
+    def from_template(cls, line: Line, dep_duration_list: list, dep_num_list: list, **kwargs):
+        """在已有线路模板上构建仿真，不重新读取或预处理数据"""
+        return cls(station_list=line.station_list, dist_list=line.dist_list, loc_list=line.loc_list,
+                   speed_list=line.speed_list, sim_mode=line.mode, dep_duration_list=dep_duration_list,
+                   dep_num_list=dep_num_list, line=line, **kwargs)
+
+    def set_fidelity(self, fidelity: float, seed: int = RANDOM_SEED, reset: bool = True):
+        """
+        设置保真度：按 (小时, 上车站点) 分层抽取 fidelity 比例的乘客进行仿真，车厢容量与乘客人数阈值同比例缩小；
+        get_statistics 将乘客数量换算为全量需求，并给出平均时间的标准误差。
+        比例取为 1 / gcd(SMALL_CAB, LARGE_BUS) 的整数倍（默认参数下为 0.1 的倍数），使缩小后的容量没有取整误差
+
+        :param fidelity: 乘客比例，1 表示全量
+        :param seed: 抽样随机数种子
+        :param reset: 是否重置仿真
+        :return:
+        """
+        assert 0 < fidelity <= 1, f'fidelity {fidelity} should be in (0, 1]'
+        unit = math.gcd(self.base_config.SMALL_CAB, self.base_config.LARGE_BUS)
+        snapped = min(unit, max(1, int(fidelity * unit + 0.5))) / unit
+        if snapped != fidelity:
+            logging.info(f'fidelity {fidelity} snapped to {snapped} so that capacities scale exactly')
+        self.fidelity, self.fidelity_seed = snapped, seed
+        self.update_template()
+        self.config = self.base_config.scale_passengers(self.fidelity)
+        if reset:
+            self.reset()
+
+    def set_demand_seed(self, seed: int = None, reset: bool = True):
+        """
+        更换需求实现：以 seed 重新预处理乘客链数据（出发时刻与坐标的扰动，结果有预处理缓存），None 恢复线路模板的需求；
+        重复仿真以此得到互相独立的需求实现
+
+        :param seed: 预处理的随机数种子
+        :param reset: 是否重置仿真
+        :return:
+        """
+        self.demand_seed = seed
+        self.update_template()
+        if reset:
+            self.reset()
+
+    def update_template(self):
+        """由线路模板、需求种子与保真度确定本仿真使用的线路模板"""
+        line = self.base_line if self.demand_seed is None else self.base_line.reseed(self.demand_seed)
+        self.template = line if self.fidelity >= 1 else line.subsample(self.fidelity, seed=self.fidelity_seed)
+
+    def set_config(self, config: SimConfig):
+        """
+        更换仿真参数（下一次 reset 起生效），预处理参数（TEMPLATE_FIELDS）必须与线路模板相同
+
+        :param config: 全量需求下的 SimConfig，低保真度时乘客人数阈值自动按比例缩小
+        :return:
+        """
+        assert config.template_key() == self.base_line.config.template_key(), \
+            f'config differs from the line template in preprocessing fields: {config.diff(self.base_line.config)}'
+        self.base_config = config
+        self.config = config.scale_passengers(self.fidelity)
+
+    def calibrate_fidelity(self, fidelity: float, seeds: tuple = (1, 2, 3, 4),
+                           keys: tuple = ('power consumption(condition, kWh)', 'avg_travel_t(full, min)',
+                                          'sep times', 'comb times')):
+        """
+        在当前发车方案上比较低保真度与全量仿真，估计低保真度统计数据的系统偏差（抽样后“下站无人下车”等离散事件
+        更常发生，结合/分离决策不能完全由缩小阈值修正）；此后该保真度的 get_statistics 在 'bias' 中给出该估计。
+        结束时保真度为 fidelity（最后一个抽样种子）
+
+        :param fidelity: 乘客比例
+        :param seeds: 抽样随机数种子
+        :param keys: 统计项
+        :return: {统计项: (偏差, 标准误差)}
+        """
+        self.set_fidelity(1.0)
+        self.run()
+        full = self.get_statistics()
+        diffs = []
+        for seed in seeds:
+            self.set_fidelity(fidelity, seed=seed)
+            self.run()
+            stats = self.get_statistics()
+            diffs.append([float(stats[key]) - float(full[key]) for key in keys])
+            self.reset()
+        diffs = np.array(diffs)
+        se = diffs.std(axis=0, ddof=1) / np.sqrt(len(seeds)) if len(seeds) > 1 else [None] * len(keys)
+        self.fidelity_bias[self.fidelity] = {key: (float(diffs[:, j].mean()), None if se[j] is None else float(se[j]))
+                                             for j, key in enumerate(keys)}
+        return self.fidelity_bias[self.fidelity]
+
+    def scale_cap(self, cap: int):
+        """按保真度缩小的容量（至少为 1）"""
+        return cap if self.fidelity >= 1 else max(1, int(round(cap * self.fidelity)))
+
+    def reset(self, dep_num_list: list = None, dep_duration_list: list = None, **kwargs):
+        """
+        在同一线路模板上开始新一轮仿真，只重建等待队列、车辆、乘客与计数器
+
+        :param dep_num_list: 各小时发车数量，None 表示沿用上一轮
+        :param dep_duration_list: 各小时发车间隔，None 表示沿用上一轮
+        :param kwargs: multi_dec_rule, record_time, route_seed, demand_seed, config，未给出时沿用上一轮
+        :return:
+        """
+        if dep_num_list is None:
+            dep_num_list = self.dep_decider.dep_num_list
+        if dep_duration_list is None:
+            dep_duration_list = self.dep_decider.dep_duration_list
+        if 'multi_dec_rule' in kwargs.keys() and self.sim_mode in ['multi', 'multi_order']:
+            self.multi_dec_rule = kwargs['multi_dec_rule']
+        if 'record_time' in kwargs.keys():
+            self.get_record = kwargs['record_time']
+        if 'route_seed' in kwargs.keys():
+            self.route_seed = kwargs['route_seed']
+        if kwargs.get('config') is not None:
+            self.set_config(kwargs['config'])
+        if 'demand_seed' in kwargs.keys() and kwargs['demand_seed'] != self.demand_seed:
+            self.set_demand_seed(kwargs['demand_seed'], reset=False)
+
+        # 路线（仅等待队列为本轮独有）
+        self.line = self.template.spawn()
+        self.dep_decider = DepDecider(sim_mode=self.sim_mode, dep_duration=dep_duration_list, dep_num=dep_num_list,
+                                      config=self.config)
+        self.rng = random.Random(self.seed if self.route_seed is None else self.route_seed)
+        self.route_decider = RouteDecider(sim_mode=self.sim_mode, rng=self.rng, config=self.config)
+
         # 系统时间
-        self.t = SIM_START_T
+        self.t = self.config.SIM_START_T
 
         # 存储所有已发车的 bus 和已接入系统的乘客
         self.all_buses = {}
@@ -163,19 +400,18 @@ class Sim:
         self.pas_pool = []  # 已完成的乘客池
         self.pas_idx = 0
 
-        # 结合和分离决策与相应日志
-        self.can_reorg = None  # 用于测试结合和分离的效果，仅限于 sim_mode == ['single', 'multi_order']
+        # 结合和分离日志
         self.reorg_log = []  # 用于记录结合和分离的日志[(time, code)] code: 0-结合，1-分离
 
-        # 日志输出
-        self.print_log = False
+        # 是否已开始运行（首班车已发出），run(until=...) 暂停后再次调用时继续
+        self.started = False
 
-        # 主线+支线决策模式
-        if self.sim_mode in ['multi', 'multi_order']:
-            self.multi_dec_rule = kwargs['multi_dec_rule']
+        # 提前终止原因，None 表示完整运行
+        self.aborted = None
+        self.lb_pool_idx = 0  # 已计入下界的完成乘客数
+        self.lb_full_t = 0  # 已完成乘客全程出行时间之和
 
         # 车辆状态输出
-        self.get_record = kwargs['record_time'] if 'record_time' in kwargs.keys() else None
         self.record_dict = {} if self.get_record is not None else None
         self.record_bus_num = 0 if self.get_record is not None else None
         self.record_end_bus_num = 0 if self.get_record is not None else None
@@ -183,31 +419,38 @@ class Sim:
     @property
     def stop_time(self):
         """进站时间"""
+        cfg = self.config
+        is_high = cfg.EARLY_HIGH_START_T <= self.t < cfg.EARLY_HIGH_END_T or \
+            cfg.LATE_HIGH_START_T <= self.t < cfg.LATE_HIGH_END_T
         if self.sim_mode == 'baseline':
-            if EARLY_HIGH_START_T <= self.t < EARLY_HIGH_END_T or LATE_HIGH_START_T <= self.t < LATE_HIGH_END_T:
-                return OLD_STOP_T_HIGH
-            else:
-                return OLD_STOP_T_NORM
-        elif self.sim_mode == 'single':
-            if EARLY_HIGH_START_T <= self.t < EARLY_HIGH_END_T or LATE_HIGH_START_T <= self.t < LATE_HIGH_END_T:
-                return NEW_STOP_T_HIGH
-            else:
-                return NEW_STOP_T_NORM
+            return cfg.OLD_STOP_T_HIGH if is_high else cfg.OLD_STOP_T_NORM
         else:
-            if EARLY_HIGH_START_T <= self.t < EARLY_HIGH_END_T or LATE_HIGH_START_T <= self.t < LATE_HIGH_END_T:
-                return NEW_STOP_T_HIGH
-            else:
-                return NEW_STOP_T_NORM
+            return cfg.NEW_STOP_T_HIGH if is_high else cfg.NEW_STOP_T_NORM
+
+    def run(self, until: int = None):
+        """
+        运行仿真
 
-    def run(self):
+        :param until: 运行到该时刻（该时刻的步进尚未执行）暂停，None 表示运行至结束
+        :return: 是否为暂停（True 时可再次调用 run 继续）
+        """
+        cfg = self.config
 
         # 第一次发车
-        dep_dec, dep_cap = self.dep_decider.decide(cur_t=self.t)
-        self.update_dep(dec=dep_dec, cap=dep_cap)
+        if not self.started:
+            dep_dec, dep_cap = self.dep_decider.decide(cur_t=self.t)
+            self.update_dep(dec=dep_dec, cap=dep_cap)
+            self.started = True
 
-        while self.t < SIM_END_T or (not self.is_bus_finished() or not self.is_passenger_finished()):
+        while self.t < cfg.SIM_END_T or (not self.is_bus_finished() or not self.is_passenger_finished()):
+
+            if until is not None and self.t >= until:
+                return True
+
+            if self.t >= cfg.END_T:
+                break
 
-            if self.t >= END_T:
+            if (self.t - cfg.SIM_START_T) % cfg.ABORT_CHECK_INTERVAL == 0 and self.is_hopeless():
                 break
 
             if self.dep_decider.can_dep(cur_t=self.t):
@@ -301,37 +544,182 @@ class Sim:
                 self.assign_reorg()
 
             # 系统时间步进
-            self.t += MIN_STEP
+            self.t += cfg.MIN_STEP
 
         if self.get_record is not None:
             self.record_df = pd.DataFrame(self.record_dict)[:self.record_end_bus_num]
             self.record_df.to_csv(
                 rf'.\data\line_{TEST_LINE}\record_{self.sim_mode}_{round(self.get_record[0])}_{round(self.get_record[1])}.csv',
                 index=False)
+        return False
+
+    def snapshot(self):
+        """
+        当前仿真状态的完整快照：时间、车辆、等待队列、乘客、车厢里程、结合/分离日志、发车与路径决策器，
+        以及本仿真的随机数流。线路模板（站点、乘客数组等不可变数据）与快照共享，不复制
+
+        :return: dict
+        """
+        return {
+            'version': SNAPSHOT_VERSION,
+            'cache_key': self.template.cache_key,
+            'state': copy.deepcopy({key: val for key, val in vars(self).items() if key not in _SHARED_ATTRS},
+                                   self._template_memo()),
+        }
+
+    def restore(self, snap: dict):
+        """
+        恢复到快照时的状态，之后调用 run() 与不中断的仿真结果一致；同一快照可多次恢复
+
+        :param snap: Sim.snapshot() 的返回值
+        :return:
+        """
+        assert snap['version'] == SNAPSHOT_VERSION, f'snapshot version {snap["version"]} is not supported'
+        assert snap['cache_key'] == self.template.cache_key, 'snapshot was taken on a different line template'
+        self.__dict__.update(copy.deepcopy(snap['state'], self._template_memo()))
+
+    def save_snapshot(self, path: str):
+        """
+        将当前状态的快照写入文件（先写临时文件再替换），线路模板不写入，加载时需提供同一模板
+
+        :param path: 快照文件路径
+        :return:
+        """
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            _SnapshotPickler(f, self.template).dump(self.snapshot())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load_snapshot(cls, path: str, line: Line):
+        """
+        从快照文件恢复仿真，可在新的进程中继续运行
+
+        :param path: 快照文件路径
+        :param line: 与保存时相同的线路模板（cache_key 一致）
+        :return: Sim
+        """
+        with open(path, 'rb') as f:
+            snap = _SnapshotUnpickler(f, line).load()
+        sim = cls.__new__(cls)
+        sim.template, sim.base_line = line, line
+        sim.restore(snap)
+        return sim
+
+    def fork(self):
+        """
+        从当前状态分出一个独立的仿真分支：线路模板、已完成的乘客、已到达终点的车辆与车厢记录不再变化，
+        与原仿真共享；其余运行中的状态（包括转向随机数流）复制一份。已完成乘客的出行统计数据在共享前算出，
+        此后各分支只会写入相同的值
+
+        :return: Sim
+        """
+        self.update_finished_statistics()
+        memo = self._template_memo()
+        for pas in self.pas_pool:
+            memo[id(pas)] = pas
+        for bus in self.all_buses.values():
+            if bus.state == 'end':
+                memo[id(bus)] = bus
+        for cab in self.all_cabs.values():
+            if cab['end_t'] is not None:
+                memo[id(cab)] = cab
+        branch = self.__class__.__new__(self.__class__)
+        branch.template, branch.base_line = self.template, self.base_line
+        branch.__dict__.update(copy.deepcopy({key: val for key, val in vars(self).items() if key not in _SHARED_ATTRS},
+                                             memo))
+        return branch
+
+    def fork_map(self, funcs: list, processes: int = None):
+        """
+        进程级分支：每个分支在从当前进程 fork 出的子进程中运行，由操作系统写时复制共享内存，无需复制或序列化仿真。
+        每个子进程只运行一个分支，本仿真不受影响。仅支持 fork 启动方式的系统（Linux/macOS）
+
+        :param funcs: 分支函数列表，func(sim) 在子进程的仿真上执行并返回结果（需可序列化）
+        :param processes: 子进程数量，None 为 CPU 核数
+        :return: 各分支的返回值
+        """
+        global _fork_branches
+        _fork_branches = (self, list(funcs))
+        try:
+            with mp.get_context('fork').Pool(processes=processes, maxtasksperchild=1) as pool:
+                return pool.map(_run_fork_branch, range(len(funcs)), chunksize=1)
+        finally:
+            _fork_branches = None
+
+    def _template_memo(self):
+        """deepcopy 的 memo：线路模板的各属性视为已复制，从而在副本间共享"""
+        memo = {id(self.template): self.template}
+        for val in vars(self.template).values():
+            memo[id(val)] = val
+        return memo
+
+    def get_power_consumption(self):
+        """当前累计能耗（条件法, kWh），仿真过程中只增不减"""
+        cfg = self.config
+        consump = cfg.CONSUMP_CONDITION_OLD if self.sim_mode == 'baseline' else cfg.CONSUMP_CONDITION_NEW
+        return sum([cab['dist'] for cab in self.all_cabs.values()]) * consump
+
+    def get_avg_t_lb(self):
+        """
+        仿真结束时平均全程出行时间（get_statistics 中的 avg_travel_t(full, min)）的下界（分钟）。
+        该统计量只累计已完成出行的乘客，分母为所有进入仿真的乘客，仿真结束时仍未完成出行的乘客计为 0，
+        因此下界只计入已完成乘客的全程出行时间，分母取进入仿真的乘客数上界（已进入 + END_T 前到站的未到达乘客），
+        无论其余乘客最终是否完成出行都成立
+
+        :return: float
+        """
+        self.update_finished_statistics()
+        suffix = self.template.get_eligible_suffix()
+        end_idx = int(np.searchsorted(self.line.pass_arrays['arrive_t'], self.config.END_T, side='left'))
+        num_max = len(self.all_passengers) + suffix[self.pas_idx] - suffix[max(end_idx, self.pas_idx)]
+        return self.lb_full_t / num_max / 60 if num_max > 0 else 0
+
+    def update_finished_statistics(self):
+        """计算新完成出行的乘客的出行统计数据，并累计其全程出行时间"""
+        for pas in self.pas_pool[self.lb_pool_idx:]:
+            pas.get_statistics(line=self.line, mode=self.sim_mode)
+            self.lb_full_t += pas.full_jour_t
+        self.lb_pool_idx = len(self.pas_pool)
+
+    def is_backlogged(self):
+        """末班车发出且所有车辆到达终点后，仍有乘客未完成或未到达，即不可能服务全部乘客"""
+        if self.t <= self.config.LAST_BUS_T or not self.is_bus_finished():
+            return False
+        return not self.is_passenger_finished() or self.template.get_eligible_suffix()[self.pas_idx] > 0
+
+    def is_hopeless(self):
+        """
+        判断当前仿真是否已不可能优于给定阈值或满足约束，是则记录终止原因；
+        出行时间的终止条件只使用对任何后续过程都成立的下界，终止的仿真完整运行也必然不满足约束，
+        未终止的仿真结果与不检查时相同
+        """
+        if self.abort_obj is not None and self.get_power_consumption() > self.abort_obj:
+            self.aborted = 'obj'
+        elif self.abort_avg_t is not None and self.get_avg_t_lb() >= self.abort_avg_t:
+            # 已无车可乘时不会再有乘客完成出行，只剩未到达乘客计入分母
+            self.aborted = 'backlog' if self.is_backlogged() else 'travel_t'
+        return self.aborted is not None
 
     def update_passengers(self):
         """更新乘客到站"""
-        while self.pas_idx < self.line.passenger_pool.shape[0]:
-            if self.line.passenger_pool.loc[self.pas_idx, 'arrive_t'] <= self.t:
-                start_main = self.line.passenger_pool.loc[self.pas_idx, 'start_loc'] \
-                    if isinstance(self.line.passenger_pool.loc[self.pas_idx, 'start_loc'], (int, np.integer)) \
-                    else int(self.line.passenger_pool.loc[self.pas_idx, 'start_loc'].split('#')[0])
-                end_main = self.line.passenger_pool.loc[self.pas_idx, 'end_loc'] \
-                    if isinstance(self.line.passenger_pool.loc[self.pas_idx, 'end_loc'], (int, np.integer)) \
-                    else int(self.line.passenger_pool.loc[self.pas_idx, 'end_loc'].split('#')[0])
-                if end_main > start_main:
+        pool = self.line.pass_arrays
+        while self.pas_idx < self.line.num_passengers:
+            idx = self.pas_idx
+            if pool['arrive_t'][idx] <= self.t:
+                if pool['end_main'][idx] > pool['start_main'][idx]:
                     pas = Passenger(
-                        pas_id=self.pas_idx,
-                        start_pos=self.line.passenger_pool.loc[self.pas_idx, 'start_pos'],
-                        start_loc=self.line.passenger_pool.loc[self.pas_idx, 'start_loc'],
-                        arrive_time=self.line.passenger_pool.loc[self.pas_idx, 'arrive_t'],
-                        end_pos=self.line.passenger_pool.loc[self.pas_idx, 'end_pos'],
-                        end_loc=self.line.passenger_pool.loc[self.pas_idx, 'end_loc'],
-                        side_flag=bool(self.line.passenger_pool.loc[self.pas_idx, 'side_flag']),
+                        pas_id=idx,
+                        start_pos=(pool['start_lat'][idx], pool['start_lon'][idx]),
+                        start_loc=decode_loc(pool['start_main'][idx], pool['start_side'][idx], pool['start_order'][idx]),
+                        arrive_time=pool['arrive_t'][idx],
+                        end_pos=(pool['end_lat'][idx], pool['end_lon'][idx]),
+                        end_loc=decode_loc(pool['end_main'][idx], pool['end_side'][idx], pool['end_order'][idx]),
+                        side_flag=bool(pool['side_flag'][idx]),
                     )
                     if self.sim_mode in ['baseline', 'single']:
                         self.line.main_line[pas.start_loc].append(pas)
-                        self.all_passengers[self.pas_idx] = pas
+                        self.all_passengers[idx] = pas
                     else:
                         if isinstance(pas.start_loc, (int, np.integer)):
                             self.line.main_line[pas.start_loc].append(pas)
@@ -340,7 +728,7 @@ class Sim:
                             main_id, side_id, side_order = pas.start_loc.split('#')
                             self.line.side_line[f'{main_id}#{side_id}'].side_stations[int(side_order)]['pool'].append(
                                 pas)
-                        self.all_passengers[self.pas_idx] = pas
+                        self.all_passengers[idx] = pas
             else:
                 break
             self.pas_idx += 1
@@ -378,6 +766,7 @@ class Sim:
                         self.apply_action_in_assign_multi(bus_dec=bus_dec)
 
     def run_step(self):
+        cfg = self.config
         available_bus = [b.bus_id for b in self.all_buses.values() if (b.state != 'end' and b.able is True)]
         if self.sim_mode == 'baseline':
             for bus_id in available_bus:
@@ -385,9 +774,9 @@ class Sim:
                 loc_1, loc_2 = cur_bus.loc.split('@')
                 if loc_2 == '5':
                     assert cur_bus.run_next.split('@')[1] == '0' and cur_bus.running is True
-                    if cur_bus.time_count > MIN_STEP:
-                        cur_bus.time_count -= MIN_STEP
-                    elif 0 < cur_bus.time_count <= MIN_STEP:  # arrive at station
+                    if cur_bus.time_count > cfg.MIN_STEP:
+                        cur_bus.time_count -= cfg.MIN_STEP
+                    elif 0 < cur_bus.time_count <= cfg.MIN_STEP:  # arrive at station
                         cur_bus.time_count = 0
                         cur_bus.loc = str(int(loc_1) + 1) + '@0'
                         cur_bus.run_next = str(int(loc_1) + 1) + '@5'  # end - '{max_station_num}@5'
@@ -396,7 +785,7 @@ class Sim:
                         assert cur_bus.stop_count > 0
                         if cur_bus.is_waiting is False:
                             cur_bus.is_waiting = True
-                        cur_bus.stop_count -= MIN_STEP
+                        cur_bus.stop_count -= cfg.MIN_STEP
                         if cur_bus.stop_count <= 0:
                             cur_bus.stop_count = 0
                             # 下车
@@ -471,17 +860,17 @@ class Sim:
                         if cur_bus.sep_dec is not None:
                             assert cur_bus.comb_dec is None and cur_bus.time_count > 0
                             cur_bus.time_count = int(
-                                SEP_DURATION +
-                                (self.line.dist_list[int(loc_1) - 1] - DIS_FIX - SEP_DIST) /
+                                cfg.SEP_DURATION +
+                                (self.line.dist_list[int(loc_1) - 1] - DIS_FIX - cfg.SEP_DIST) /
                                 self.line.speed_list[int(loc_1) - 1]) + 1
                             cur_bus.sep_state = cur_bus.sep_dec
                             cur_bus.sep_dec = None
-                            cur_bus.time_count -= MIN_STEP
+                            cur_bus.time_count -= cfg.MIN_STEP
                         elif cur_bus.comb_dec is not None:
                             comb_bus_id, comb_order = cur_bus.comb_dec
                             comb_bus = self.all_buses[comb_bus_id]
                             res_time_count = int(
-                                COMB_DURATION + (self.line.dist_list[int(loc_1) - 1] - DIS_FIX - COMB_DIST) /
+                                cfg.COMB_DURATION + (self.line.dist_list[int(loc_1) - 1] - DIS_FIX - cfg.COMB_DIST) /
                                 self.line.speed_list[int(loc_1) - 1]) + 1
 
                             cur_bus.time_count = res_time_count
@@ -491,20 +880,21 @@ class Sim:
 
                             have_decided_list.append(cur_bus.bus_id)
                             have_decided_list.append(comb_bus_id)
-                            cur_bus.time_count -= MIN_STEP
-                            comb_bus.time_count -= MIN_STEP
-                            assert cur_bus.time_count > MIN_STEP and comb_bus.time_count > MIN_STEP
+                            cur_bus.time_count -= cfg.MIN_STEP
+                            comb_bus.time_count -= cfg.MIN_STEP
+                            assert cur_bus.time_count > cfg.MIN_STEP and comb_bus.time_count > cfg.MIN_STEP
 
-                        elif cur_bus.time_count > MIN_STEP:
-                            cur_bus.time_count -= MIN_STEP
+                        elif cur_bus.time_count > cfg.MIN_STEP:
+                            cur_bus.time_count -= cfg.MIN_STEP
 
                         else:  # cur_bus.time_count -> 0
-                            assert 0 < cur_bus.time_count <= MIN_STEP
+                            assert 0 < cur_bus.time_count <= cfg.MIN_STEP
                             cur_bus.time_count = 0
                             if cur_bus.sep_state is not None:
                                 new_bus_front = Bus(
                                     cab_num=cur_bus.cab_num - cur_bus.sep_state,
-                                    max_num_list=[SMALL_CAB for _ in range(cur_bus.cab_num - cur_bus.sep_state)],
+                                    max_num_list=[self.scale_cap(cfg.SMALL_CAB) for _ in
+                                                  range(cur_bus.cab_num - cur_bus.sep_state)],
                                     cab_id=list(cur_bus.cab_id[:(cur_bus.cab_num - cur_bus.sep_state)]),
                                     bus_id=self.next_bus_id,
                                     able=True
@@ -514,7 +904,7 @@ class Sim:
                                 self.all_buses[self.next_bus_id] = new_bus_front
                                 new_bus_rear = Bus(
                                     cab_num=cur_bus.sep_state,
-                                    max_num_list=[SMALL_CAB for _ in range(cur_bus.sep_state)],
+                                    max_num_list=[self.scale_cap(cfg.SMALL_CAB) for _ in range(cur_bus.sep_state)],
                                     cab_id=list(cur_bus.cab_id[-cur_bus.sep_state:]),
                                     bus_id=self.next_bus_id + 1,
                                     able=True
@@ -551,7 +941,8 @@ class Sim:
                                 if comb_order > 0.8:
                                     new_bus = Bus(
                                         cab_num=cur_bus.cab_num + comb_bus.cab_num,
-                                        max_num_list=[SMALL_CAB for _ in range(cur_bus.cab_num + comb_bus.cab_num)],
+                                        max_num_list=[self.scale_cap(cfg.SMALL_CAB) for _ in
+                                                      range(cur_bus.cab_num + comb_bus.cab_num)],
                                         cab_id=list(comb_bus.cab_id) + list(cur_bus.cab_id),
                                         bus_id=self.next_bus_id,
                                         able=True
@@ -560,7 +951,8 @@ class Sim:
                                 else:
                                     new_bus = Bus(
                                         cab_num=cur_bus.cab_num + comb_bus.cab_num,
-                                        max_num_list=[SMALL_CAB for _ in range(cur_bus.cab_num + comb_bus.cab_num)],
+                                        max_num_list=[self.scale_cap(cfg.SMALL_CAB) for _ in
+                                                      range(cur_bus.cab_num + comb_bus.cab_num)],
                                         cab_id=list(cur_bus.cab_id) + list(comb_bus.cab_id),
                                         bus_id=self.next_bus_id,
                                         able=True
@@ -595,13 +987,13 @@ class Sim:
                             assert cur_bus.stop_count > 0
                             if cur_bus.is_waiting is False:
                                 cur_bus.is_waiting = True
-                            cur_bus.stop_count -= MIN_STEP
+                            cur_bus.stop_count -= cfg.MIN_STEP
                             if cur_bus.stop_count <= 0:
                                 cur_bus.stop_count = 0  # 可能有车辆同时进站，发生在容量不足时
                                 same_stop_bus = list(self.get_loc_dict()[cur_bus.loc])  # [bus_ids]
                                 left_bus_list = [b for b in same_stop_bus if
                                                  b not in have_decided_list and 0 < self.all_buses[
-                                                     b].stop_count <= MIN_STEP]
+                                                     b].stop_count <= cfg.MIN_STEP]
                                 if len(left_bus_list) < 0.8:  # 只有一辆车同时停留
                                     # 下车
                                     bus_pas_list = [i for j in cur_bus.pass_list for i in j]
@@ -665,7 +1057,7 @@ class Sim:
                                 else:  # 多辆车同时停留
                                     for left_bus in left_bus_list:
                                         assert self.all_buses[left_bus].is_waiting is True
-                                        self.all_buses[left_bus].stop_count -= MIN_STEP
+                                        self.all_buses[left_bus].stop_count -= cfg.MIN_STEP
                                     dec_list = list(left_bus_list)
                                     dec_list.append(bus_id)
                                     # 下车
@@ -782,13 +1174,13 @@ class Sim:
                                     assert cur_bus.stop_count > 0, f'{self.t, cur_bus, cur_bus.stop_count}'
                                     if cur_bus.is_waiting is False:
                                         cur_bus.is_waiting = True
-                                    cur_bus.stop_count -= MIN_STEP
+                                    cur_bus.stop_count -= cfg.MIN_STEP
                                     if cur_bus.stop_count <= 0:
                                         cur_bus.stop_count = 0  # 可能有车辆同时进站
                                         left_bus_list = [b.bus_id for b in self.all_buses.values()
                                                          if b.loc == cur_bus.loc and
                                                          b.bus_id not in have_decided_list and
-                                                         0 < b.stop_count <= MIN_STEP]
+                                                         0 < b.stop_count <= cfg.MIN_STEP]
                                         if len(left_bus_list) < 0.2:  # 只有一辆车同时停留
                                             # 下车
                                             bus_pas_list = [i for j in cur_bus.pass_list for i in j]
@@ -876,7 +1268,7 @@ class Sim:
                                         else:  # 多辆车同时停留
                                             for left_bus in left_bus_list:
                                                 assert self.all_buses[left_bus].is_waiting is True
-                                                self.all_buses[left_bus].stop_count -= MIN_STEP
+                                                self.all_buses[left_bus].stop_count -= cfg.MIN_STEP
                                             dec_list = list(left_bus_list)
                                             dec_list.append(bus_id)
                                             # 下车
@@ -983,7 +1375,7 @@ class Sim:
                                         assert cur_bus.stop_count > 0
                                         if cur_bus.is_waiting is False:
                                             cur_bus.is_waiting = True
-                                        cur_bus.stop_count -= MIN_STEP
+                                        cur_bus.stop_count -= cfg.MIN_STEP
                                         if cur_bus.stop_count <= 0:
                                             cur_bus.stop_count = 0
                                             # 下车
@@ -1060,7 +1452,7 @@ class Sim:
                                         assert cur_bus.stop_count > 0
                                         if cur_bus.is_waiting is False:
                                             cur_bus.is_waiting = True
-                                        cur_bus.stop_count -= MIN_STEP
+                                        cur_bus.stop_count -= cfg.MIN_STEP
                                         if cur_bus.stop_count <= 0:
                                             cur_bus.stop_count = 0
                                             # 下车
@@ -1129,13 +1521,13 @@ class Sim:
                                     assert cur_bus.stop_count > 0 and cur_bus.to_turn == 0
                                     if cur_bus.is_waiting is False:
                                         cur_bus.is_waiting = True
-                                    cur_bus.stop_count -= MIN_STEP
+                                    cur_bus.stop_count -= cfg.MIN_STEP
                                     if cur_bus.stop_count <= 0:
                                         cur_bus.stop_count = 0  # 可能有车辆同时进站
                                         left_bus_list = [b.bus_id for b in self.all_buses.values()
                                                          if b.loc == cur_bus.loc and
                                                          b.bus_id not in have_decided_list and
-                                                         0 < b.stop_count <= MIN_STEP]
+                                                         0 < b.stop_count <= cfg.MIN_STEP]
 
                                         if len(left_bus_list) < 0.2:  # 只有一辆车同时停留
                                             # 下车
@@ -1195,7 +1587,7 @@ class Sim:
                                         else:  # 多辆车同时停留
                                             for left_bus in left_bus_list:
                                                 assert self.all_buses[left_bus].is_waiting is True
-                                                self.all_buses[left_bus].stop_count -= MIN_STEP
+                                                self.all_buses[left_bus].stop_count -= cfg.MIN_STEP
                                             dec_list = list(left_bus_list)
                                             dec_list.append(bus_id)
                                             # 下车
@@ -1277,7 +1669,7 @@ class Sim:
                                     assert cur_bus.stop_count > 0
                                     if cur_bus.is_waiting is False:
                                         cur_bus.is_waiting = True
-                                    cur_bus.stop_count -= MIN_STEP
+                                    cur_bus.stop_count -= cfg.MIN_STEP
                                     if cur_bus.stop_count <= 0:
                                         cur_bus.stop_count = 0
                                         # 下车
@@ -1492,17 +1884,17 @@ class Sim:
                                     assert cur_bus.comb_dec is None and cur_bus.time_count > 0, \
                                         f'{cur_bus, cur_bus.comb_dec, cur_bus.time_count}'
                                     cur_bus.time_count = round(
-                                        SEP_DURATION +
-                                        (self.line.dist_list[main_id - 1] - DIS_FIX - SEP_DIST) /
+                                        cfg.SEP_DURATION +
+                                        (self.line.dist_list[main_id - 1] - DIS_FIX - cfg.SEP_DIST) /
                                         self.line.speed_list[main_id - 1])
                                     cur_bus.sep_state = cur_bus.sep_dec
                                     cur_bus.sep_dec = None
-                                    cur_bus.time_count -= MIN_STEP
+                                    cur_bus.time_count -= cfg.MIN_STEP
                                 elif cur_bus.comb_dec is not None:
                                     comb_bus_id, comb_order = cur_bus.comb_dec
                                     comb_bus = self.all_buses[comb_bus_id]
                                     res_time_count = round(
-                                        COMB_DURATION + (self.line.dist_list[main_id - 1] - DIS_FIX - COMB_DIST) /
+                                        cfg.COMB_DURATION + (self.line.dist_list[main_id - 1] - DIS_FIX - cfg.COMB_DIST) /
                                         self.line.speed_list[main_id - 1])
                                     cur_bus.time_count = res_time_count
                                     comb_bus.time_count = res_time_count
@@ -1512,19 +1904,19 @@ class Sim:
 
                                     have_decided_list.append(comb_bus_id)
                                     have_decided_list.append(cur_bus.bus_id)
-                                    cur_bus.time_count -= MIN_STEP
-                                    comb_bus.time_count -= MIN_STEP
-                                    assert cur_bus.time_count > MIN_STEP and comb_bus.time_count > MIN_STEP
+                                    cur_bus.time_count -= cfg.MIN_STEP
+                                    comb_bus.time_count -= cfg.MIN_STEP
+                                    assert cur_bus.time_count > cfg.MIN_STEP and comb_bus.time_count > cfg.MIN_STEP
 
-                                elif cur_bus.time_count > MIN_STEP:
-                                    cur_bus.time_count -= MIN_STEP
+                                elif cur_bus.time_count > cfg.MIN_STEP:
+                                    cur_bus.time_count -= cfg.MIN_STEP
 
                                 else:
                                     cur_bus.time_count = 0
                                     if cur_bus.sep_state is not None:
                                         new_bus_front = Bus(
                                             cab_num=cur_bus.cab_num - cur_bus.sep_state,
-                                            max_num_list=[SMALL_CAB for _ in
+                                            max_num_list=[self.scale_cap(cfg.SMALL_CAB) for _ in
                                                           range(cur_bus.cab_num - cur_bus.sep_state)],
                                             cab_id=list(cur_bus.cab_id[:(cur_bus.cab_num - cur_bus.sep_state)]),
                                             bus_id=self.next_bus_id,
@@ -1537,7 +1929,7 @@ class Sim:
                                         self.all_buses[new_bus_front.bus_id] = new_bus_front
                                         new_bus_rear = Bus(
                                             cab_num=cur_bus.sep_state,
-                                            max_num_list=[SMALL_CAB for _ in range(cur_bus.sep_state)],
+                                            max_num_list=[self.scale_cap(cfg.SMALL_CAB) for _ in range(cur_bus.sep_state)],
                                             cab_id=list(cur_bus.cab_id[-cur_bus.sep_state:]),
                                             bus_id=self.next_bus_id + 1,
                                             able=True,
@@ -1577,7 +1969,7 @@ class Sim:
                                         if comb_order > 0.8:
                                             new_bus = Bus(
                                                 cab_num=cur_bus.cab_num + comb_bus.cab_num,
-                                                max_num_list=[SMALL_CAB for _ in
+                                                max_num_list=[self.scale_cap(cfg.SMALL_CAB) for _ in
                                                               range(cur_bus.cab_num + comb_bus.cab_num)],
                                                 cab_id=list(comb_bus.cab_id) + list(cur_bus.cab_id),
                                                 bus_id=self.next_bus_id,
@@ -1589,7 +1981,7 @@ class Sim:
                                         else:
                                             new_bus = Bus(
                                                 cab_num=cur_bus.cab_num + comb_bus.cab_num,
-                                                max_num_list=[SMALL_CAB for _ in
+                                                max_num_list=[self.scale_cap(cfg.SMALL_CAB) for _ in
                                                               range(cur_bus.cab_num + comb_bus.cab_num)],
                                                 cab_id=list(cur_bus.cab_id) + list(comb_bus.cab_id),
                                                 bus_id=self.next_bus_id,
@@ -1625,8 +2017,8 @@ class Sim:
 
                             else:
                                 assert cur_bus.sep_dec is None and cur_bus.comb_dec is None
-                                if cur_bus.time_count > MIN_STEP:
-                                    cur_bus.time_count -= MIN_STEP
+                                if cur_bus.time_count > cfg.MIN_STEP:
+                                    cur_bus.time_count -= cfg.MIN_STEP
                                 else:
                                     cur_bus.time_count = 0
                                     cur_bus.loc, cur_bus.run_next = cur_bus.run_next, None
@@ -1637,8 +2029,8 @@ class Sim:
                         else:  # is_returning=True
                             assert side_id > 0
                             assert cur_bus.sep_dec is None and cur_bus.comb_dec is None
-                            if cur_bus.time_count > MIN_STEP:
-                                cur_bus.time_count -= MIN_STEP
+                            if cur_bus.time_count > cfg.MIN_STEP:
+                                cur_bus.time_count -= cfg.MIN_STEP
                             else:
                                 cur_bus.time_count = 0
                                 cur_bus.loc, cur_bus.run_next = cur_bus.run_next, None
@@ -1648,6 +2040,7 @@ class Sim:
 
     def assign_reorg(self):
         """结合和分离决策(mode='single' or 'multi' or 'multi_order')"""
+        cfg = self.config
         if self.sim_mode == 'single':
             available_bus = [b.bus_id for b in self.all_buses.values() if (b.state != 'end') and (b.able is True)]
             for bus in available_bus:
@@ -1659,10 +2052,11 @@ class Sim:
                         if cur_bus.cab_num > 1.8:  # 超过2节车厢
                             cur_station = int(cur_bus.loc.split('@')[0])
                             next_down_num = cur_bus.stop_pass_num(station=cur_station + 1)
-                            if next_down_num > MIN_SEP_PASS_NUM:  # 下站下车人数到达下限
-                                not_down_num = cur_bus.pass_num - next_down_num
+                            if next_down_num > cfg.MIN_SEP_PASS_NUM:  # 下站下车人数到达下限
+                                # 低保真度时按全量需求估计节约的乘客时间
+                                not_down_num = (cur_bus.pass_num - next_down_num) / self.fidelity
                                 if not_down_num * self.stop_time >= \
-                                        SEP_DURATION - SEP_DIST / self.line.speed_list[cur_station - 1]:  # 不下车乘客时间节约效果
+                                        cfg.SEP_DURATION - cfg.SEP_DIST / self.line.speed_list[cur_station - 1]:  # 不下车乘客时间节约效果
                                     sep_cab_num = int(next_down_num / cur_bus.max_num_list[0]) + 1
                                     cur_bus.sep_dec = sep_cab_num if sep_cab_num < cur_bus.cab_num else int(
                                         cur_bus.cab_num - 1)
@@ -1690,23 +2084,23 @@ class Sim:
                                     pass
                                 else:
                                     # condition1: enough distance to cover
-                                    if self.all_buses[pot_bus].time_count < COMB_DIST / self.line.speed_list[
+                                    if self.all_buses[pot_bus].time_count < cfg.COMB_DIST / self.line.speed_list[
                                         cur_station - 1] + \
-                                            (1 - RATE_COMB_ROUTE) * \
-                                            ((self.line.dist_list[cur_station - 1] - COMB_DIST) / self.line.speed_list[
+                                            (1 - cfg.RATE_COMB_ROUTE) * \
+                                            ((self.line.dist_list[cur_station - 1] - cfg.COMB_DIST) / self.line.speed_list[
                                                 cur_station - 1]):
                                         # condition2: much to get off in the front bus
                                         # 在下一站点下车的乘客数量
                                         next_n_down_num = self.all_buses[pot_bus].get_off_pas_num(
-                                            s_station=cur_station + 2, e_station=cur_station + COMB_FORE_STA)
+                                            s_station=cur_station + 2, e_station=cur_station + cfg.COMB_FORE_STA)
                                         if self.all_buses[pot_bus].pass_num == 0 or \
-                                                next_n_down_num / self.all_buses[pot_bus].pass_num >= RATE_FRONT_PASS:
+                                                next_n_down_num / self.all_buses[pot_bus].pass_num >= cfg.RATE_FRONT_PASS:
                                             # condition3: much to stay on the rear bus
                                             next_n_down_num = cur_bus.get_off_pas_num(
-                                                s_station=cur_station + COMB_FORE_STA,
+                                                s_station=cur_station + cfg.COMB_FORE_STA,
                                                 e_station=self.line.max_station_num)
                                             if self.all_buses[pot_bus].pass_num == 0 or \
-                                                    next_n_down_num / self.all_buses[pot_bus].pass_num >= RATE_REAR_PASS:
+                                                    next_n_down_num / self.all_buses[pot_bus].pass_num >= cfg.RATE_REAR_PASS:
                                                 self.all_buses[pot_bus].comb_dec = [cur_bus.bus_id, 0]
                                                 cur_bus.comb_dec = [pot_bus, 1]
                                                 break
@@ -1733,10 +2127,11 @@ class Sim:
                         cur_station = int(cur_bus.loc.split('#')[0])
                         next_down_num = sum(cur_bus.stop_num_at_side_line(main_line_id=cur_station + 1)) + \
                                         cur_bus.stop_pass_num(station=cur_station + 1)
-                        if next_down_num > MIN_SEP_PASS_NUM_MULTI:  # 下站下车人数到达下限
-                            not_down_num = cur_bus.pass_num - next_down_num
+                        if next_down_num > cfg.MIN_SEP_PASS_NUM_MULTI:  # 下站下车人数到达下限
+                            # 低保真度时按全量需求估计节约的乘客时间
+                            not_down_num = (cur_bus.pass_num - next_down_num) / self.fidelity
                             if not_down_num * self.stop_time >= \
-                                    SEP_DURATION - SEP_DIST / self.line.speed_list[cur_station - 1]:  # 不下车乘客时间节约效果
+                                    cfg.SEP_DURATION - cfg.SEP_DIST / self.line.speed_list[cur_station - 1]:  # 不下车乘客时间节约效果
                                 sep_cab_num = int(next_down_num / cur_bus.max_num_list[0]) + 1
                                 cur_bus.sep_dec = sep_cab_num if sep_cab_num < cur_bus.cab_num else \
                                     round(cur_bus.cab_num - 1)
@@ -1761,22 +2156,22 @@ class Sim:
                         for pot_bus in pot_comb_order:
                             if cur_bus.cab_num + self.all_buses[pot_bus].cab_num < 3.2:
                                 # cond1: enough distance to cover
-                                if self.all_buses[pot_bus].time_count < COMB_DIST / self.line.speed_list[
+                                if self.all_buses[pot_bus].time_count < cfg.COMB_DIST / self.line.speed_list[
                                     cur_station - 1] + \
-                                        (1 - RATE_COMB_ROUTE_MULTI) * \
-                                        ((self.line.dist_list[cur_station - 1] - COMB_DIST) / self.line.speed_list[
+                                        (1 - cfg.RATE_COMB_ROUTE_MULTI) * \
+                                        ((self.line.dist_list[cur_station - 1] - cfg.COMB_DIST) / self.line.speed_list[
                                             cur_station - 1]):
                                     # cond2: much to get off in the front bus
                                     next_n_down_num = self.all_buses[pot_bus].get_off_pas_num(
-                                        s_station=cur_station + 2, e_station=cur_station + COMB_FORE_STA_MULTI)
+                                        s_station=cur_station + 2, e_station=cur_station + cfg.COMB_FORE_STA_MULTI)
                                     if self.all_buses[pot_bus].pass_num == 0 or \
-                                            next_n_down_num / self.all_buses[pot_bus].pass_num >= RATE_FRONT_PASS_MULTI:
+                                            next_n_down_num / self.all_buses[pot_bus].pass_num >= cfg.RATE_FRONT_PASS_MULTI:
                                         # cond3: much to stay on the rear bus
                                         next_n_down_num = cur_bus.get_off_pas_num(
-                                            s_station=cur_station + COMB_FORE_STA_MULTI,
+                                            s_station=cur_station + cfg.COMB_FORE_STA_MULTI,
                                             e_station=self.line.max_station_num)
                                         if self.all_buses[pot_bus].pass_num == 0 or \
-                                                next_n_down_num / self.all_buses[pot_bus].pass_num >= RATE_REAR_PASS_MULTI:
+                                                next_n_down_num / self.all_buses[pot_bus].pass_num >= cfg.RATE_REAR_PASS_MULTI:
                                             self.all_buses[pot_bus].comb_dec = [cur_bus.bus_id, 0]
                                             cur_bus.comb_dec = [pot_bus, 1]  # [对象车编号, 0前1后]
                                             break
@@ -1833,6 +2228,7 @@ class Sim:
     def update_dep(self, dec: int, cap: int):
         """更新最新的发车决策"""
         self.dep_decider.last_dep = self.t
+        cap = self.scale_cap(cap)
         # ------------ start create new bus ----------
         cur_bus_id, cur_cab_id = self.next_bus_id, self.next_cab_id
         if self.sim_mode in ['baseline', 'single']:
@@ -1897,7 +2293,53 @@ class Sim:
         return sum(pass_t_list) / len(pass_t_list) / 60
 
     def get_statistics(self):
-        """获取系统表现统计数据"""
+        """获取系统表现统计数据（低保真度时换算为全量需求，并给出误差估计）"""
+        stats = self.get_sample_statistics()
+        if self.fidelity < 1 and 'num_early' in stats:
+            stats = self.rescale_statistics(stats)
+        return stats
+
+    def rescale_statistics(self, stats: dict):
+        """
+        低保真度统计数据换算：乘客数量除以抽样比例，平均值不变，并按有限总体修正给出平均时间的标准误差（分钟）；
+        车辆相关数据（能耗、车厢数、满载率等）由发车方案与缩小后的容量决定，不换算。
+        标准误差只反映抽样方差，已用 calibrate_fidelity 估计过该保真度的系统偏差时，在 'bias' 中一并给出
+
+        :param stats: get_sample_statistics() 的返回值
+        :return: dict
+        """
+        stats = dict(stats)
+        for key in ['num_early', 'num_noon', 'num_late']:
+            stats[key] = int(round(stats[key] / self.fidelity))
+        finished = [pas for pas in self.all_passengers.values() if pas.down_t is not None]
+        num = len(finished)
+        stats['fidelity'] = self.fidelity
+        stats['num_sampled'] = num
+        stats['se'] = {}
+        for key, attr in [('avg_travel_t(full, min)', 'full_jour_t'), ('avg_travel_t(on bus, min)', 'travel_t'),
+                          ('avg_station_wait_t(min)', 'station_wait_t')]:
+            values = np.array([getattr(pas, attr) for pas in finished], dtype=float) / 60
+            stats['se'][key] = float(np.std(values, ddof=1) / np.sqrt(num) * np.sqrt(1 - self.fidelity)) \
+                if num > 1 else None
+        if self.fidelity in self.fidelity_bias:
+            stats['bias'] = dict(self.fidelity_bias[self.fidelity])
+        return stats
+
+    def get_sample_statistics(self):
+        """获取所仿真乘客的系统表现统计数据（不换算）"""
+        cfg = self.config
+        # 提前终止，返回带标记的部分结果（能耗为最终能耗的下界）
+        if self.aborted is not None:
+            return {
+                'aborted': self.aborted,
+                'abort_t': self.t,
+                'power consumption(condition, kWh)': self.get_power_consumption(),
+                'cab num': len(self.all_cabs),
+                'num_finished': len(self.pas_pool),
+                'num_passengers': len(self.all_passengers),
+                'avg_t_lb': self.get_avg_t_lb() if self.abort_avg_t is not None else None,
+            }
+
         # 乘客统计数据
 
         if self.sim_mode in ['baseline', 'single']:
@@ -1931,21 +2373,21 @@ class Sim:
                     full_t += pas.full_jour_t
                     avg_station_wait_t += pas.station_wait_t
                     avg_move_dist += pas.move_dist
-                    if EARLY_HIGH_START_T <= pas.arr_t < EARLY_HIGH_END_T:
+                    if cfg.EARLY_HIGH_START_T <= pas.arr_t < cfg.EARLY_HIGH_END_T:
                         num_early += 1
                         avg_travel_t_early += pas.travel_t
                         avg_wait_t_early += pas.bus_wait_t
                         full_t_early += pas.full_jour_t
                         avg_station_wait_t_early += pas.station_wait_t
                         avg_move_dist_early += pas.move_dist
-                    elif NOON_START_T <= pas.arr_t < NOON_END_T:
+                    elif cfg.NOON_START_T <= pas.arr_t < cfg.NOON_END_T:
                         num_noon += 1
                         avg_travel_t_noon += pas.travel_t
                         avg_wait_t_noon += pas.bus_wait_t
                         full_t_noon += pas.full_jour_t
                         avg_station_wait_t_noon += pas.station_wait_t
                         avg_move_dist_noon += pas.move_dist
-                    elif LATE_HIGH_START_T <= pas.arr_t < LATE_HIGH_END_T:
+                    elif cfg.LATE_HIGH_START_T <= pas.arr_t < cfg.LATE_HIGH_END_T:
                         num_late += 1
                         avg_travel_t_late += pas.travel_t
                         avg_wait_t_late += pas.bus_wait_t
@@ -1988,10 +2430,10 @@ class Sim:
 
                 # 车辆出行数据
                 if self.sim_mode == 'baseline':
-                    cap = LARGE_BUS
+                    cap = self.scale_cap(cfg.LARGE_BUS)
                     # 能耗
-                    power_consump_speed = sum([cab['dist'] for cab in self.all_cabs.values()]) * CONSUMP_SPEED_OLD
-                    power_consump_cond = sum([cab['dist'] for cab in self.all_cabs.values()]) * CONSUMP_CONDITION_OLD
+                    power_consump_speed = sum([cab['dist'] for cab in self.all_cabs.values()]) * cfg.CONSUMP_SPEED_OLD
+                    power_consump_cond = sum([cab['dist'] for cab in self.all_cabs.values()]) * cfg.CONSUMP_CONDITION_OLD
                     # 乘客数量
                     avg_pas_num_list = [sum(cab['pas_num']) / len(cab['pas_num']) for cab in self.all_cabs.values()]
                     avg_pas_num = np.mean(avg_pas_num_list) / cap
@@ -1999,24 +2441,24 @@ class Sim:
                     max_pas_num = np.max(pas_num_list) / cap
                     avg_pas_num_list_early = [sum(cab['pas_num']) / len(cab['pas_num']) for cab in
                                               self.all_cabs.values()
-                                              if (EARLY_HIGH_START_T - 3600) <= cab['dep_time'][0] < (
-                                                          EARLY_HIGH_END_T - 3600)]
+                                              if (cfg.EARLY_HIGH_START_T - 3600) <= cab['dep_time'][0] < (
+                                                          cfg.EARLY_HIGH_END_T - 3600)]
                     avg_pas_num_early = np.mean(avg_pas_num_list_early) / cap
                     avg_pas_num_list_noon = [sum(cab['pas_num']) / len(cab['pas_num']) for cab in self.all_cabs.values()
-                                             if (NOON_START_T - 3600) <= cab['dep_time'][0] < (NOON_END_T - 3600)]
+                                             if (cfg.NOON_START_T - 3600) <= cab['dep_time'][0] < (cfg.NOON_END_T - 3600)]
                     avg_pas_num_noon = np.mean(avg_pas_num_list_noon) / cap
                     avg_pas_num_list_late = [sum(cab['pas_num']) / len(cab['pas_num']) for cab in self.all_cabs.values()
-                                             if (LATE_HIGH_START_T - 3600) <= cab['dep_time'][0] < (
-                                                         LATE_HIGH_END_T - 3600)]
+                                             if (cfg.LATE_HIGH_START_T - 3600) <= cab['dep_time'][0] < (
+                                                         cfg.LATE_HIGH_END_T - 3600)]
                     avg_pas_num_late = np.mean(avg_pas_num_list_late) / cap
-                    driver_wage = 20 * DRIVER_WAGE_OLD
+                    driver_wage = 20 * cfg.DRIVER_WAGE_OLD
                     num_sep, num_sep_early, num_sep_noon, num_sep_late = 0, 0, 0, 0
                     num_comb, num_comb_early, num_comb_noon, num_comb_late = 0, 0, 0, 0
 
                 elif self.sim_mode == 'single':
-                    cap = SMALL_CAB
-                    power_consump_speed = sum([cab['dist'] for cab in self.all_cabs.values()]) * CONSUMP_SPEED_NEW
-                    power_consump_cond = sum([cab['dist'] for cab in self.all_cabs.values()]) * CONSUMP_CONDITION_NEW
+                    cap = self.scale_cap(cfg.SMALL_CAB)
+                    power_consump_speed = sum([cab['dist'] for cab in self.all_cabs.values()]) * cfg.CONSUMP_SPEED_NEW
+                    power_consump_cond = sum([cab['dist'] for cab in self.all_cabs.values()]) * cfg.CONSUMP_CONDITION_NEW
                     max_pas_num = np.max([max(cab['pas_num']) for cab in self.all_cabs.values()]) / cap
                     # max_pas_num = np.max(pas_num_array)
                     avg_pas_num_array = np.array(
@@ -2024,31 +2466,31 @@ class Sim:
                     avg_pas_num = np.mean(avg_pas_num_array) / cap
                     avg_pas_num_array_early = np.array(
                         [sum(cab['pas_num']) / len(cab['pas_num']) for cab in self.all_cabs.values()
-                         if (EARLY_HIGH_START_T - 3600) <= cab['dep_time'][0] < (EARLY_HIGH_END_T - 3600)])
+                         if (cfg.EARLY_HIGH_START_T - 3600) <= cab['dep_time'][0] < (cfg.EARLY_HIGH_END_T - 3600)])
                     avg_pas_num_early = np.mean(avg_pas_num_array_early) / cap
                     avg_pas_num_array_noon = np.array(
                         [sum(cab['pas_num']) / len(cab['pas_num']) for cab in self.all_cabs.values()
-                         if (NOON_START_T - 3600) <= cab['dep_time'][0] < (NOON_END_T - 3600)])
+                         if (cfg.NOON_START_T - 3600) <= cab['dep_time'][0] < (cfg.NOON_END_T - 3600)])
                     avg_pas_num_noon = np.mean(avg_pas_num_array_noon) / cap
                     avg_pas_num_array_late = np.array(
                         [sum(cab['pas_num']) / len(cab['pas_num']) for cab in self.all_cabs.values()
-                         if (LATE_HIGH_START_T - 3600) <= cab['dep_time'][0] < (LATE_HIGH_END_T - 3600)])
+                         if (cfg.LATE_HIGH_START_T - 3600) <= cab['dep_time'][0] < (cfg.LATE_HIGH_END_T - 3600)])
                     avg_pas_num_late = np.mean(avg_pas_num_array_late) / cap
                     driver_wage = len(self.all_cabs) / 96 * 240 * 5 / 6 * 10000
                     num_sep = sum([val[2] for val in self.reorg_log if val[1] == 1])
                     num_sep_early = sum([val[2] for val in self.reorg_log if
-                                         val[1] == 1 and EARLY_HIGH_START_T <= val[0] < EARLY_HIGH_END_T])
+                                         val[1] == 1 and cfg.EARLY_HIGH_START_T <= val[0] < cfg.EARLY_HIGH_END_T])
                     num_sep_noon = sum([val[2] for val in self.reorg_log if
-                                        val[1] == 1 and NOON_START_T <= val[0] < NOON_END_T])
+                                        val[1] == 1 and cfg.NOON_START_T <= val[0] < cfg.NOON_END_T])
                     num_sep_late = sum([val[2] for val in self.reorg_log if
-                                        val[1] == 1 and LATE_HIGH_START_T <= val[0] < LATE_HIGH_END_T])
+                                        val[1] == 1 and cfg.LATE_HIGH_START_T <= val[0] < cfg.LATE_HIGH_END_T])
                     num_comb = sum([val[2] for val in self.reorg_log if val[1] == 0])
                     num_comb_early = sum([val[2] for val in self.reorg_log if
-                                         val[1] == 0 and EARLY_HIGH_START_T <= val[0] < EARLY_HIGH_END_T])
+                                         val[1] == 0 and cfg.EARLY_HIGH_START_T <= val[0] < cfg.EARLY_HIGH_END_T])
                     num_comb_noon = sum([val[2] for val in self.reorg_log if
-                                        val[1] == 0 and NOON_START_T <= val[0] < NOON_END_T])
+                                        val[1] == 0 and cfg.NOON_START_T <= val[0] < cfg.NOON_END_T])
                     num_comb_late = sum([val[2] for val in self.reorg_log if
-                                        val[1] == 0 and LATE_HIGH_START_T <= val[0] < LATE_HIGH_END_T])
+                                        val[1] == 0 and cfg.LATE_HIGH_START_T <= val[0] < cfg.LATE_HIGH_END_T])
 
         else:
             avg_travel_t, avg_wait_t, full_t, avg_station_wait_t, avg_move_dist = 0, 0, 0, 0, 0
@@ -2068,21 +2510,21 @@ class Sim:
                 full_t += pas.full_jour_t
                 avg_station_wait_t += pas.station_wait_t
                 avg_move_dist += pas.move_dist
-                if EARLY_HIGH_START_T <= pas.arr_t < EARLY_HIGH_END_T:
+                if cfg.EARLY_HIGH_START_T <= pas.arr_t < cfg.EARLY_HIGH_END_T:
                     num_early += 1
                     avg_travel_t_early += pas.travel_t
                     avg_wait_t_early += pas.bus_wait_t
                     full_t_early += pas.full_jour_t
                     avg_station_wait_t_early += pas.station_wait_t
                     avg_move_dist_early += pas.move_dist
-                elif NOON_START_T <= pas.arr_t < NOON_END_T:
+                elif cfg.NOON_START_T <= pas.arr_t < cfg.NOON_END_T:
                     num_noon += 1
                     avg_travel_t_noon += pas.travel_t
                     avg_wait_t_noon += pas.bus_wait_t
                     full_t_noon += pas.full_jour_t
                     avg_station_wait_t_noon += pas.station_wait_t
                     avg_move_dist_noon += pas.move_dist
-                elif LATE_HIGH_START_T <= pas.arr_t < LATE_HIGH_END_T:
+                elif cfg.LATE_HIGH_START_T <= pas.arr_t < cfg.LATE_HIGH_END_T:
                     num_late += 1
                     avg_travel_t_late += pas.travel_t
                     avg_wait_t_late += pas.bus_wait_t
@@ -2124,9 +2566,9 @@ class Sim:
             avg_on_move_dist /= len(self.pas_pool)
             avg_down_move_dist /= len(self.pas_pool)
 
-            cap = SMALL_CAB
-            power_consump_speed = sum([cab['dist'] for cab in self.all_cabs.values()]) * CONSUMP_SPEED_NEW
-            power_consump_cond = sum([cab['dist'] for cab in self.all_cabs.values()]) * CONSUMP_CONDITION_NEW
+            cap = self.scale_cap(cfg.SMALL_CAB)
+            power_consump_speed = sum([cab['dist'] for cab in self.all_cabs.values()]) * cfg.CONSUMP_SPEED_NEW
+            power_consump_cond = sum([cab['dist'] for cab in self.all_cabs.values()]) * cfg.CONSUMP_CONDITION_NEW
             max_pas_num = np.max([max(cab['pas_num']) for cab in self.all_cabs.values()]) / cap
             # max_pas_num = np.max(pas_num_array)
             avg_pas_num_array = np.array(
@@ -2134,31 +2576,31 @@ class Sim:
             avg_pas_num = np.mean(avg_pas_num_array) / cap
             avg_pas_num_array_early = np.array(
                 [sum(cab['pas_num']) / len(cab['pas_num']) for cab in self.all_cabs.values()
-                 if (EARLY_HIGH_START_T - 3600) <= cab['dep_time'][0] < (EARLY_HIGH_END_T - 3600)])
+                 if (cfg.EARLY_HIGH_START_T - 3600) <= cab['dep_time'][0] < (cfg.EARLY_HIGH_END_T - 3600)])
             avg_pas_num_early = np.mean(avg_pas_num_array_early) / cap
             avg_pas_num_array_noon = np.array(
                 [sum(cab['pas_num']) / len(cab['pas_num']) for cab in self.all_cabs.values()
-                 if (NOON_START_T - 3600) <= cab['dep_time'][0] < (NOON_END_T - 3600)])
+                 if (cfg.NOON_START_T - 3600) <= cab['dep_time'][0] < (cfg.NOON_END_T - 3600)])
             avg_pas_num_noon = np.mean(avg_pas_num_array_noon) / cap
             avg_pas_num_array_late = np.array(
                 [sum(cab['pas_num']) / len(cab['pas_num']) for cab in self.all_cabs.values()
-                 if (LATE_HIGH_START_T - 3600) <= cab['dep_time'][0] < (LATE_HIGH_END_T - 3600)])
+                 if (cfg.LATE_HIGH_START_T - 3600) <= cab['dep_time'][0] < (cfg.LATE_HIGH_END_T - 3600)])
             avg_pas_num_late = np.mean(avg_pas_num_array_late) / cap
             driver_wage = len(self.all_cabs) / 96 * 240 * 5 / 6 * 10000
             num_sep = sum([val[2] for val in self.reorg_log if val[1] == 1])
             num_sep_early = sum([val[2] for val in self.reorg_log if
-                                 val[1] == 1 and EARLY_HIGH_START_T <= val[0] < EARLY_HIGH_END_T])
+                                 val[1] == 1 and cfg.EARLY_HIGH_START_T <= val[0] < cfg.EARLY_HIGH_END_T])
             num_sep_noon = sum([val[2] for val in self.reorg_log if
-                                val[1] == 1 and NOON_START_T <= val[0] < NOON_END_T])
+                                val[1] == 1 and cfg.NOON_START_T <= val[0] < cfg.NOON_END_T])
             num_sep_late = sum([val[2] for val in self.reorg_log if
-                                val[1] == 1 and LATE_HIGH_START_T <= val[0] < LATE_HIGH_END_T])
+                                val[1] == 1 and cfg.LATE_HIGH_START_T <= val[0] < cfg.LATE_HIGH_END_T])
             num_comb = sum([val[2] for val in self.reorg_log if val[1] == 0])
             num_comb_early = sum([val[2] for val in self.reorg_log if
-                                  val[1] == 0 and EARLY_HIGH_START_T <= val[0] < EARLY_HIGH_END_T])
+                                  val[1] == 0 and cfg.EARLY_HIGH_START_T <= val[0] < cfg.EARLY_HIGH_END_T])
             num_comb_noon = sum([val[2] for val in self.reorg_log if
-                                 val[1] == 0 and NOON_START_T <= val[0] < NOON_END_T])
+                                 val[1] == 0 and cfg.NOON_START_T <= val[0] < cfg.NOON_END_T])
             num_comb_late = sum([val[2] for val in self.reorg_log if
-                                 val[1] == 0 and LATE_HIGH_START_T <= val[0] < LATE_HIGH_END_T])
+                                 val[1] == 0 and cfg.LATE_HIGH_START_T <= val[0] < cfg.LATE_HIGH_END_T])
 
         return {
             'num_early': num_early,
@@ -2210,6 +2652,7 @@ class Sim:
 
     def get_special_statistics(self, special_list=None):
         """获取特殊乘客的统计数据"""
+        cfg = self.config
         special_ids = [pas_id for pas_id, pas in self.all_passengers.items() if pas.side_flag is True] \
             if special_list is None else special_list
 
@@ -2226,11 +2669,11 @@ class Sim:
                 full_t += pas.full_jour_t
                 avg_station_wait_t += pas.station_wait_t
                 avg_move_dist += pas.move_dist
-                if EARLY_HIGH_START_T <= pas.arr_t < EARLY_HIGH_END_T:
+                if cfg.EARLY_HIGH_START_T <= pas.arr_t < cfg.EARLY_HIGH_END_T:
                     num_early += 1
-                elif NOON_START_T <= pas.arr_t < NOON_END_T:
+                elif cfg.NOON_START_T <= pas.arr_t < cfg.NOON_END_T:
                     num_noon += 1
-                elif LATE_HIGH_START_T <= pas.arr_t < LATE_HIGH_END_T:
+                elif cfg.LATE_HIGH_START_T <= pas.arr_t < cfg.LATE_HIGH_END_T:
                     num_late += 1
 
                 # all passengers
@@ -0,0 +1,205 @@
+"""
+参数扫描：在网格或随机设计上评估结合/分离与转向参数（SimConfig 的运行时参数，以及 multi_dec_rule、can_reorg、发车方案），
+各工作进程常驻一个线路模板，每个参数点只 reset 后重新仿真。
+每个参数点完成后立即追加一行到结果文件（JSON Lines），中断后重新运行会跳过已完成的参数点
+"""
+import itertools
+import json
+import multiprocessing as mp
+import os
+import numpy as np
+
+from config import RUNTIME_FIELDS, SimConfig
+from consts import RANDOM_SEED
+from scenario import load_scenario
+from sim import Sim
+
+# 参数点中不属于 SimConfig 的仿真选项
+SIM_OPTIONS = ('multi_dec_rule', 'can_reorg', 'dep_num_list', 'dep_duration_list')
+
+
+def grid_design(space: dict):
+    """
+    网格设计
+
+    :param space: {参数名: [取值]}
+    :return: [参数点 dict]
+    """
+    for name, values in space.items():
+        assert isinstance(values, list), f'grid values of {name} should be a list'
+    names = list(space.keys())
+    return [dict(zip(names, values)) for values in itertools.product(*space.values())]
+
+
+def random_design(space: dict, num: int, seed: int = RANDOM_SEED):
+    """
+    随机设计
+
+    :param space: {参数名: [取值] 或 (下界, 上界)}，列表为离散取值，元组为连续区间（上下界均为整数时取整数）
+    :param num: 参数点数
+    :param seed: 随机数种子
+    :return: [参数点 dict]
+    """
+    rng = np.random.default_rng(seed)
+    points = [{} for _ in range(num)]
+    for name, values in space.items():
+        if isinstance(values, list):
+            samples = [values[i] for i in rng.integers(len(values), size=num)]
+        elif all(isinstance(val, int) for val in values):
+            samples = rng.integers(values[0], values[1] + 1, size=num).tolist()
+        else:
+            samples = rng.uniform(values[0], values[1], size=num).tolist()
+        for point, val in zip(points, samples):
+            point[name] = val
+    return points
+
+
+def point_key(point: dict):
+    """参数点的唯一标识（与参数顺序无关）"""
+    return json.dumps(point, sort_keys=True)
+
+
+def split_point(point: dict, base: SimConfig):
+    """
+    :param point: 参数点
+    :param base: 未扫描参数的取值
+    :return: SimConfig, 仿真选项 dict
+    """
+    for name in point:
+        assert name in RUNTIME_FIELDS or name in SIM_OPTIONS, \
+            f'{name} cannot be swept (not a runtime parameter or simulation option)'
+    options = {name: val for name, val in point.items() if name in SIM_OPTIONS}
+    return base.replace(**{name: val for name, val in point.items() if name not in SIM_OPTIONS}), options
+
+
+def _scalar_stats(stats: dict):
+    """get_statistics 中可写入 JSON 的数值型统计项"""
+    return {key: val.item() if isinstance(val, np.generic) else val for key, val in stats.items()
+            if isinstance(val, (int, float, np.number)) and not isinstance(val, bool)}
+
+
+# 扫描工作进程中的常驻仿真与未扫描参数的取值（由 initializer 构建一次）
+_sweep_sim = None
+_sweep_base = None
+
+
+def _init_sweep_worker(scenario, sim_kwargs: dict):
+    global _sweep_sim, _sweep_base
+    line_info = load_scenario(scenario) if isinstance(scenario, str) else scenario
+    kwargs = {'sim_mode': 'multi_order', 'multi_dec_rule': 'up_first', 'record_time': None, **line_info, **sim_kwargs}
+    can_reorg = kwargs.pop('can_reorg', True)
+    _sweep_sim = Sim(**kwargs)
+    _sweep_base = (_sweep_sim.base_config, {'multi_dec_rule': _sweep_sim.multi_dec_rule, 'can_reorg': can_reorg,
+                                       'dep_num_list': kwargs['dep_num_list'],
+                                       'dep_duration_list': kwargs['dep_duration_list']})
+
+
+def _run_sweep_task(point: dict):
+    return point, run_point(_sweep_sim, point, *_sweep_base)
+
+
+def run_point(sim: Sim, point: dict, base: SimConfig, base_options: dict):
+    """
+    在已有仿真（线路模板）上评估一个参数点
+
+    :param sim: Sim
+    :param point: 参数点
+    :param base: 未扫描参数的取值
+    :param base_options: 未扫描的仿真选项 {'multi_dec_rule', 'can_reorg', 'dep_num_list', 'dep_duration_list'}
+    :return: 数值型统计项
+    """
+    config, options = split_point(point, base)
+    options = {**base_options, **options}
+    sim.reset(dep_num_list=options['dep_num_list'], dep_duration_list=options['dep_duration_list'], config=config,
+              multi_dec_rule=options['multi_dec_rule'])
+    sim.can_reorg = options['can_reorg']
+    sim.run()
+    return _scalar_stats(sim.get_statistics())
+
+
+def load_results(path: str):
+    """
+    读取结果文件，忽略中断时写了一半的最后一行
+
+    :param path: 结果文件
+    :return: {参数点标识: {'point', 'stats'}}
+    """
+    results = {}
+    if not os.path.exists(path):
+        return results
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            results[point_key(record['point'])] = record
+    return results
+
+
+def run_sweep(scenario, points: list, path: str, processes: int = None, verbose: bool = False, **sim_kwargs):
+    """
+    运行参数扫描，已在结果文件中的参数点不再仿真。同一结果文件应只用于同一场景与仿真设置
+
+    :param scenario: 场景目录（工作进程以 mmap 打开）或 read_in / load_scenario 的返回值
+    :param points: 参数点列表（grid_design / random_design 的返回值）
+    :param path: 结果文件（JSON Lines，每行 {'point', 'stats'}）
+    :param processes: 进程数，None 为 CPU 核数，1 时在当前进程中串行运行
+    :param verbose: 是否输出已完成与待运行的参数点数
+    :param sim_kwargs: 其他 Sim 参数（sim_mode、multi_dec_rule、seed、config 等）与 can_reorg，作为未扫描参数的取值
+    :return: 与 points 顺序相同的 [{'point', 'stats'}]
+    """
+    results = load_results(path)
+    todo, seen = [], set()
+    for point in points:
+        key = point_key(point)
+        if key not in results and key not in seen:
+            split_point(point, SimConfig())  # 派发前检查参数名
+            todo.append(point)
+            seen.add(key)
+    if verbose:
+        print(f'sweep: {len(points)} points, {len(points) - len(todo)} already done, {len(todo)} to run')
+
+    if len(todo) > 0:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'a+', encoding='utf-8') as f:
+            # 上次中断时最后一行可能不完整，换行后继续追加
+            if f.tell() > 0:
+                f.seek(f.tell() - 1)
+                if f.read(1) != '\n':
+                    f.write('\n')
+
+            def save(point, stats):
+                record = {'point': point, 'stats': stats}
+                results[point_key(point)] = record
+                f.write(json.dumps(record) + '\n')
+                f.flush()
+
+            processes = mp.cpu_count() if processes is None else processes
+            if processes <= 1:
+                _init_sweep_worker(scenario, sim_kwargs)
+                for point in todo:
+                    save(*_run_sweep_task(point))
+            else:
+                with mp.Pool(processes, initializer=_init_sweep_worker, initargs=(scenario, sim_kwargs)) as pool:
+                    for point, stats in pool.imap_unordered(_run_sweep_task, todo):
+                        save(point, stats)
+
+    return [results[point_key(point)] for point in points]
+
+
+if __name__ == '__main__':
+    from sim import read_in
+
+    line_info = read_in(way='total', fractile=None)
+    space = {
+        'RATE_COMB_ROUTE_MULTI': [0.3, 0.5, 0.7],
+        'RATE_FRONT_PASS_MULTI': [0.3, 0.6],
+        'MAIN_LINE_TURN_MAX_PASS_NUM': [5, 9],
+        'multi_dec_rule': ['up_first', 'down_first'],
+        'can_reorg': [True, False],
+    }
+    records = run_sweep(line_info, grid_design(space), path=os.path.join('sweeps', 'reorg_grid.jsonl'), verbose=True)
+    for record in sorted(records, key=lambda rec: rec['stats']['power consumption(condition, kWh)']):
+        print(record['point'], round(record['stats']['power consumption(condition, kWh)'], 2),
+              round(record['stats']['avg_travel_t(full, min)'], 3))
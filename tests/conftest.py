@@ -0,0 +1,71 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+# ea_optimize 中的模块以平铺方式互相导入（from opt_consts import *），与直接运行 ea_optimize/*.py 时相同
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, 'ea_optimize')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from consts import DIRECTION  # noqa: E402
+from env.line import Line, get_file_hash  # noqa: E402
+from sim import Sim  # noqa: E402
+
+# 合成的小规模线路：12 个主线站点，每站两条支线，乘客链数据见 data/chain_data.csv（第 2 天，含若干拥挤时段）
+CHAIN_DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'chain_data.csv')
+FIXTURE_DAY = 2
+NUM_STATIONS = 12
+
+
+def make_line_info():
+    """与 read_in 返回值相同格式的合成线路信息"""
+    lats = [30.0 + i * 0.004 for i in range(NUM_STATIONS)]
+    lons = [120.0 + i * 0.003 for i in range(NUM_STATIONS)]
+    side_rows = []
+    for main_id in range(1, NUM_STATIONS + 1):
+        for side_id, sign in ((1, 1), (2, -1)):
+            side_rows.append({'main_id': main_id, 'side_id': side_id,
+                              'start_lat': lats[main_id - 1], 'start_lon': lons[main_id - 1],
+                              'end_lat': lats[main_id - 1] + sign * 0.004, 'end_lon': lons[main_id - 1] - sign * 0.004})
+    return {
+        'station_list': [f'S{i}' for i in range(NUM_STATIONS)],
+        'dist_list': [600.0] * NUM_STATIONS,
+        'loc_list': list(zip(lats, lons)),
+        'speed_list': [8.0] * NUM_STATIONS,
+        'dep_duration_list': [600] * 24,
+        'dep_num_list': [0] * 6 + [2] * 16 + [1] * 2,
+        'side_line_info': pd.DataFrame(side_rows),
+    }
+
+
+@pytest.fixture(scope='session')
+def line_info():
+    return make_line_info()
+
+
+@pytest.fixture(scope='session')
+def line(line_info):
+    """合成线路的 multi_order 模式线路模板（不读写预处理缓存），各测试共用，不应修改"""
+    return Line(direc=DIRECTION, station_list=line_info['station_list'], loc_list=line_info['loc_list'],
+                dist_list=line_info['dist_list'], speed_list=line_info['speed_list'], mode='multi_order',
+                side_line_info=line_info['side_line_info'], use_cache=False,
+                chain_data=pd.read_csv(CHAIN_DATA_PATH, encoding='utf-8'),
+                chain_data_hash=get_file_hash(CHAIN_DATA_PATH), day=FIXTURE_DAY)
+
+
+@pytest.fixture(scope='session')
+def make_sim(line):
+    """在合成线路模板上构建仿真（默认发车方案、up_first、允许结合/分离）的工厂函数"""
+    info = make_line_info()
+
+    def factory(**kwargs):
+        kwargs = {'dep_duration_list': info['dep_duration_list'], 'dep_num_list': info['dep_num_list'],
+                  'multi_dec_rule': 'up_first', 'record_time': None, **kwargs}
+        sim = Sim.from_template(line, **kwargs)
+        sim.can_reorg = True
+        return sim
+
+    return factory
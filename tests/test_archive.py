@@ -0,0 +1,31 @@
+"""场景指纹与评估存档的单元测试"""
+from archive import EvalArchive, get_fingerprint
+from config import RUNTIME_FIELDS, SimConfig
+
+SETTINGS = {'sim_mode': 'multi_order', 'can_reorg': True, 'abort_avg_t': 54}
+
+
+def test_fingerprint_covers_runtime_fields():
+    base = get_fingerprint('line', SimConfig(), **SETTINGS)
+    assert base == get_fingerprint('line', SimConfig(), **SETTINGS)
+    for name in ('RATE_COMB_ROUTE_MULTI', 'CONSUMP_CONDITION_NEW', 'MIN_STEP', 'END_T', 'ABORT_CHECK_INTERVAL'):
+        assert name in RUNTIME_FIELDS
+        config = SimConfig().replace(**{name: getattr(SimConfig(), name) + 1})
+        assert get_fingerprint('line', config, **SETTINGS) != base, name
+
+
+def test_fingerprint_covers_settings():
+    base = get_fingerprint('line', SimConfig(), **SETTINGS)
+    assert get_fingerprint('other', SimConfig(), **SETTINGS) != base
+    assert get_fingerprint('line', SimConfig(), **{**SETTINGS, 'can_reorg': False}) != base
+    assert get_fingerprint('line', SimConfig(), **{**SETTINGS, 'abort_avg_t': None}) != base
+
+
+def test_archive_is_keyed_by_fingerprint(tmp_path):
+    archive = EvalArchive(str(tmp_path / 'archive.db'))
+    old = get_fingerprint('line', SimConfig(), **SETTINGS)
+    new = get_fingerprint('line', SimConfig(RATE_COMB_ROUTE_MULTI=0.9), **SETTINGS)
+    archive.put(old, (1, 2), 500., -1, {'x': 1}, 0.1)
+    assert archive.get(old, (1, 2)) == (500., -1)
+    assert archive.get(new, (1, 2)) is None
+    archive.close()
@@ -0,0 +1,38 @@
+"""DE/rand/1/bin 算子与随机种群的单元测试"""
+import numpy as np
+
+from de_ops import de_rand_1_bin, random_population
+
+LB = np.array([1, 1, 1, 8])
+UB = np.array([3, 3, 3, 14])
+
+
+def test_trial_is_int_within_bounds():
+    rng = np.random.default_rng(0)
+    pop = random_population(6, LB, UB, rng)
+    for target in range(6):
+        trial = de_rand_1_bin(pop, target, LB, UB, rng, F=2., CR=0.9)
+        assert trial.dtype.kind == 'i'
+        assert np.all(trial >= LB) and np.all(trial <= UB)
+
+
+def test_trial_is_reproducible():
+    pop = random_population(6, LB, UB, np.random.default_rng(1))
+    trials = [de_rand_1_bin(pop, 2, LB, UB, np.random.default_rng(5)) for _ in range(2)]
+    assert np.array_equal(*trials)
+
+
+def test_target_is_not_a_donor():
+    """目标个体不参与变异：其余个体相同时，交叉的变量必取其值"""
+    pop = np.array([[1, 1, 1, 8]] * 5 + [[3, 3, 3, 14]])
+    rng = np.random.default_rng(2)
+    for _ in range(20):
+        trial = de_rand_1_bin(pop, 5, LB, UB, rng, CR=0.)
+        assert np.sum(trial != pop[5]) == 1  # CR=0 时只有强制交叉的一个变量
+
+
+def test_small_population():
+    """个体数少于 4 时有放回地选择"""
+    pop = np.array([[1, 2, 3, 10], [2, 2, 2, 12]])
+    trial = de_rand_1_bin(pop, 0, LB, UB, np.random.default_rng(3), CR=1.)
+    assert np.array_equal(trial, pop[1])
@@ -0,0 +1,23 @@
+"""文件 md5 缓存的单元测试"""
+import hashlib
+import os
+
+from env import line
+
+
+def test_file_hash_is_cached_until_file_changes(tmp_path, monkeypatch):
+    path = str(tmp_path / 'chain.csv')
+    with open(path, 'wb') as f:
+        f.write(b'a,b\n1,2\n')
+    expected = hashlib.md5(b'a,b\n1,2\n').hexdigest()
+    assert line.get_file_hash(path) == expected
+
+    # 文件未变化时不再计算
+    with monkeypatch.context() as m:
+        m.setattr(line.hashlib, 'md5', None)
+        assert line.get_file_hash(path) == expected
+
+    with open(path, 'ab') as f:
+        f.write(b'3,4\n')
+    os.utime(path, ns=(0, 0))
+    assert line.get_file_hash(path) == hashlib.md5(b'a,b\n1,2\n3,4\n').hexdigest()
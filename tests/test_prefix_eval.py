@@ -0,0 +1,60 @@
+"""前缀复用评估的单元测试（合成线路）：从整点快照继续的仿真与完整仿真结果一致，设置不同的快照不复用"""
+import pytest
+
+from prefix_eval import PrefixEvaluator
+
+HOURS = [8, 10, 12]
+BASE = [0] * 6 + [2] * 16 + [1] * 2
+# 与 BASE 在 10:00 前相同，从 10:00 的快照继续
+BRANCH = [0] * 6 + [2] * 4 + [1] * 10 + [0] * 4
+
+
+@pytest.fixture(scope='module')
+def dep_duration_list(line_info):
+    return line_info['dep_duration_list']
+
+
+def straight_stats(make_sim, dep_num_list, can_reorg=True, **kwargs):
+    sim = make_sim(dep_num_list=dep_num_list, **kwargs)
+    sim.can_reorg = can_reorg
+    sim.run()
+    return sim.get_statistics()
+
+
+def test_resumed_run_matches_full_simulation(make_sim, dep_duration_list):
+    evaluator = PrefixEvaluator(make_sim(), hours=HOURS)
+    evaluator.evaluate(BASE, dep_duration_list)
+    assert evaluator.misses == 1 and len(evaluator.snapshots) == len(HOURS)
+
+    sim = evaluator.evaluate(BRANCH, dep_duration_list)
+    assert evaluator.hits == 1 and evaluator.saved_t == 10 * 3600 - sim.config.SIM_START_T
+    assert sim.get_statistics() == straight_stats(make_sim, BRANCH)
+
+    # 同一方案再次评估时从最后一个快照继续
+    sim = evaluator.evaluate(BASE, dep_duration_list)
+    assert evaluator.hits == 2
+    assert sim.get_statistics() == straight_stats(make_sim, BASE)
+
+
+def test_snapshots_are_keyed_on_settings(make_sim, dep_duration_list):
+    sim = make_sim()
+    evaluator = PrefixEvaluator(sim, hours=HOURS)
+    evaluator.evaluate(BASE, dep_duration_list)
+
+    # 仿真参数或结合/分离开关不同，不复用此前的快照
+    sim.set_config(sim.config.replace(RATE_COMB_ROUTE=sim.config.RATE_COMB_ROUTE + 0.1))
+    evaluator.evaluate(BRANCH, dep_duration_list)
+    sim.can_reorg = False
+    evaluator.evaluate(BRANCH, dep_duration_list)
+    assert evaluator.hits == 0 and evaluator.misses == 3
+    assert sim.get_statistics() == straight_stats(
+        make_sim, BRANCH, can_reorg=False, config=sim.config)
+
+
+def test_restore_keeps_current_abort_settings(make_sim, dep_duration_list):
+    evaluator = PrefixEvaluator(make_sim(), hours=HOURS)
+    sim = evaluator.evaluate(BASE, dep_duration_list, abort_obj=1e6, abort_avg_t=1000.)
+    sim.abort_obj, sim.abort_avg_t = None, None
+    evaluator.evaluate(BRANCH, dep_duration_list)
+    assert evaluator.hits == 1
+    assert sim.abort_obj is None and sim.abort_avg_t is None
@@ -0,0 +1,163 @@
+"""协调端与工作端协议的本机端到端测试（工作端为按协议收发消息的线程，不运行仿真）"""
+import socket
+import threading
+import time
+
+import pytest
+
+from remote import RemotePool, send_msg, recv_msg
+
+FINGERPRINT = 'test-fingerprint'
+
+
+def connect(pool, token=None, fingerprint=FINGERPRINT):
+    sock = socket.create_connection(pool.address, timeout=10)
+    send_msg(sock, {'type': 'register', 'worker': 'test', 'fingerprint': fingerprint, 'token': token})
+    return sock, recv_msg(sock)
+
+
+def run_fake_worker(pool, stop: threading.Event, hang: bool = False, token=None):
+    """拉取任务并返回 (决策变量之和, 0, {}, 0)；hang 为 True 时领取一个任务后不再响应"""
+    sock, reply = connect(pool, token=token)
+    assert reply['type'] == 'welcome'
+    with sock:
+        while not stop.is_set():
+            send_msg(sock, {'type': 'pull'})
+            msg = recv_msg(sock)
+            if msg['type'] == 'stop':
+                return
+            if msg['type'] == 'wait':
+                time.sleep(msg['delay'])
+                continue
+            if hang:
+                stop.wait()
+                return
+            send_msg(sock, {'type': 'push', 'task': msg['task'], 'result': [sum(msg['var']), 0, {}, 0]})
+            assert recv_msg(sock)['type'] == 'ok'
+
+
+def start_worker(pool, **kwargs):
+    stop = threading.Event()
+    thread = threading.Thread(target=run_fake_worker, args=(pool, stop), kwargs=kwargs, daemon=True)
+    thread.start()
+    return stop
+
+
+@pytest.fixture
+def pool():
+    pool = RemotePool(FINGERPRINT, host='127.0.0.1', port=0, task_timeout=0.5, max_retries=2, idle_timeout=2)
+    yield pool
+    pool.close()
+    pool.server.shutdown()
+    pool.server.server_close()
+
+
+def make_args(num):
+    return [(i, [i, 1, 2], None, None) for i in range(num)]
+
+
+def test_send_recv_roundtrip():
+    a, b = socket.socketpair()
+    with a, b:
+        msg = {'type': 'task', 'task': 3, 'var': [1, 2, 3], 'abort_obj': 1.5, 'day': None, 'name': '线路'}
+        send_msg(a, msg)
+        assert recv_msg(b) == msg
+
+
+def test_map_returns_results_in_order(pool):
+    stops = [start_worker(pool), start_worker(pool)]
+    try:
+        results = pool.map(None, make_args(10))
+        assert [res[0] for res in results] == [i + 3 for i in range(10)]
+    finally:
+        for stop in stops:
+            stop.set()
+
+
+def test_hung_worker_task_is_requeued(pool):
+    # 唯一的工作端领取任务后挂起，监视线程在超时后重新排队，新工作端完成任务
+    hung = start_worker(pool, hang=True)
+    try:
+        done = []
+        thread = threading.Thread(target=lambda: done.append(pool.map(None, make_args(1))), daemon=True)
+        thread.start()
+        # 挂起的工作端最多等待 0.5 秒后才领取任务，再经 task_timeout 与监视间隔后重新排队，不依赖固定等待时间
+        deadline = time.time() + 5
+        while not (len(pool.pending) == 1 and pool.pending[0].attempts == 1) and time.time() < deadline:
+            time.sleep(0.05)
+        assert len(pool.pending) == 1 and len(pool.leased) == 0 and pool.pending[0].attempts == 1
+        healthy = start_worker(pool)
+        thread.join(timeout=10)
+        healthy.set()
+        assert done == [[(3, 0, {}, 0)]]
+    finally:
+        hung.set()
+
+
+def test_map_fails_when_no_worker_pulls(pool):
+    hung = start_worker(pool, hang=True)
+    try:
+        start = time.time()
+        with pytest.raises(RuntimeError):
+            pool.map(None, make_args(1))
+        assert time.time() - start < 10
+    finally:
+        hung.set()
+
+
+def test_token_required():
+    with pytest.raises(AssertionError):
+        RemotePool(FINGERPRINT, host='0.0.0.0', port=0, token='')
+    pool = RemotePool(FINGERPRINT, host='127.0.0.1', port=0, token='secret')
+    try:
+        for token in (None, 'wrong'):
+            sock, reply = connect(pool, token=token)
+            sock.close()
+            assert reply == {'type': 'reject', 'reason': 'invalid token'}
+        sock, reply = connect(pool, token='secret')
+        sock.close()
+        assert reply['type'] == 'welcome'
+        sock, reply = connect(pool, token='secret', fingerprint='other')
+        sock.close()
+        assert reply['type'] == 'reject'
+    finally:
+        pool.close()
+        pool.server.shutdown()
+        pool.server.server_close()
+
+
+def lease_task(sock):
+    """拉取直到领取到一个任务"""
+    while True:
+        send_msg(sock, {'type': 'pull'})
+        msg = recv_msg(sock)
+        if msg['type'] == 'task':
+            return msg
+        time.sleep(0.05)
+
+
+def test_reports_from_previous_lessee_are_ignored(pool):
+    # A 领取任务后超时，任务重新分配给 B；A 迟到的出错报告与结果不影响 B 的领取
+    done = []
+    thread = threading.Thread(target=lambda: done.append(pool.map(None, make_args(1))), daemon=True)
+    thread.start()
+    sock_a, _ = connect(pool)
+    sock_b, _ = connect(pool)
+    with sock_a, sock_b:
+        task = lease_task(sock_a)['task']
+        deadline = time.time() + 5
+        while len(pool.pending) == 0 and time.time() < deadline:
+            time.sleep(0.02)
+        assert lease_task(sock_b)['task'] == task
+
+        send_msg(sock_a, {'type': 'error', 'task': task, 'error': 'stale'})
+        assert recv_msg(sock_a)['type'] == 'ok'
+        send_msg(sock_a, {'type': 'push', 'task': task, 'result': [-1, 0, {}, 0]})
+        assert recv_msg(sock_a)['type'] == 'ok'
+        with pool.cond:
+            assert list(pool.leased) == [task] and pool.leased[task].attempts == 2 and len(pool.pending) == 0
+
+        send_msg(sock_b, {'type': 'push', 'task': task, 'result': [3, 0, {}, 0]})
+        assert recv_msg(sock_b)['type'] == 'ok'
+        thread.join(timeout=10)
+    assert done == [[(3, 0, {}, 0)]]
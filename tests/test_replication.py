@@ -0,0 +1,88 @@
+"""流式统计量、t 分位数、重复种子与需求实现的单元测试"""
+import math
+import random
+import statistics
+
+import numpy as np
+import pytest
+
+from replication import RunningStats, check_seed_keys, compare_schedules, replication_seeds, t_quantile
+
+# Student t 分布 0.975 分位数的表值
+T_975 = {4: 2.776, 9: 2.262, 30: 2.042, 120: 1.980}
+
+
+def test_running_stats_matches_batch():
+    rng = random.Random(1)
+    values = [rng.gauss(10, 3) for _ in range(50)]
+    running = RunningStats()
+    for val in values:
+        running.add(val)
+    assert running.n == len(values)
+    assert running.mean == pytest.approx(statistics.mean(values))
+    assert running.var == pytest.approx(statistics.variance(values))
+    assert running.std == pytest.approx(statistics.stdev(values))
+
+
+def test_running_stats_is_stable_with_large_offset():
+    running = RunningStats()
+    for val in (1e9 + 4, 1e9 + 7, 1e9 + 13, 1e9 + 16):
+        running.add(val)
+    assert running.var == pytest.approx(30.)
+
+
+def test_half_width_needs_two_samples():
+    running = RunningStats()
+    assert running.var == 0. and math.isinf(running.half_width())
+    running.add(1.)
+    assert math.isinf(running.half_width())
+    running.add(3.)
+    assert running.half_width(0.95) == pytest.approx(t_quantile(0.975, 1))  # std = sqrt(2), n = 2
+
+
+@pytest.mark.parametrize('df, expected', sorted(T_975.items()))
+def test_t_quantile(df, expected):
+    assert t_quantile(0.975, df) == pytest.approx(expected, abs=0.01)
+
+
+def test_t_quantile_is_symmetric_and_tends_to_normal():
+    assert t_quantile(0.5, 10) == pytest.approx(0.)
+    assert t_quantile(0.025, 10) == pytest.approx(-t_quantile(0.975, 10))
+    assert t_quantile(0.975, 10 ** 6) == pytest.approx(statistics.NormalDist().inv_cdf(0.975), abs=1e-4)
+
+
+def test_replication_seeds_are_reproducible_pairs():
+    seeds = replication_seeds(4, seed=3)
+    assert seeds == replication_seeds(4, seed=3)
+    assert len(set(seeds)) == 4 and all(len(pair) == 2 for pair in seeds)
+    assert replication_seeds(2, seed=3) == seeds[:2]
+
+
+def test_seed_keys_are_rejected():
+    check_seed_keys({'multi_dec_rule': 'up_first'})
+    for key in ('seed', 'route_seed', 'demand_seed'):
+        with pytest.raises(AssertionError, match=key):
+            check_seed_keys({key: 1})
+
+
+def test_reseed_redraws_preprocessing(line):
+    assert line.reseed(line.seed) is line
+    other = line.reseed(7)
+    assert other.seed == 7 and other.cache_key != line.cache_key
+    assert np.array_equal(other.pass_arrays['arrive_t'], line.reseed(7).pass_arrays['arrive_t'])
+    # 同一批出行记录，出发时刻与坐标重新扰动（不重复、不丢弃乘客）
+    assert other.num_passengers == line.num_passengers
+    assert not np.array_equal(other.pass_arrays['start_lat'], line.pass_arrays['start_lat'])
+    assert np.all(np.diff(other.pass_arrays['arrive_t']) >= 0)
+
+
+def test_replications_differ_and_share_seeds_across_schedules(line, line_info):
+    schedules = [(line_info['dep_num_list'], line_info['dep_duration_list']),
+                 ([0] * 6 + [1] * 14 + [0] * 4, line_info['dep_duration_list'])]
+    seeds = replication_seeds(2, seed=5)
+    res = compare_schedules(line_info, schedules, seeds, line=line, multi_dec_rule='up_first', record_time=None)
+    values = res['avg_travel_t(full, min)']['values']
+    assert values[0, 0] != values[0, 1]
+    again = compare_schedules(line_info, schedules[1:], seeds[1:], line=line, multi_dec_rule='up_first',
+                              record_time=None)
+    assert again['avg_travel_t(full, min)']['values'][0, 0] == values[1, 1]
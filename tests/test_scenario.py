@@ -0,0 +1,64 @@
+"""场景文件写入与加载的单元测试（合成线路）"""
+import json
+import os
+
+import numpy as np
+import pytest
+
+from config import RUNTIME_FIELDS, SimConfig
+from conftest import CHAIN_DATA_PATH, FIXTURE_DAY
+from scenario import SCENARIO_VERSION, load_scenario, write_scenario
+
+
+@pytest.fixture
+def scenario_path(tmp_path, monkeypatch, line_info):
+    monkeypatch.setattr('env.line.CACHE_DIR', str(tmp_path / 'cache'))
+    path = str(tmp_path / 'scenario')
+    # 写入时的运行时参数与当前 consts.py 中的值不同（模拟写入场景后修改了 consts.py）
+    old = SimConfig(RATE_COMB_ROUTE_MULTI=0.123, CONSUMP_CONDITION_NEW=9.87, NUM_LB=5)
+    line = write_scenario(path, line_info, CHAIN_DATA_PATH, day=FIXTURE_DAY, config=old)
+    return path, line
+
+
+def test_load_matches_written_line(scenario_path):
+    path, line = scenario_path
+    loaded = load_scenario(path)['line']
+    assert loaded.cache_key == line.cache_key
+    for col, arr in line.pass_arrays.items():
+        assert np.array_equal(loaded.pass_arrays[col], arr)
+
+
+def test_runtime_fields_follow_current_config(scenario_path):
+    path, line = scenario_path
+    loaded = load_scenario(path)['line']
+    # 预处理参数取场景中的值，运行时参数取当前值
+    assert loaded.config.NUM_LB == 5 and loaded.config.DAY == FIXTURE_DAY
+    assert loaded.config.template_key() == line.config.template_key()
+    current = SimConfig()
+    for name in RUNTIME_FIELDS:
+        assert getattr(loaded.config, name) == getattr(current, name), name
+
+    config = SimConfig(RATE_COMB_ROUTE_MULTI=0.456, NUM_LB=7)
+    loaded = load_scenario(path, config=config)['line']
+    assert loaded.config.RATE_COMB_ROUTE_MULTI == 0.456 and loaded.config.NUM_LB == 5
+
+
+def test_version_is_checked(scenario_path):
+    path, _ = scenario_path
+    meta_path = os.path.join(path, 'meta.json')
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    meta['version'] = SCENARIO_VERSION - 1
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    with pytest.raises(AssertionError, match='rebuild'):
+        load_scenario(path)
+
+
+def test_loaded_line_reseeds_from_cache(scenario_path):
+    """场景中的线路不含乘客链数据，以其他种子重新预处理时与原线路使用同一预处理缓存"""
+    path, line = scenario_path
+    reseeded = line.reseed(7)
+    loaded = load_scenario(path)['line'].reseed(7)
+    assert loaded.cache_key == reseeded.cache_key
+    assert np.array_equal(loaded.pass_arrays['arrive_t'], reseeded.pass_arrays['arrive_t'])
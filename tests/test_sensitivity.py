@@ -0,0 +1,59 @@
+"""Morris 设计与基本效应的单元测试（以解析函数代替仿真）"""
+import pytest
+
+from config import FIELDS
+from sensitivity import (CONFIG_FACTORS, CONFIG_FACTORS_MULTI, elementary_effects, get_config_factors,
+                         morris_design, summarize)
+
+FACTORS = {'a': (0., 1.), 'b': (0., 2.), 'n': (1, 4)}
+
+
+def test_design_changes_one_factor_per_step():
+    trajectories = morris_design(FACTORS, num_trajectories=5, num_levels=4, seed=1)
+    assert len(trajectories) == 5
+    for steps in trajectories:
+        assert len(steps) == len(FACTORS) + 1
+        assert steps[0][0] is None
+        assert sorted(name for name, _ in steps[1:]) == sorted(FACTORS)
+        for (_, prev), (name, cur) in zip(steps, steps[1:]):
+            assert [key for key in FACTORS if cur[key] != prev[key]] in ([name], [])
+        for _, values in steps:
+            for name, (lo, hi) in FACTORS.items():
+                assert lo <= values[name] <= hi
+            assert isinstance(values['n'], int)
+
+
+def test_design_is_reproducible():
+    assert morris_design(FACTORS, 3, seed=7) == morris_design(FACTORS, 3, seed=7)
+    assert morris_design(FACTORS, 3, seed=7) != morris_design(FACTORS, 3, seed=8)
+
+
+def test_effects_of_linear_function():
+    """y = 3a - b（按取值范围归一化后 a 的效应为 3，b 的效应为 -2），n 无影响"""
+    trajectories = morris_design(FACTORS, num_trajectories=6, num_levels=4, seed=3)
+    outputs = [[{'y': 3 * values['a'] - values['b']} for _, values in steps] for steps in trajectories]
+    effects = elementary_effects(trajectories, outputs, FACTORS)
+    assert effects['y']['a'] == pytest.approx([3.] * 6)
+    assert effects['y']['b'] == pytest.approx([-2.] * 6)
+
+    report = summarize(effects, metrics=('y',))['y']
+    assert [row[0] for row in report] == ['a', 'b', 'n']
+    name, mu, mu_star, sigma, num = report[1]
+    assert (mu, mu_star, sigma, num) == pytest.approx((-2., 2., 0., 6))
+
+
+def test_effects_skip_steps_without_change():
+    """取整后未变化的步不计入"""
+    trajectories = [[(None, {'n': 1}), ('n', {'n': 1})], [(None, {'n': 1}), ('n', {'n': 2})]]
+    outputs = [[{'y': 0.}, {'y': 5.}], [{'y': 0.}, {'y': 1.}]]
+    effects = elementary_effects(trajectories, outputs, {'n': (1, 4)})
+    assert effects['y']['n'] == pytest.approx([3.])
+
+
+def test_config_factors_by_mode():
+    assert get_config_factors('multi_order') is CONFIG_FACTORS_MULTI
+    assert get_config_factors('single') is CONFIG_FACTORS
+    assert get_config_factors('baseline') == {}
+    assert not any(name.endswith('_MULTI') for name in CONFIG_FACTORS)
+    for name in {**CONFIG_FACTORS, **CONFIG_FACTORS_MULTI}:
+        assert name in FIELDS
@@ -0,0 +1,57 @@
+"""提前终止的单元测试（合成线路）：检查出行时间约束不改变未终止仿真的结果，终止的仿真完整运行也必然不满足约束"""
+import pytest
+
+OBJ_KEY = 'power consumption(condition, kWh)'
+AVG_T_KEY = 'avg_travel_t(full, min)'
+
+# 全天发车；18:00 后停发（部分乘客直到 END_T 也未完成出行，统计量只累计已完成的乘客）
+SCHEDULES = {
+    'full': [0] * 6 + [1] * 14 + [0] * 4,
+    'backlog': [0] * 6 + [1] * 12 + [0] * 6,
+}
+
+
+def get_res(stats: dict, ub_avg_t: float):
+    """与 subAimFunc 相同的 (目标值, 约束)，下界取 0"""
+    if stats.get('aborted') is not None:
+        return stats[OBJ_KEY], 1
+    return stats[OBJ_KEY], -1 if stats[AVG_T_KEY] < ub_avg_t else 1
+
+
+@pytest.fixture(scope='module')
+def full_runs(line, make_sim):
+    stats = {}
+    for name, dep_num_list in SCHEDULES.items():
+        sim = make_sim(dep_num_list=dep_num_list)
+        sim.run()
+        stats[name] = sim.get_statistics()
+        assert (len(sim.pas_pool) < sim.template.get_eligible_suffix()[0]) == (name == 'backlog')
+    return stats
+
+
+@pytest.mark.parametrize('name', sorted(SCHEDULES))
+def test_unaborted_run_is_unchanged(name, full_runs, make_sim):
+    full = full_runs[name]
+    for ub_avg_t in (full[AVG_T_KEY] + 0.01, 1000.):
+        sim = make_sim(dep_num_list=SCHEDULES[name])
+        sim.abort_avg_t = ub_avg_t
+        sim.run()
+        stats = sim.get_statistics()
+        assert stats.get('aborted') is None
+        assert get_res(stats, ub_avg_t) == get_res(full, ub_avg_t)
+        assert stats == full
+
+
+@pytest.mark.parametrize('name', sorted(SCHEDULES))
+def test_aborted_run_is_infeasible(name, full_runs, make_sim):
+    full = full_runs[name]
+    for ub_avg_t in (full[AVG_T_KEY] - 0.01, full[AVG_T_KEY] * 0.8):
+        sim = make_sim(dep_num_list=SCHEDULES[name])
+        sim.abort_avg_t = ub_avg_t
+        sim.run()
+        stats = sim.get_statistics()
+        assert stats['aborted'] in ('travel_t', 'backlog')
+        assert ub_avg_t <= stats['avg_t_lb'] <= full[AVG_T_KEY] + 1e-9
+        assert get_res(full, ub_avg_t)[1] == 1
+        assert stats[OBJ_KEY] <= full[OBJ_KEY]
+
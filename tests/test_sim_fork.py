@@ -0,0 +1,100 @@
+"""仿真分支的单元测试（合成线路）：分支之间、分支与原仿真之间不共享运行中的可变状态，各自运行的结果与不分支的仿真一致"""
+import numpy as np
+import pytest
+
+from sim import _SHARED_ATTRS
+
+PAUSE_T = 8 * 3600
+BASE = [0] * 6 + [2] * 16 + [1] * 2
+BRANCH = [0] * 6 + [2] * 2 + [1] * 12 + [0] * 4  # 8:00 起与 BASE 不同
+
+
+def straight_stats(make_sim, dep_num_list):
+    sim = make_sim(dep_num_list=dep_num_list)
+    sim.run()
+    return sim.get_statistics()
+
+
+def get_finished(sim):
+    """fork 中按设计共享的对象：已完成的乘客、已到达终点的车辆与车厢记录"""
+    return list(sim.pas_pool) + [bus for bus in sim.all_buses.values() if bus.state == 'end'] + \
+        [cab for cab in sim.all_cabs.values() if cab['end_t'] is not None]
+
+
+def get_mutables(sim, skip_ids: set):
+    """从仿真状态可达的可变对象的 id（不进入线路模板与 skip_ids 中的对象）"""
+    found, visited = set(), set()
+    stack = [val for key, val in vars(sim).items() if key not in _SHARED_ATTRS]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in visited or id(obj) in skip_ids:
+            continue
+        visited.add(id(obj))
+        if obj is None or isinstance(obj, (bool, int, float, complex, str, bytes, range, type, np.generic)):
+            continue
+        if isinstance(obj, (tuple, frozenset)):
+            stack.extend(obj)
+            continue
+        found.add(id(obj))
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, set)):
+            stack.extend(obj)
+        elif hasattr(obj, '__dict__'):
+            stack.extend(vars(obj).values())
+    return found
+
+
+@pytest.fixture()
+def paused(make_sim):
+    sim = make_sim(dep_num_list=BASE)
+    assert sim.run(until=PAUSE_T)
+    return sim
+
+
+def test_forks_share_no_running_state(paused):
+    skip_ids = set(paused._template_memo()) | {id(obj) for obj in get_finished(paused)}
+    first, second = paused.fork(), paused.fork()
+    assert first.template is paused.template and second.base_line is paused.base_line
+
+    parent_ids = get_mutables(paused, skip_ids)
+    first_ids, second_ids = get_mutables(first, skip_ids), get_mutables(second, skip_ids)
+    assert parent_ids and first_ids and second_ids
+    assert not parent_ids & first_ids
+    assert not parent_ids & second_ids
+    assert not first_ids & second_ids
+
+
+def test_forks_run_independently(make_sim, paused):
+    changed, same = paused.fork(), paused.fork()
+    finished = get_finished(paused)
+    before = [dict(vars(obj)) if hasattr(obj, '__dict__') else dict(obj) for obj in finished]
+    changed.dep_decider.dep_num_list = list(BRANCH)
+    changed.run()
+    same.run()
+    assert same.get_statistics() == straight_stats(make_sim, BASE)
+    assert changed.get_statistics() == straight_stats(make_sim, BRANCH)
+
+    # 分支运行后原仿真仍停在暂停时刻，继续运行的结果不变；共享的已完成记录未被修改
+    assert paused.t == PAUSE_T
+    paused.run()
+    assert paused.get_statistics() == straight_stats(make_sim, BASE)
+    assert [dict(vars(obj)) if hasattr(obj, '__dict__') else dict(obj) for obj in finished] == before
+
+
+def run_and_get_statistics(sim):
+    sim.run()
+    return sim.get_statistics()
+
+
+def set_branch_and_run(sim):
+    sim.dep_decider.dep_num_list = list(BRANCH)
+    return run_and_get_statistics(sim)
+
+
+def test_fork_map_leaves_parent_unchanged(make_sim, paused):
+    results = paused.fork_map([run_and_get_statistics, set_branch_and_run, run_and_get_statistics], processes=2)
+    assert results[0] == results[2] == straight_stats(make_sim, BASE)
+    assert results[1] == straight_stats(make_sim, BRANCH)
+    assert paused.t == PAUSE_T and paused.dep_decider.dep_num_list == BASE
@@ -0,0 +1,61 @@
+"""仿真快照的单元测试（合成线路）：暂停、快照恢复与快照文件读写后继续运行，结果与不中断的仿真一致"""
+import pytest
+
+from sim import Sim
+
+PAUSE_T = 8 * 3600  # 早高峰中暂停，此时有车辆在途、乘客在站等待
+
+
+@pytest.fixture(scope='module')
+def straight_stats(make_sim):
+    sim = make_sim()
+    assert sim.run() is False
+    return sim.get_statistics()
+
+
+def test_paused_run_matches_straight_run(make_sim, straight_stats):
+    sim = make_sim()
+    assert sim.run(until=PAUSE_T) is True
+    assert sim.t == PAUSE_T
+    sim.snapshot()
+    assert sim.run() is False
+    assert sim.get_statistics() == straight_stats
+
+
+def test_restore_reproduces_statistics(make_sim, straight_stats):
+    sim = make_sim()
+    sim.run(until=PAUSE_T)
+    snap = sim.snapshot()
+    sim.run()
+    assert sim.get_statistics() == straight_stats
+
+    # 同一快照可多次恢复，每次继续运行都得到相同结果
+    for _ in range(2):
+        sim.restore(snap)
+        assert sim.t == PAUSE_T
+        sim.run()
+        assert sim.get_statistics() == straight_stats
+
+
+def test_snapshot_file_round_trip(tmp_path, line, make_sim, straight_stats):
+    sim = make_sim()
+    sim.run(until=PAUSE_T)
+    path = str(tmp_path / 'sim.snapshot')
+    sim.save_snapshot(path)
+
+    loaded = Sim.load_snapshot(path, line)
+    assert loaded.template is line and loaded.t == PAUSE_T
+    loaded.run()
+    assert loaded.get_statistics() == straight_stats
+
+    # 写入快照不影响原仿真
+    sim.run()
+    assert sim.get_statistics() == straight_stats
+
+
+def test_restore_rejects_other_template(make_sim):
+    sim = make_sim()
+    snap = sim.snapshot()
+    snap['cache_key'] = 'other'
+    with pytest.raises(AssertionError):
+        sim.restore(snap)
@@ -0,0 +1,69 @@
+"""高斯过程回归与代理模型的单元测试（以解析函数代替仿真）"""
+import numpy as np
+import pytest
+
+from opt_consts import UB_AVG_T
+from surrogate import GaussianProcess, Surrogate, OBJ_KEY, AVG_T_KEY
+
+
+def f(X):
+    return 500 + 40 * np.sin(3 * X[:, 0]) - 25 * X[:, 1] ** 2
+
+
+def test_interpolates_smooth_function():
+    rng = np.random.default_rng(0)
+    X = rng.random((60, 2))
+    gp = GaussianProcess().fit(X, f(X))
+    mean, std = gp.predict(X)
+    assert mean == pytest.approx(f(X), abs=1.)
+    X_test = rng.random((20, 2))
+    mean, std = gp.predict(X_test)
+    assert np.abs(mean - f(X_test)).max() < 2.
+    assert np.all(std >= 0)
+
+
+def test_uncertainty_grows_away_from_data():
+    X = np.linspace(0, 0.3, 8)[:, None]
+    gp = GaussianProcess(length_scales=(0.2,), noises=(1e-4,)).fit(X, np.sin(X[:, 0]))
+    _, std = gp.predict(np.array([[0.15], [1.0]]))
+    assert std[0] < std[1]
+
+
+def test_constant_output():
+    """输出为常数时标准差按 1 处理，预测值等于该常数"""
+    X = np.random.default_rng(1).random((5, 3))
+    gp = GaussianProcess().fit(X, np.full(5, 7.))
+    mean, _ = gp.predict(X[:2])
+    assert mean == pytest.approx([7., 7.])
+
+
+def make_surrogate(num: int, seed: int = 0, audit: float = 0.5):
+    """在二维单位方格上以解析函数的结果训练的代理模型"""
+    surrogate = Surrogate([0, 0], [1, 1], min_samples=num, audit=audit, seed=seed)
+    X = np.random.default_rng(2).random((num, 2))
+    for x, obj in zip(X, f(X)):
+        surrogate.add(tuple(x), {OBJ_KEY: obj, AVG_T_KEY: UB_AVG_T - 5 + 2 * x[0]})
+    return surrogate
+
+
+def test_aborted_runs_are_infeasible_samples():
+    surrogate = make_surrogate(10)
+    assert surrogate.ready
+    surrogate.add((0.9, 0.9), {'aborted': 'travel_t', OBJ_KEY: 100., 'avg_t_lb': UB_AVG_T + 1})
+    surrogate.add((0.1, 0.9), {'aborted': 'obj', OBJ_KEY: 900., 'avg_t_lb': None})
+    assert surrogate.samples[(0.9, 0.9)] == (None, UB_AVG_T + 1)
+    assert (0.1, 0.9) not in surrogate.samples
+    surrogate.fit()
+    # 能耗模型不使用提前终止个体的部分能耗
+    assert len(surrogate.gp_obj.X) == 10 and len(surrogate.gp_t.X) == 11
+
+
+def test_screening_is_reproducible_with_seed():
+    keys = [tuple(x) for x in np.random.default_rng(3).random((30, 2))]
+    results = []
+    for _ in range(2):
+        surrogate = make_surrogate(10, seed=42)
+        promising, _ = surrogate.screen(keys, [0.] * len(keys))
+        results.append((promising, sorted(surrogate.audited)))
+    assert results[0] == results[1]
+    assert 0 < len(results[0][1]) < len(keys)
@@ -0,0 +1,45 @@
+"""参数点标识、参数拆分与设计的单元测试（不运行仿真）"""
+import json
+
+import pytest
+
+from config import SimConfig
+from sweep import grid_design, load_results, point_key, random_design, split_point
+
+
+def test_point_key_ignores_order():
+    assert point_key({'a': 1, 'b': [2, 3]}) == point_key({'b': [2, 3], 'a': 1})
+    assert point_key({'a': 1}) != point_key({'a': 1.5})
+
+
+def test_split_point():
+    base = SimConfig(RATE_COMB_ROUTE_MULTI=0.1)
+    config, options = split_point({'RATE_FRONT_PASS_MULTI': 0.6, 'can_reorg': False, 'multi_dec_rule': 'down_first'},
+                                  base)
+    assert options == {'can_reorg': False, 'multi_dec_rule': 'down_first'}
+    assert config.RATE_FRONT_PASS_MULTI == 0.6 and config.RATE_COMB_ROUTE_MULTI == 0.1
+    assert base.RATE_FRONT_PASS_MULTI == SimConfig().RATE_FRONT_PASS_MULTI  # 原配置不变
+
+
+def test_split_point_rejects_template_fields():
+    for name in ('DAY', 'INTERVAL', 'unknown'):
+        with pytest.raises(AssertionError, match=name):
+            split_point({name: 1}, SimConfig())
+
+
+def test_designs():
+    grid = grid_design({'a': [1, 2], 'b': ['x', 'y', 'z']})
+    assert len(grid) == 6 and len({point_key(point) for point in grid}) == 6
+    points = random_design({'a': [1, 2], 'n': (3, 5), 'r': (0., 1.)}, num=20, seed=1)
+    assert points == random_design({'a': [1, 2], 'n': (3, 5), 'r': (0., 1.)}, num=20, seed=1)
+    for point in points:
+        assert point['a'] in (1, 2) and point['n'] in (3, 4, 5) and isinstance(point['n'], int)
+        assert 0. <= point['r'] <= 1.
+
+
+def test_load_results_skips_partial_line(tmp_path):
+    path = tmp_path / 'sweep.jsonl'
+    record = {'point': {'b': 2, 'a': 1}, 'stats': {'x': 1.}}
+    path.write_text(json.dumps(record) + '\n' + '{"point": {"a": 2', encoding='utf-8')
+    assert load_results(str(path)) == {point_key({'a': 1, 'b': 2}): record}
+    assert load_results(str(tmp_path / 'missing.jsonl')) == {}